@@ -1,9 +1,19 @@
 from flask import Flask
 from database import db_session, init_db
 from endpoints.player import player_api
+from endpoints.rating import rating_api
+from endpoints.stats import stats_api
+from endpoints.season import season_api
+from endpoints.search import search_api
+from endpoints.match import match_api
 
 app = Flask(__name__)
 app.register_blueprint(player_api, url_prefix='/player')
+app.register_blueprint(rating_api, url_prefix='/rating')
+app.register_blueprint(stats_api, url_prefix='/stats')
+app.register_blueprint(season_api, url_prefix='/season')
+app.register_blueprint(search_api, url_prefix='/search')
+app.register_blueprint(match_api, url_prefix='/match')
 
 init_db()
 
@@ -0,0 +1,15 @@
+from flask import Flask
+from database import db_session, init_db, serialize_writes
+from endpoints.coordinator import coordinator_api
+
+# The scrape workers' job queues, shard leases and writes, served from this host's database (see `ShardWorker`)
+app = Flask(__name__)
+app.register_blueprint(coordinator_api, url_prefix='/coordinator')
+
+# Requests are handled on concurrent threads, each with its own connection
+serialize_writes()
+init_db()
+
+@app.teardown_appcontext
+def shutdown_session(exception=None):
+    db_session.remove()
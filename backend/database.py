@@ -1,16 +1,178 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, event
+from typing import Callable
 from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base
 import os
 
-engine = create_engine(f'sqlite:///{os.environ.get("db", "dev.db")}')
+from utils.logger import Logger
+
+# Writers from other processes (e.g. scrape workers) are waited on rather than failing straight away
+engine = create_engine(f'sqlite:///{os.environ.get("db", "dev.db")}', connect_args={"timeout": 30})
 db_session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 
 Base = declarative_base()
 Base.query = db_session.query_property()
 
+database_logger = Logger.get_logger()
+
 def init_db() -> bool:
     import models
-    Base.metadata.create_all(bind=engine)
+    from models.map import rename_legacy_results, migrate_legacy_results
+    with engine.begin() as connection:
+        # Databases from before the map dictionary have their results rewritten in place
+        rename_legacy_results(connection)
+        Base.metadata.create_all(bind=connection)
+        migrate_legacy_results(connection)
+
+def serialize_writes() -> None:
+    """
+    Makes every transaction of this process take the database's write lock as it begins (`BEGIN IMMEDIATE`), and
+    switches the database to WAL so that readers are not blocked by it. Meant for processes sharing the database with
+    other writers, like the scrape workers' coordinator: a transaction that reads and then writes would otherwise fail with "database is
+    locked" whenever another process wrote in between, and IDs handed out by `get_next_id` could clash. Must be called
+    before the process first uses the database
+
+    This only coordinates processes on the same host: WAL relies on shared memory next to the database file, and
+    SQLite's file locks are not reliable over network filesystems, so a database on one of those is refused. Workers on
+    other nodes go through the coordinator instead (see `ShardWorker`)
+    """
+    path = engine.url.database
+    if path and path != ":memory:" and is_network_path(path):
+        raise ValueError(f"Database {path} is on a network filesystem, writers must share a database on a local disk")
+
+    @event.listens_for(engine, "connect")
+    def manage_transactions(dbapi_connection, connection_record) -> None:
+        # The driver's own implicit transactions would begin before (and instead of) the one below
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def begin_immediate(connection) -> None:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    engine.dispose()
+
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "afs", "9p", "ceph", "glusterfs", "lustre", "fuse.sshfs"}
+
+def is_network_path(path: str, mounts_path: str = "/proc/mounts") -> bool:
+    """
+    Whether the given path is on a network filesystem, going by the filesystem type of the longest mount point it is
+    under. Always false where the mounts cannot be read (anything but linux)
+    """
+    try:
+        with open(mounts_path) as mounts:
+            entries = [line.split()[1:3] for line in mounts]
+    except OSError:
+        return False
+    path = os.path.realpath(os.path.abspath(path))
+    mounted = [(mount_point, fs_type) for mount_point, fs_type in entries
+                if path == mount_point or path.startswith(mount_point.rstrip("/") + "/")]
+    return bool(mounted) and max(mounted, key=lambda entry: len(entry[0]))[1] in NETWORK_FILESYSTEMS
 
 def teardown_db() -> bool:
     Base.metadata.drop_all(engine)
+
+def data_generation(session: scoped_session = db_session, name: str = "results") -> int:
+    """
+    Gets the generation of a kind of data (see `models.generation`), which changes whenever its tables are written to.
+    Used to key in-memory caches of data derived from whole tables
+
+    params:
+        session[scoped_session]: the session to read with
+        name[str]: the kind of data, "results" (matches and their results), "memberships" or "ratings"
+
+    returns:
+        generation[int]: the generation, only meaningful when compared for equality
+    """
+    return session.execute(text("SELECT generation FROM data_generations WHERE name = :name"), {"name": name}).scalar() or 0
+
+def memory_high_water() -> int:
+    """
+    Gets the peak resident memory of the current process (kilobytes on linux, bytes on macOS)
+
+    returns:
+        peak[int]: the peak resident set size, or 0 on platforms that do not expose it (windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class UnitOfWork:
+    """
+    Chunked unit of work for long running scrapes. Staged changes are committed every `batch_size` steps, after which
+    every instance is expunged from the session so the identity map (and therefore memory) stays bounded by a single batch
+
+    Usage:
+        with UnitOfWork(db_session, batch_size=500) as uow:
+            for data in scraped:
+                Match.update(db_session, decode(data), commit=False)
+                uow.step()
+
+    params:
+        session[scoped_session]: The session to commit and expunge (defaults to the global `db_session`)
+        batch_size[int]: The number of steps to stage before committing
+        close[bool]: Whether to close the session (`remove()` for scoped sessions) once the unit of work exits
+        on_commit[callable]: Called after every commit, for state outside the database that must only be made durable
+                             once the data it describes is (e.g. `HttpCache.commit`)
+    """
+
+    def __init__(self,
+                    session: scoped_session = db_session,
+                    batch_size: int = 500,
+                    close: bool = True,
+                    on_commit: Callable[[], None] | None = None) -> None:
+        self.session = session
+        self.batch_size = max(1, int(batch_size))
+        self.close = close
+        self.on_commit = on_commit
+
+        self.pending = 0
+        self.committed = 0
+        self.batches = 0
+        self.peak_identity_map = 0
+        self.peak_memory = 0
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback) -> None:
+        if exception_type is None:
+            self.commit()
+        else:
+            self.session.rollback()
+
+        if self.close:
+            self.session.remove() if isinstance(self.session, scoped_session) else self.session.close()
+
+        database_logger.log_info(f"Unit of work committed {self.committed} changes in {self.batches} batches "
+                                 f"(identity map peak {self.peak_identity_map}, memory high water {self.peak_memory})")
+
+    def step(self, n: int = 1) -> bool:
+        """
+        Records that `n` changes have been staged, committing the batch once `batch_size` is reached
+
+        returns:
+            committed[bool]: whether this step caused the batch to be committed
+        """
+        self.pending += n
+        if self.pending < self.batch_size:
+            return False
+        self.commit()
+        return True
+
+    def commit(self) -> None:
+        """
+        Commits all staged changes and expunges every instance from the session
+        """
+        self.peak_identity_map = max(self.peak_identity_map, len(self.session.identity_map))
+        self.session.commit()
+        self.session.expunge_all()
+        if self.on_commit:
+            self.on_commit()
+
+        if self.pending:
+            self.batches += 1
+        self.committed += self.pending
+        self.pending = 0
+        self.peak_memory = max(self.peak_memory, memory_high_water())
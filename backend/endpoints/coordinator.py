@@ -0,0 +1,74 @@
+from flask import Blueprint
+from flask import jsonify, request
+from models import ScrapeLease
+from database import db_session
+from services.matchservice import JobQueue, MatchBatch
+from utils.typing import TfSource
+import hmac
+import os
+
+coordinator_api = Blueprint("coordinator", __name__)
+
+@coordinator_api.before_request
+def check_token():
+    # Only scrape workers holding the `coordinator_token` may lease, claim and write, if one is set
+    token = os.environ.get("coordinator_token")
+    if token and not hmac.compare_digest(request.headers.get("X-Coordinator-Token", ""), token):
+        return jsonify({'success': False, 'data': [], 'error': "Invalid coordinator token"}), 403
+
+@coordinator_api.errorhandler(KeyError)
+@coordinator_api.errorhandler(ValueError)
+def malformed_request(error):
+    # Missing fields and unknown sources
+    return jsonify({'success': False, 'data': [], 'error': f"Malformed request: {error!r}"}), 400
+
+@coordinator_api.route("/lease/acquire", methods=["POST"])
+def acquire_lease():
+    body = request.get_json()
+    shard = ScrapeLease.acquire(db_session, body['worker-id'], "match", TfSource(body['source']), body['num-shards'], body['lease'])
+    return jsonify({'success': True, 'data': shard})
+
+@coordinator_api.route("/lease/heartbeat", methods=["POST"])
+def heartbeat_lease():
+    body = request.get_json()
+    return jsonify({'success': True, 'data': ScrapeLease.heartbeat(db_session, body['worker-id'], body['lease'])})
+
+@coordinator_api.route("/lease/release", methods=["POST"])
+def release_lease():
+    body = request.get_json()
+    source = body.get('source', None)
+    ScrapeLease.release(db_session, body['worker-id'], None if source is None else TfSource(source), body.get('shard', None))
+    return jsonify({'success': True, 'data': []})
+
+@coordinator_api.route("/jobs/remaining")
+def get_remaining_jobs():
+    # Pending jobs, and jobs still leased by some worker, of the given leagues
+    sources = [TfSource(source) for source in request.args.getlist("source", type=int)]
+    return jsonify({'success': True, 'data': JobQueue(db_session).remaining(sources)})
+
+@coordinator_api.route("/jobs/count")
+def get_pending_jobs():
+    source = TfSource(request.args.get("source", type=int))
+    return jsonify({'success': True, 'data': JobQueue(db_session).count(source)})
+
+@coordinator_api.route("/jobs/claim", methods=["POST"])
+def claim_jobs():
+    body = request.get_json()
+    shard = body.get('shard', None)
+    jobs = JobQueue(db_session).claim(TfSource(body['source']), body['limit'], None if shard is None else tuple(shard))
+    return jsonify({'success': True, 'data': jobs})
+
+@coordinator_api.route("/jobs/fail-pending", methods=["POST"])
+def fail_pending_jobs():
+    body = request.get_json()
+    return jsonify({'success': True, 'data': JobQueue(db_session).fail_pending(TfSource(body['source']), body['error'])})
+
+@coordinator_api.route("/matches", methods=["POST"])
+def write_matches():
+    seasons = JobQueue(db_session).write(MatchBatch.from_json(request.get_json()))
+    return jsonify({'success': True, 'data': sorted(seasons)})
+
+@coordinator_api.route("/ratings", methods=["POST"])
+def update_ratings():
+    JobQueue(db_session).update_ratings()
+    return jsonify({'success': True, 'data': []})
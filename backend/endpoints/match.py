@@ -0,0 +1,12 @@
+from flask import Blueprint
+from flask import jsonify
+import services.snapshotservice as SnapshotService
+
+match_api = Blueprint("match", __name__)
+
+@match_api.route("/<int:match_id>")
+def get_match(match_id):
+    match = SnapshotService.match(match_id)
+    if not match:
+        return jsonify({'success': False, 'data': {}, 'error': f"Match with match_id {match_id} does not exist"})
+    return jsonify({'success': True, 'data': match})
@@ -1,6 +1,10 @@
 from flask import Blueprint
-from flask import jsonify
-from models import Player, MatchResult, RosterPlayerAssociation
+from flask import jsonify, request
+from models import Player
+import services.membershipservice as MembershipService
+import services.graphservice as GraphService
+import services.careerservice as CareerService
+import services.snapshotservice as SnapshotService
 
 player_api = Blueprint("player", __name__)
 
@@ -20,17 +24,57 @@ def get_player(player_id):
         }
     }
     """
-    player = Player.query.filter(Player.steam_id == player_id).first()
+    if not player_id.isdigit():
+        return jsonify({'success': False, 'data': {}, 'error': f"Player with player_id {player_id} does not exist"})
+    # Served from the snapshot without touching the database, when one has been built
+    player = SnapshotService.player(int(player_id))
     if not player:
-        return jsonify({'success': False, 'data': {}})
-    return jsonify({})
+        return jsonify({'success': False, 'data': {}, 'error': f"Player with player_id {player_id} does not exist"})
+    return jsonify({'success': True, 'data': player})
 
 @player_api.route("/<player_id>/matches")
 def get_player_matches(player_id):
     player = Player.query.filter(Player.steam_id == player_id).first()
     if not player:
         return jsonify({'success': False, 'data': [], 'error': f"Player with player_id {player_id} does not exist"})
-    # get rosters with player on
-    associations = RosterPlayerAssociation.query.filter(RosterPlayerAssociation.player_id == int(player_id))
-    matches = MatchResult.query.filter(MatchResult.team_id.in_([roster.roster_id for roster in associations])).all()
+    # Only matches played while the player was on the roster
+    matches = MembershipService.player_matches(player.steam_id)
     return jsonify({'success': True, 'data': [match.json() for match in matches]})
+
+@player_api.route("/<int:player_id>/teammates")
+def get_player_teammates(player_id):
+    k = min(request.args.get("k", 10, type=int), 100)
+    teammates = GraphService.top_players(player_id, "together", k)
+    if teammates is None:
+        return jsonify({'success': False, 'data': [], 'error': f"Player with player_id {player_id} has not played any matches"})
+    return jsonify({'success': True, 'data': teammates})
+
+@player_api.route("/<int:player_id>/opponents")
+def get_player_opponents(player_id):
+    k = min(request.args.get("k", 10, type=int), 100)
+    opponents = GraphService.top_players(player_id, "against", k)
+    if opponents is None:
+        return jsonify({'success': False, 'data': [], 'error': f"Player with player_id {player_id} has not played any matches"})
+    return jsonify({'success': True, 'data': opponents})
+
+@player_api.route("/<int:player_id>/connection/<int:other_id>")
+def get_player_connection(player_id, other_id):
+    path = GraphService.connection(player_id, other_id, max_depth=request.args.get("depth", 6, type=int))
+    if path is None:
+        return jsonify({'success': False, 'data': [], 'error': f"Players {player_id} and {other_id} are not connected"})
+    return jsonify({'success': True, 'data': path})
+
+@player_api.route("/<int:player_id>/network")
+def get_player_network(player_id):
+    n = min(request.args.get("n", 25, type=int), 200)
+    network = GraphService.ego_network(player_id, n)
+    if network is None:
+        return jsonify({'success': False, 'data': {}, 'error': f"Player with player_id {player_id} has not played any matches"})
+    return jsonify({'success': True, 'data': network})
+
+@player_api.route("/<player_id>/career")
+def get_player_career(player_id):
+    player = Player.query.filter(Player.steam_id == player_id).first()
+    if not player:
+        return jsonify({'success': False, 'data': [], 'error': f"Player with player_id {player_id} does not exist"})
+    return jsonify({'success': True, 'data': CareerService.get_career(player.steam_id)})
@@ -0,0 +1,54 @@
+from flask import Blueprint
+from flask import jsonify, request
+from models import RosterRating
+import services.ratingservice as RatingService
+import services.predictionservice as PredictionService
+
+rating_api = Blueprint("rating", __name__)
+
+@rating_api.route("/roster/<int:roster_id>")
+def get_roster_rating(roster_id):
+    rating = RosterRating.get(roster_id)
+    if not rating:
+        return jsonify({'success': False, 'data': {}, 'error': f"Roster with roster_id {roster_id} has not been rated"})
+    return jsonify({'success': True, 'data': rating.json()})
+
+@rating_api.route("/team/<int:team_id>")
+def get_team_rating(team_id):
+    rating = RatingService.team_rating(team_id)
+    if not rating:
+        return jsonify({'success': False, 'data': {}, 'error': f"Team with team_id {team_id} has no rated rosters"})
+    return jsonify({'success': True, 'data': {'team-id': team_id, **rating.json()}})
+
+@rating_api.route("/top")
+def get_top_ratings():
+    n = min(request.args.get("n", 50, type=int), 1000)
+    return jsonify({'success': True, 'data': [rating.json() for rating in RatingService.top(n)]})
+
+def is_id(value) -> bool:
+    # JSON booleans are ints in python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+@rating_api.route("/predict", methods=["POST"])
+def predict():
+    """
+    Scores many pairs of rosters at once. Takes `{"pairs": [[roster_a, roster_b], ...], "maps": [<map>, ...], "best-of": 1}`,
+    where `maps` (one per pair) and `best-of` are optional, and returns the probability of each `roster_a` winning
+    """
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    pairs = body.get("pairs") or []
+    maps = body.get("maps")
+    best_of = body.get("best-of", 1)
+    if not isinstance(pairs, list) or not all(isinstance(pair, list) and len(pair) == 2 and all(is_id(roster) for roster in pair) for pair in pairs):
+        return jsonify({'success': False, 'data': [], 'error': "Expected pairs to be a list of [roster_a, roster_b] roster IDs"})
+    if maps is not None and (not isinstance(maps, list) or len(maps) != len(pairs) or not all(isinstance(map_, str) for map_ in maps)):
+        return jsonify({'success': False, 'data': [], 'error': "Expected maps to be a list of map names, one per pair"})
+    if not is_id(best_of) or best_of < 1 or best_of % 2 == 0 or best_of > PredictionService.MAX_BEST_OF:
+        return jsonify({'success': False, 'data': [], 'error': f"Expected best-of to be an odd number of maps, at most {PredictionService.MAX_BEST_OF}"})
+    if len(pairs) > 100000:
+        return jsonify({'success': False, 'data': [], 'error': "At most 100000 pairs can be scored at once"})
+
+    roster_a, roster_b = zip(*pairs) if pairs else ((), ())
+    probabilities = PredictionService.predict(roster_a, roster_b, maps, best_of)
+    return jsonify({'success': True, 'data': probabilities.tolist()})
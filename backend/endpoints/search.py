@@ -0,0 +1,20 @@
+from flask import Blueprint
+from flask import jsonify, request
+import services.searchservice as SearchService
+
+search_api = Blueprint("search", __name__)
+
+@search_api.route("/")
+def search():
+    query = request.args.get("q", "")
+    kind = request.args.get("type", "all")
+    n = min(request.args.get("n", 10, type=int), 100)
+    if kind not in ("all", "player", "roster"):
+        return jsonify({'success': False, 'data': {}, 'error': "Search type must be one of all, player or roster"})
+
+    results = {}
+    if kind in ("all", "player"):
+        results["players"] = SearchService.search_players(query, n)
+    if kind in ("all", "roster"):
+        results["rosters"] = SearchService.search_rosters(query, n)
+    return jsonify({'success': True, 'data': results})
@@ -0,0 +1,24 @@
+from flask import Blueprint
+from flask import jsonify, request
+from models import Season
+import services.standingservice as StandingService
+import services.simulationservice as SimulationService
+
+season_api = Blueprint("season", __name__)
+
+@season_api.route("/<int:season_id>/standings")
+def get_season_standings(season_id):
+    season = Season.get(season_id)
+    if not season:
+        return jsonify({'success': False, 'data': [], 'error': f"Season with season_id {season_id} does not exist"})
+    return jsonify({'success': True, 'data': StandingService.season_standings(season.season_id)})
+
+@season_api.route("/<int:season_id>/simulate")
+def simulate_season(season_id):
+    season = Season.get(season_id)
+    if not season:
+        return jsonify({'success': False, 'data': [], 'error': f"Season with season_id {season_id} does not exist"})
+    n = min(max(request.args.get("n", 10000, type=int), 1), 100000)
+    seed = request.args.get("seed", 0, type=int)
+    # Simulated in the request's own thread, a pool per request would fork every core for each concurrent request
+    return jsonify({'success': True, 'data': SimulationService.simulate(season.season_id, n, seed, workers=1)})
@@ -0,0 +1,18 @@
+from flask import Blueprint
+from flask import jsonify, request
+import services.statservice as StatService
+
+stats_api = Blueprint("stats", __name__)
+
+@stats_api.route("/")
+def get_stats():
+    by = tuple(key for key in request.args.get("by", "map").split(",") if key)
+    if any(key not in StatService.GROUP_KEYS for key in by):
+        return jsonify({'success': False, 'data': [], 'error': f"Can only group by {', '.join(StatService.GROUP_KEYS)}"})
+
+    groups = StatService.stats(by,
+                                season=request.args.get("season", type=int),
+                                roster=request.args.get("roster", type=int),
+                                map_name=request.args.get("map"),
+                                format_=request.args.get("format"))
+    return jsonify({'success': True, 'data': groups})
@@ -17,9 +17,19 @@ from models.team import Team
 from models.player import Player
 from models.roster import Roster
 from models.roster_player_a import RosterPlayerAssociation
+from models.map import Map
 from models.match_result import MatchResult
 from models.match import Match
 from models.season import Season
+from models.scrape_job import ScrapeJob, JobState
+from models.scrape_lease import ScrapeLease
+from models.rating import RosterRating, RatingHistory
+from models.standing import Standing
+from models.career import PlayerCareer
+from models.change_log import ChangeLog
+from models.generation import DataGeneration
+# Registers the search indexes to be created along with the tables
+import models.search
 
 
-__all__ = [Team, Player, Roster, RosterPlayerAssociation, MatchResult, Match, Season]
+__all__ = [Team, Player, Roster, RosterPlayerAssociation, Map, MatchResult, Match, Season, ScrapeJob, JobState, ScrapeLease, RosterRating, RatingHistory, Standing, PlayerCareer, ChangeLog, DataGeneration]
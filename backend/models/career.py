@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, Float, Boolean, Text, ForeignKey, event, text
+from sqlalchemy.engine import Connection
+import json
+
+from database import Base
+
+class PlayerCareer(Base):
+    """
+    The cached career timeline of a player, built by the career service: every roster they were on, merged into
+    contiguous spans with the record of each span. Triggers mark it stale whenever the player's memberships, or the
+    matches of any roster they were on, change, so it is only ever rebuilt when it could have changed
+    """
+    __tablename__ = "player_careers"
+
+    steam_id: Mapped[Integer] = mapped_column(ForeignKey("players.steam_id"), primary_key=True)
+    timeline: Mapped[Text] = mapped_column(Text) # JSON list of spans
+    built_at: Mapped[Float] = mapped_column(Float)
+    is_stale: Mapped[Boolean] = mapped_column(Boolean, default=False, index=True)
+
+    def spans(self) -> list[dict]:
+        return json.loads(self.timeline)
+
+CAREER_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS careers_membership_insert AFTER INSERT ON roster_association_table BEGIN
+        UPDATE player_careers SET is_stale = 1 WHERE steam_id = new.player_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS careers_membership_update AFTER UPDATE ON roster_association_table BEGIN
+        UPDATE player_careers SET is_stale = 1 WHERE steam_id IN (old.player_id, new.player_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS careers_membership_delete AFTER DELETE ON roster_association_table BEGIN
+        UPDATE player_careers SET is_stale = 1 WHERE steam_id = old.player_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS careers_result_insert AFTER INSERT ON match_results BEGIN
+        UPDATE player_careers SET is_stale = 1 WHERE is_stale = 0 AND steam_id IN (
+            SELECT player_id FROM roster_association_table WHERE roster_id = new.roster_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS careers_result_update AFTER UPDATE OF score ON match_results BEGIN
+        UPDATE player_careers SET is_stale = 1 WHERE is_stale = 0 AND steam_id IN (
+            SELECT player_id FROM roster_association_table WHERE roster_id = new.roster_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS careers_match_update AFTER UPDATE OF match_epoch ON matches BEGIN
+        UPDATE player_careers SET is_stale = 1 WHERE is_stale = 0 AND steam_id IN (
+            SELECT player_id FROM roster_association_table WHERE roster_id IN (
+                SELECT roster_id FROM match_results WHERE match_id = new.match_id));
+    END"""
+]
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_career_triggers(target, connection: Connection, **kwargs) -> None:
+    for statement in CAREER_DDL:
+        connection.execute(text(statement))
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, Index, event, text
+from sqlalchemy.engine import Connection
+
+from database import Base
+
+EXPORTED_TABLES = ["matches", "match_results", "maps", "rosters", "players", "roster_association_table", "seasons"]
+
+class ChangeLog(Base):
+    """
+    Append-only log of the rows written to the exported tables, filled by triggers so that every write path is covered.
+    The sequence number is the watermark incremental exports pick up from
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_table", "table_name", "seq"),
+        # Sequence numbers must never be reused once exported entries are dropped
+        {"sqlite_autoincrement": True}
+    )
+
+    seq: Mapped[Integer] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    table_name: Mapped[String] = mapped_column(String)
+    row_id: Mapped[Integer] = mapped_column(Integer) # rowid of the changed row
+
+def change_log_ddl(table: str) -> list[str]:
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_log_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO change_log (table_name, row_id) VALUES ('{table}', new.rowid);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_log_update AFTER UPDATE ON {table} BEGIN
+            INSERT INTO change_log (table_name, row_id) VALUES ('{table}', new.rowid);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_log_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO change_log (table_name, row_id) VALUES ('{table}', old.rowid);
+        END"""
+    ]
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_change_log_triggers(target, connection: Connection, **kwargs) -> None:
+    for table in EXPORTED_TABLES:
+        for statement in change_log_ddl(table):
+            connection.execute(text(statement))
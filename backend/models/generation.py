@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, event, text
+from sqlalchemy.engine import Connection
+
+from database import Base
+
+# Kind of data to the tables whose writes change it
+GENERATION_TABLES = {
+    "results": ["matches", "match_results", "maps"],
+    "memberships": ["roster_association_table"],
+    "ratings": ["roster_ratings", "rating_history"]
+}
+
+class DataGeneration(Base):
+    """
+    Generation of each kind of data, which in-memory caches of data derived from whole tables are keyed on. Triggers
+    replace it with a random value on every insert, update and delete of the kind's tables, so reading it is a single
+    primary key lookup, and a write that is rolled back never brings back the generation of another state
+    """
+    __tablename__ = "data_generations"
+
+    name: Mapped[String] = mapped_column(String, primary_key=True)
+    generation: Mapped[Integer] = mapped_column(Integer, default=0)
+
+def generation_ddl(name: str, table: str) -> list[str]:
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_generation_{operation.lower()} AFTER {operation} ON {table} BEGIN
+            UPDATE data_generations SET generation = random() WHERE name = '{name}';
+        END"""
+        for operation in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_generation_triggers(target, connection: Connection, **kwargs) -> None:
+    for name, tables in GENERATION_TABLES.items():
+        connection.execute(text("INSERT OR IGNORE INTO data_generations (name, generation) VALUES (:name, random())"), {"name": name})
+        for table in tables:
+            for statement in generation_ddl(name, table):
+                connection.execute(text(statement))
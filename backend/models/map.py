@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column, Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import Integer, String, select, event
+from sqlalchemy.engine import Connection
+
+from database import Base, db_session
+from utils.logger import Logger
+
+map_logger = Logger.get_logger()
+
+class Map(Base):
+    """
+    Dictionary of map names, so match results store a small integer instead of repeating the name on every row. IDs
+    are assigned by the database: the first use of a name inserts it (unless another writer already has) and reads its
+    ID back. Pairs are only cached for the process once the transaction that wrote or read them commits, until then
+    they are kept on the session, so an ID is never reused after a rollback or handed out twice by concurrent writers
+    """
+    __tablename__ = "maps"
+
+    map_id: Mapped[Integer] = mapped_column(Integer, primary_key=True)
+    map_name: Mapped[String] = mapped_column(String, unique=True, nullable=False)
+
+    IDS: dict[str, int] = {}
+    NAMES: dict[int, str] = {}
+
+    def __init__(self, map_id: int, map_name: str) -> None:
+        self.map_id = map_id
+        self.map_name = map_name
+
+    @staticmethod
+    def get(map_id: int) -> Map | None:
+        return Map.query.filter(Map.map_id == int(map_id)).first() or None
+
+    @staticmethod
+    def lookup(map_name: str, session: Session = db_session) -> int | None:
+        """
+        Gets the ID of a map name, without assigning one if it is not known yet
+        """
+        if map_name in Map.IDS:
+            return Map.IDS[map_name]
+        interned = Map.__interned(session)
+        if map_name not in interned:
+            map_id = session.execute(select(Map.map_id).where(Map.map_name == map_name)).scalar()
+            if map_id is None:
+                return None
+            interned[map_name] = map_id
+        return interned[map_name]
+
+    @staticmethod
+    def intern(map_name: str, session: Session = db_session) -> int:
+        """
+        Gets the ID of a map name, inserting the name in the session's transaction if it has not been stored before
+        """
+        map_id = Map.lookup(map_name, session)
+        if map_id is None:
+            session.execute(sqlite_insert(Map).values(map_name=map_name).on_conflict_do_nothing(index_elements=["map_name"]))
+            map_id = Map.__interned(session)[map_name] = session.execute(select(Map.map_id).where(Map.map_name == map_name)).scalar()
+        return map_id
+
+    @staticmethod
+    def name(map_id: int, session: Session = db_session) -> str | None:
+        """
+        Gets the name of a map ID
+        """
+        if map_id in Map.NAMES:
+            return Map.NAMES[map_id]
+        interned = Map.__interned(session)
+        map_name = next((name for name, id_ in interned.items() if id_ == map_id), None)
+        if map_name is None:
+            map_name = session.execute(select(Map.map_name).where(Map.map_id == map_id)).scalar()
+            if map_name is None:
+                return None
+            interned[map_name] = map_id
+        return map_name
+
+    @staticmethod
+    def forget() -> None:
+        """
+        Clears the process wide cache, e.g. once the database it was read from is discarded
+        """
+        Map.IDS.clear()
+        Map.NAMES.clear()
+
+    @staticmethod
+    def __interned(session: Session) -> dict[str, int]:
+        # Pairs read or written in the session's current transaction, not cached for the process until it commits
+        return session.info.setdefault("interned_maps", {})
+
+@event.listens_for(Session, "before_flush")
+def intern_new_maps(session: Session, flush_context, instances) -> None:
+    # Resolves the map names of new results which were not known when they were created, in the flushing session's
+    # transaction so the dictionary rows are committed (or rolled back) together with them
+    from models import MatchResult
+    for result in session.new:
+        if isinstance(result, MatchResult) and result.map_id is None and result.unresolved_map_name is not None:
+            result.map_id = Map.intern(result.unresolved_map_name, session)
+
+@event.listens_for(Session, "after_commit")
+def cache_interned_maps(session: Session) -> None:
+    for map_name, map_id in session.info.pop("interned_maps", {}).items():
+        Map.IDS[map_name] = map_id
+        Map.NAMES[map_id] = map_name
+
+@event.listens_for(Session, "after_rollback")
+def discard_interned_maps(session: Session) -> None:
+    session.info.pop("interned_maps", None)
+
+def rename_legacy_results(connection: Connection) -> bool:
+    """
+    Moves a `match_results` table from before the map dictionary (keyed by the map name) out of the way, so that the
+    current table can be created in its place. Its triggers are dropped, to be recreated on the new table
+
+    returns:
+        renamed[bool]: whether there was a legacy table to migrate
+    """
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(match_results)")}
+    if "map_name" not in columns:
+        return False
+    connection.exec_driver_sql("ALTER TABLE match_results RENAME TO match_results_legacy")
+    for (trigger,) in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'match_results_legacy'").all():
+        connection.exec_driver_sql(f"DROP TRIGGER {trigger}")
+    return True
+
+def migrate_legacy_results(connection: Connection) -> bool:
+    """
+    Rewrites the rows of the legacy `match_results` table (if there is one) into the current one, mapping every name to
+    its dictionary ID. Rows keep their rowid, so incremental exports see them as updated rather than as new rows
+
+    returns:
+        migrated[bool]: whether there was a legacy table to migrate
+    """
+    if not connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'match_results_legacy'").first():
+        return False
+    connection.exec_driver_sql("""
+        INSERT OR IGNORE INTO maps (map_name) SELECT DISTINCT map_name FROM match_results_legacy ORDER BY map_name""")
+    num_rows = connection.exec_driver_sql("""
+        INSERT INTO match_results (rowid, match_id, roster_id, map_id, score)
+        SELECT r.rowid, r.match_id, r.roster_id, m.map_id, r.score
+        FROM match_results_legacy r JOIN maps m ON m.map_name = r.map_name""").rowcount
+    connection.exec_driver_sql("DROP TABLE match_results_legacy")
+    map_logger.log_info(f"Migrated {num_rows} match results to the map dictionary")
+    return True
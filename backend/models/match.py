@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship, scoped_session
-from sqlalchemy import Integer, Boolean, Float, String, ForeignKey
+from sqlalchemy import Integer, Boolean, Float, String, ForeignKey, select, update, delete, insert, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typing import List, TYPE_CHECKING
 
 from database import Base
@@ -11,6 +12,7 @@ from utils.logger import Logger
 
 if TYPE_CHECKING:
     from models import MatchResult, Roster, Season
+    from utils.decoding import DecodedMatch
 else:
     MatchResult = "MatchResult"
     Roster = "Roster"
@@ -31,7 +33,7 @@ class Match(Base):
     match_name: Mapped[String] = mapped_column(String, nullable=True)
     was_forfeit: Mapped[Boolean] = mapped_column(Boolean, nullable=True)
 
-    season_id: Mapped[Integer] = mapped_column(ForeignKey("seasons.season_id", name="fk_season_id"), nullable=True)
+    season_id: Mapped[Integer] = mapped_column(ForeignKey("seasons.season_id", name="fk_season_id"), nullable=True, index=True)
     season: Mapped[Season] = relationship(back_populates="matches", foreign_keys=season_id)
 
     is_complete: Mapped[Boolean] = mapped_column(Boolean, default=False)
@@ -67,10 +69,12 @@ class Match(Base):
                 epoch: float | None = None,
                 name: str | None = None,
                 forfeit: bool | None = None,
-                season: SiteID | None = None) -> Match | None:
+                season: SiteID | None = None,
+                check: bool = True) -> Match | None:
 
-        # Block attempts to insert matches with the same match ID
-        if Match.get_fromsource(match_id):
+        # Block attempts to insert matches with the same match ID (unless the caller has already checked, e.g. with
+        # `existing_ids`)
+        if check and Match.get_fromsource(match_id):
             match_logger.log_warn(f"Attempting to insert match {match_id} when this match already exists")
             return None
 
@@ -121,6 +125,75 @@ class Match(Base):
 
         return True
 
+    @staticmethod
+    def write_decoded(session: scoped_session, matches: list[DecodedMatch], commit: bool = True) -> set[int]:
+        """
+        Writes a batch of decoded matches (see `utils.decoding`) with a handful of bulk statements rather than through
+        ORM objects: site IDs are resolved with one query per table, missing matches, rosters and seasons are created,
+        the matches are updated by primary key and their results upserted, with results no longer reported dropped
+
+        params:
+            session[scoped_session]: the session to write with
+            matches[list[DecodedMatch]]: the decoded matches
+            commit[bool]: whether to commit once written
+
+        returns:
+            season_ids[set[int]]: the internal IDs of the seasons the matches belong to
+        """
+        from models import MatchResult, Roster, Season, Map
+        if not matches:
+            return set()
+
+        def resolve(model, id_column, site_ids: set[int], source: TfSource) -> dict[tuple[int, int], int]:
+            # (source, site ID) to internal ID, creating whatever is missing
+            column, site_ids, resolved = model.site_column(source), list(site_ids), {}
+            for start in range(0, len(site_ids), 1000):
+                resolved.update(session.execute(select(column, id_column).where(column.in_(site_ids[start:start + 1000]))).tuples().all())
+            missing = [model(SiteID(site_id, source)) for site_id in site_ids if site_id not in resolved]
+            session.add_all(missing)
+            resolved.update((getattr(row, column.key), getattr(row, id_column.key)) for row in missing)
+            return {(int(source), site_id): id_ for site_id, id_ in resolved.items()}
+
+        match_ids, roster_ids, season_ids = {}, {}, {}
+        for source in {TfSource(match.source) for match in matches}:
+            of_source = [match for match in matches if match.source == source]
+            match_ids.update(resolve(Match, Match.match_id, {match.site_id for match in of_source}, source))
+            roster_ids.update(resolve(Roster, Roster.roster_id, {roster for match in of_source for _, roster, _ in match.results}, source))
+            season_ids.update(resolve(Season, Season.season_id, {match.season_site_id for match in of_source if match.season_site_id is not None}, source))
+        session.flush()
+
+        session.execute(update(Match), [{
+            "match_id": match_ids[match.source, match.site_id],
+            "match_epoch": match.epoch,
+            "match_name": match.name,
+            "was_forfeit": match.forfeit,
+            "season_id": season_ids.get((match.source, match.season_site_id)),
+            "is_complete": True
+        } for match in matches])
+
+        results = {(match_ids[match.source, match.site_id], roster_ids[match.source, roster], Map.intern(map_name, session)): score
+                   for match in matches for map_name, roster, score in match.results}
+
+        table = MatchResult.__table__
+        stored = set()
+        written = [match_ids[match.source, match.site_id] for match in matches]
+        for start in range(0, len(written), 1000):
+            stored.update(session.execute(select(table.c.match_id, table.c.roster_id, table.c.map_id)
+                                          .where(table.c.match_id.in_(written[start:start + 1000]))).tuples().all())
+        if stale := stored - results.keys():
+            session.execute(delete(table).where(table.c.match_id == bindparam("m"), table.c.roster_id == bindparam("r"), table.c.map_id == bindparam("p")),
+                            [{"m": m, "r": r, "p": p} for m, r, p in stale])
+        if results:
+            upsert = sqlite_insert(table)
+            upsert = upsert.on_conflict_do_update(index_elements=[table.c.match_id, table.c.roster_id, table.c.map_id],
+                                                  set_={"score": upsert.excluded.score},
+                                                  where=table.c.score.is_not(upsert.excluded.score))
+            session.execute(upsert, [{"match_id": m, "roster_id": r, "map_id": p, "score": score} for (m, r, p), score in results.items()])
+
+        if commit:
+            session.commit()
+        return {season_ids[match.source, match.season_site_id] for match in matches if match.season_site_id is not None}
+
     @staticmethod
     def get_or_insert(session: scoped_session,
                         match_id: SiteID,
@@ -134,14 +207,37 @@ class Match(Base):
 
         return match
 
+    @staticmethod
+    def site_column(source: TfSource):
+        """
+        Gets the column holding the match IDs of the given site
+        """
+        return {TfSource.RGL: Match.rgl_match_id, TfSource.ETF2L: Match.etf2l_match_id, TfSource.UGC: Match.ugc_match_id}[source]
+
     @staticmethod
     def get_fromsource(match_id: SiteID) -> Match:
-        if match_id.get_source() == TfSource.RGL:
-            return Match.query.filter(Match.rgl_match_id == match_id.get_id()).first()
-        #TODO Implement other ones
+        return Match.query.filter(Match.site_column(match_id.get_source()) == match_id.get_id()).first()
+
+    @staticmethod
+    def existing_ids(session: scoped_session, site_ids: list[SiteID]) -> set[SiteID]:
+        """
+        Finds which of the given site IDs are already stored, with one query per source and chunk of IDs rather than
+        one per ID
+        """
+        existing = set()
+        for source, column in ((TfSource.RGL, Match.rgl_match_id), (TfSource.ETF2L, Match.etf2l_match_id), (TfSource.UGC, Match.ugc_match_id)):
+            ids = [site_id.get_id() for site_id in site_ids if site_id.get_source() == source]
+            # Chunked to stay under SQLite's bound parameter limit
+            for start in range(0, len(ids), 1000):
+                existing.update(SiteID.from_ids(session.execute(select(column).where(column.in_(ids[start:start + 1000]))).scalars(), source))
+        return existing
 
     def get_site_id(self) -> SiteID:
-        return SiteID.rgl_id(self.rgl_match_id) if self.rgl_match_id is not None else SiteID(TfSource.UGC, self.rgl_match_id)
+        if self.rgl_match_id is not None:
+            return SiteID.rgl_id(self.rgl_match_id)
+        if self.etf2l_match_id is not None:
+            return SiteID.etf2l_id(self.etf2l_match_id)
+        return SiteID(self.ugc_match_id, TfSource.UGC)
 
     @staticmethod
     def get(match_id: int) -> Match | None:
@@ -162,18 +258,16 @@ class Match(Base):
             "matchName": self.match_name,
             "matchDate": self.match_epoch,
             "wasForfeit": self.was_forfeit,
-            "maps": [result.json for result in self.results]
+            "maps": [result.json() for result in self.results]
         }
 
     @staticmethod
     def get_count(league: TfSource) -> int:
-        if league == TfSource.RGL:
-            return Match.query.filter(Match.rgl_match_id is not None).count()
+        return Match.query.filter(Match.site_column(league).is_not(None)).count()
 
     @staticmethod
     def get_incomplete(league: TfSource) -> list[Match]:
-        if league == TfSource.RGL:
-            return Match.query.filter(Match.rgl_match_id is not None, not Match.is_complete).all()
+        return Match.query.filter(Match.site_column(league).is_not(None), Match.is_complete == False).all()
 
 
     @staticmethod
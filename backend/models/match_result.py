@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship, aliased
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import Integer, ForeignKey, Select, select, and_, or_
 from typing import TYPE_CHECKING
 
 from database import Base
+from models.map import Map
 
 if TYPE_CHECKING:
     from models import Roster, Match
@@ -21,7 +23,7 @@ class MatchResult(Base):
     roster_id: Mapped[Integer] = mapped_column(ForeignKey("rosters.roster_id"), primary_key=True)
     roster: Mapped[Roster] = relationship("Roster", back_populates="match_results")
 
-    map_name: Mapped[String] = mapped_column(String, primary_key=True)
+    map_id: Mapped[Integer] = mapped_column(ForeignKey("maps.map_id"), primary_key=True) # Dictionary encoded map name
 
     score: Mapped[Integer] = mapped_column(Integer)
 
@@ -32,8 +34,43 @@ class MatchResult(Base):
         self.map_name = map_name
         self.score = score
 
+    # Name of a map whose ID is not cached yet, it is interned in the session the result is flushed with
+    unresolved_map_name = None
+
+    @hybrid_property
+    def map_name(self) -> str | None:
+        return Map.name(self.map_id) if self.map_id is not None else self.unresolved_map_name
+
+    @map_name.inplace.setter
+    def _map_name_setter(self, map_name: str) -> None:
+        self.map_id = Map.IDS.get(map_name)
+        self.unresolved_map_name = None if self.map_id is not None else map_name
+
+    @map_name.inplace.expression
+    @classmethod
+    def _map_name_expression(cls):
+        return select(Map.map_name).where(Map.map_id == cls.map_id).scalar_subquery()
+
     def get(match: int, roster: int, map_: str) -> MatchResult | None:
-        return MatchResult.query.filter(MatchResult.match_id == int(match) and MatchResult.roster_id == int(roster) and MatchResult.map_name == map_).first()
+        return MatchResult.query.filter(MatchResult.match_id == int(match), MatchResult.roster_id == int(roster), MatchResult.map_id == Map.lookup(map_)).first()
+
+    @staticmethod
+    def pairs() -> Select:
+        """
+        Builds a query pairing up the two rosters' results of every played map, one row per map:
+        `(match_id, match_epoch, season_id, roster_a, roster_b, map_id, score_a, score_b)`, where `roster_a` is the
+        lower roster ID. Maps where neither roster scored (i.e. not played yet) are left out. The query can be extended
+        with further filters / ordering (or a join to `Map` for the map names) before it is executed
+        """
+        from models import Match
+        a, b = aliased(MatchResult), aliased(MatchResult)
+        return (
+            select(a.match_id, Match.match_epoch, Match.season_id, a.roster_id.label("roster_a"), b.roster_id.label("roster_b"),
+                    a.map_id, a.score.label("score_a"), b.score.label("score_b"))
+            .join(b, and_(a.match_id == b.match_id, a.map_id == b.map_id, a.roster_id < b.roster_id))
+            .join(Match, Match.match_id == a.match_id)
+            .where(or_(a.score != 0, b.score != 0))
+        )
 
     def json(self) -> dict:
         return {
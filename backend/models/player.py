@@ -54,7 +54,7 @@ class Player(Base):
                 avatar: str | None = None,
                 commit: bool = True) -> Player | None:
 
-        if Player.get_player(steam_id):
+        if Player.get(steam_id):
             player_logger.log_warn(f"Attempting to insert player {steam_id}, which is already present in the database")
             return None
 
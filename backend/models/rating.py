@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, Float, ForeignKey
+
+from database import Base
+
+class RosterRating(Base):
+    """
+    The current Elo rating of a roster, maintained by the rating service
+    """
+    __tablename__ = "roster_ratings"
+
+    roster_id: Mapped[Integer] = mapped_column(ForeignKey("rosters.roster_id"), primary_key=True)
+    rating: Mapped[Float] = mapped_column(Float)
+    matches_played: Mapped[Integer] = mapped_column(Integer, default=0)
+    last_epoch: Mapped[Float] = mapped_column(Float, nullable=True) # Date of the last rated match
+
+    @staticmethod
+    def get(roster_id: int) -> RosterRating | None:
+        return RosterRating.query.filter(RosterRating.roster_id == int(roster_id)).first() or None
+
+    def json(self) -> dict:
+        return {
+            "roster-id": self.roster_id,
+            "rating": self.rating,
+            "matches-played": self.matches_played,
+            "last-match": self.last_epoch
+        }
+
+class RatingHistory(Base):
+    """
+    One row per rated match, holding both rosters' ratings going into it. Its presence marks the match as rated, so
+    that incremental updates never apply a match twice
+    """
+    __tablename__ = "rating_history"
+
+    match_id: Mapped[Integer] = mapped_column(ForeignKey("matches.match_id"), primary_key=True)
+    roster_a: Mapped[Integer] = mapped_column(Integer)
+    roster_b: Mapped[Integer] = mapped_column(Integer)
+    rating_a: Mapped[Float] = mapped_column(Float) # Rating of roster a before the match
+    rating_b: Mapped[Float] = mapped_column(Float) # Rating of roster b before the match
+    score_a: Mapped[Float] = mapped_column(Float) # Fraction of the maps won by roster a
+    delta: Mapped[Float] = mapped_column(Float) # Rating gained by roster a (and lost by roster b)
@@ -53,6 +53,8 @@ class Roster(Base):
             self.rgl_team_id = roster_id.get_id()
         elif roster_id.get_source() == TfSource.ETF2L:
             self.etf2l_team_id = roster_id.get_id()
+        elif roster_id.get_source() == TfSource.UGC:
+            self.ugc_team_id = roster_id.get_id()
         self.team_id = team_id
         self.roster_name = name
         self.roster_tag = tag
@@ -103,16 +105,25 @@ class Roster(Base):
         success = Roster.insert(session, roster_id, commit=commit)
         if not success:
             return None
+        # Make the staged roster visible to the lookup below
+        if not commit:
+            session.flush()
         return Roster.get_fromsource(roster_id)
 
     @staticmethod
     def get(roster_id: int) -> Roster | None:
         return Roster.query.filter(Roster.roster_id == int(roster_id)).first() or None
 
+    @staticmethod
+    def site_column(source: TfSource):
+        """
+        Gets the column holding the team IDs of the given site
+        """
+        return {TfSource.RGL: Roster.rgl_team_id, TfSource.ETF2L: Roster.etf2l_team_id, TfSource.UGC: Roster.ugc_team_id}[source]
+
     @staticmethod
     def get_fromsource(roster_id: SiteID) -> Roster | None:
-        if roster_id.get_source() == TfSource.RGL:
-            return Roster.query.filter(Roster.rgl_team_id == int(roster_id.get_id())).first() or None
+        return Roster.query.filter(Roster.site_column(roster_id.get_source()) == int(roster_id.get_id())).first() or None
 
     def add_player(self, player: Player) -> bool:
         self.players.append(player)
@@ -134,4 +145,4 @@ class Roster(Base):
 
     @staticmethod
     def get_incomplete() -> list[Roster]:
-        return Roster.query.filter(Roster.rgl_team_id is not None, Roster.is_complete == 0)
+        return Roster.query.filter(Roster.rgl_team_id.is_not(None), Roster.is_complete == False)
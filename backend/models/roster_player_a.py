@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, Float, ForeignKey
+from sqlalchemy import Integer, Float, ForeignKey, Index
 from typing import TYPE_CHECKING
 
 from database import Base
@@ -15,6 +15,10 @@ else:
 class RosterPlayerAssociation(Base):
     from models import Player, Roster
     __tablename__ = "roster_association_table"
+    __table_args__ = (
+        # Players of a roster, the primary key only covers rosters of a player
+        Index("ix_roster_association_roster", "roster_id"),
+    )
     player_id: Mapped[Integer] = mapped_column(Integer, ForeignKey("players.steam_id"), primary_key=True)
     roster_id: Mapped[Integer] = mapped_column(Integer, ForeignKey("rosters.roster_id"), primary_key=True)
     joined_at: Mapped[Float] = mapped_column(Float, primary_key=True)
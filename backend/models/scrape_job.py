@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column, scoped_session
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy import Integer, Float, String, Index, UniqueConstraint, select, update, case, func, or_, and_, bindparam
+from enum import IntEnum
+import time
+
+from database import Base
+from utils.typing import SiteID, TfSource
+
+class JobState(IntEnum):
+    PENDING = 0
+    LEASED = 1
+    DONE = 2
+    FAILED = 3
+
+class ScrapeJob(Base):
+    """
+    A single durable fetch job (e.g. "fetch RGL match 32"). Jobs are claimed in batches under a lease, and marked as done
+    in the same transaction as the data they produced, so a scraper that dies mid-run resumes exactly where it stopped:
+    committed jobs are never redone, and jobs whose lease expired are handed out again
+    """
+    __tablename__ = "scrape_jobs"
+    __table_args__ = (
+        UniqueConstraint("source", "entity", "site_id", name="uq_scrape_job"),
+        Index("ix_scrape_jobs_claim", "entity", "source", "state", "priority"),
+    )
+
+    job_id: Mapped[Integer] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    source: Mapped[Integer] = mapped_column(Integer) # TfSource of the site ID
+    entity: Mapped[String] = mapped_column(String) # Kind of entity to fetch, e.g. "match" or "roster"
+    site_id: Mapped[Integer] = mapped_column(Integer) # ID of the entity on the source site
+
+    state: Mapped[Integer] = mapped_column(Integer, default=JobState.PENDING)
+    priority: Mapped[Integer] = mapped_column(Integer, default=0) # Higher priorities are claimed first
+    attempts: Mapped[Integer] = mapped_column(Integer, default=0)
+    leased_until: Mapped[Float] = mapped_column(Float, nullable=True)
+    last_error: Mapped[String] = mapped_column(String, nullable=True)
+    updated_at: Mapped[Float] = mapped_column(Float, nullable=True)
+
+    # Freshness tracking, used by the refresh scheduler to decide when the entity is due again
+    fetched_at: Mapped[Float] = mapped_column(Float, nullable=True) # When the entity was last fetched successfully
+    changed_at: Mapped[Float] = mapped_column(Float, nullable=True) # When the entity's payload last changed
+    fetch_count: Mapped[Integer] = mapped_column(Integer, default=0)
+    change_count: Mapped[Integer] = mapped_column(Integer, default=0)
+    payload_digest: Mapped[String] = mapped_column(String, nullable=True) # Digest of the last fetched payload
+
+    def get_site_id(self) -> SiteID:
+        return SiteID(self.site_id, TfSource(self.source))
+
+    @staticmethod
+    def enqueue(session: scoped_session,
+                entity: str,
+                site_ids: list[SiteID],
+                priority: int = 0,
+                commit: bool = True) -> int:
+        """
+        Adds fetch jobs for the given site IDs. Jobs that are already pending or leased are left alone (apart from being
+        bumped to the higher priority), finished or failed jobs are queued again
+
+        params:
+            session[scoped_session]: The session to stage the jobs in
+            entity[str]: The kind of entity to fetch
+            site_ids[list[SiteID]]: The IDs to fetch
+            priority[int]: The priority of the jobs, higher is claimed first
+            commit[bool]: Whether to commit the jobs or just keep them staged
+
+        returns:
+            num_queued[int]: the number of distinct jobs passed in
+        """
+        if not site_ids:
+            return 0
+        site_ids = list(dict.fromkeys(site_ids))
+
+        now = time.time()
+        # Chunked to stay under SQLite's bound parameter limit
+        for start in range(0, len(site_ids), 1000):
+            statement = insert(ScrapeJob).values([{
+                "source": int(site_id.get_source()),
+                "entity": entity,
+                "site_id": site_id.get_id(),
+                "state": JobState.PENDING,
+                "priority": priority,
+                "attempts": 0,
+                "updated_at": now
+            } for site_id in site_ids[start:start + 1000]])
+
+            is_active = ScrapeJob.state.in_([JobState.PENDING, JobState.LEASED])
+            statement = statement.on_conflict_do_update(
+                index_elements=["source", "entity", "site_id"],
+                set_={
+                    "state": case((is_active, ScrapeJob.state), else_=JobState.PENDING),
+                    "attempts": case((is_active, ScrapeJob.attempts), else_=0),
+                    "priority": func.max(ScrapeJob.priority, statement.excluded.priority),
+                    "updated_at": now
+                }
+            )
+            session.execute(statement)
+
+        if commit:
+            session.commit()
+        return len(site_ids)
+
+    @staticmethod
+    def claim(session: scoped_session,
+                entity: str,
+                source: TfSource,
+                limit: int = 100,
+                lease: float = 300,
+                shard: tuple[int, int] | None = None) -> list[ScrapeJob]:
+        """
+        Leases up to `limit` jobs, highest priority first. Pending jobs and leased jobs whose lease has expired (i.e. their
+        scraper died) can be claimed. The lease is committed straight away so that it survives a crash
+
+        params:
+            session[scoped_session]: The session to claim the jobs with
+            entity[str]: The kind of entity to claim jobs for
+            source[TfSource]: The site to claim jobs for
+            limit[int]: The maximum number of jobs to claim
+            lease[float]: Number of seconds until the claimed jobs may be handed out again
+            shard[tuple[int, int]]: Only claim jobs of this `(shard, num_shards)` (see `ScrapeLease`)
+
+        returns:
+            jobs[list[ScrapeJob]]: the claimed jobs
+        """
+        now = time.time()
+        claimable = or_(ScrapeJob.state == JobState.PENDING,
+                        (ScrapeJob.state == JobState.LEASED) & (ScrapeJob.leased_until < now))
+        if shard is not None:
+            claimable = and_(claimable, ScrapeJob.site_id % shard[1] == shard[0])
+
+        job_ids = session.execute(
+            select(ScrapeJob.job_id)
+            .where(ScrapeJob.entity == entity, ScrapeJob.source == int(source), claimable)
+            .order_by(ScrapeJob.priority.desc(), ScrapeJob.job_id)
+            .limit(limit)
+        ).scalars().all()
+
+        if not job_ids:
+            return []
+
+        session.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.job_id.in_(job_ids), claimable)
+            .values(state=JobState.LEASED, leased_until=now + lease, attempts=ScrapeJob.attempts + 1, updated_at=now)
+        )
+        session.commit()
+
+        return session.execute(
+            select(ScrapeJob)
+            .where(ScrapeJob.job_id.in_(job_ids), ScrapeJob.state == JobState.LEASED)
+            .order_by(ScrapeJob.priority.desc(), ScrapeJob.job_id)
+        ).scalars().all()
+
+    @staticmethod
+    def complete(session: scoped_session,
+                    job_ids: list[int],
+                    digests: list[str] | None = None,
+                    commit: bool = False) -> None:
+        """
+        Marks the given jobs as done. By default this is only staged so that it is committed together with the data
+        the jobs produced. If the payload digests are given, a digest that differs from the previous fetch counts as
+        a change of the entity, which the refresh scheduler uses to decide how often to fetch it again
+
+        params:
+            session[scoped_session]: The session the job data is staged in
+            job_ids[list[int]]: The jobs that have finished
+            digests[list[str]]: The digest of each job's payload, in the same order as `job_ids`
+            commit[bool]: Whether to commit straight away
+        """
+        if job_ids:
+            now = time.time()
+            table = ScrapeJob.__table__
+            digest = bindparam("b_digest", type_=String)
+            changed = and_(table.c.payload_digest.is_not(None), digest.is_not(None), table.c.payload_digest != digest)
+
+            session.execute(
+                update(table)
+                .where(table.c.job_id == bindparam("b_job_id"))
+                .values(state=JobState.DONE, leased_until=None, last_error=None, updated_at=now, fetched_at=now,
+                        fetch_count=func.coalesce(table.c.fetch_count, 0) + 1,
+                        change_count=func.coalesce(table.c.change_count, 0) + case((changed, 1), else_=0),
+                        changed_at=case((changed, now), else_=table.c.changed_at),
+                        payload_digest=func.coalesce(digest, table.c.payload_digest)),
+                [{"b_job_id": job_id, "b_digest": digest_} for job_id, digest_ in zip(job_ids, digests or [None] * len(job_ids))]
+            )
+        if commit:
+            session.commit()
+
+    @staticmethod
+    def fail(session: scoped_session,
+                job_ids: list[int],
+                error: str = "",
+                max_attempts: int = 5,
+                commit: bool = False) -> None:
+        """
+        Releases the given jobs back to the queue, or marks them as failed once they have used up `max_attempts`
+
+        params:
+            session[scoped_session]: The session to stage the change in
+            job_ids[list[int]]: The jobs that failed
+            error[str]: Description of the failure
+            max_attempts[int]: The number of attempts after which the job is given up on
+            commit[bool]: Whether to commit straight away
+        """
+        if job_ids:
+            session.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.job_id.in_(job_ids))
+                .values(state=case((ScrapeJob.attempts >= max_attempts, JobState.FAILED), else_=JobState.PENDING),
+                        leased_until=None, last_error=error or None, updated_at=time.time())
+            )
+        if commit:
+            session.commit()
+
+    @staticmethod
+    def requeue(session: scoped_session, job_ids: list[int], commit: bool = True) -> int:
+        """
+        Puts finished jobs back into the queue, e.g. once the entity they fetched is due to be refreshed
+
+        params:
+            session[scoped_session]: The session to stage the change in
+            job_ids[list[int]]: The jobs to queue again
+            commit[bool]: Whether to commit straight away
+
+        returns:
+            num_queued[int]: the number of jobs that were queued again
+        """
+        num_queued = 0
+        for start in range(0, len(job_ids), 1000):
+            num_queued += session.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.job_id.in_(job_ids[start:start + 1000]), ScrapeJob.state == JobState.DONE)
+                .values(state=JobState.PENDING, attempts=0, updated_at=time.time())
+            ).rowcount
+        if commit:
+            session.commit()
+        return num_queued
+
+    @staticmethod
+    def count(entity: str, source: TfSource, state: JobState | None = None) -> int:
+        query = ScrapeJob.query.filter(ScrapeJob.entity == entity, ScrapeJob.source == int(source))
+        if state is not None:
+            query = query.filter(ScrapeJob.state == int(state))
+        return query.count()
+
+    @staticmethod
+    def count_changed(session: scoped_session, entity: str, since: float) -> int:
+        """
+        Counts the jobs whose entity was fetched for the first time, or changed, since the given epoch, i.e. those that
+        wrote new data rather than confirming what was stored
+        """
+        return session.execute(select(func.count(ScrapeJob.job_id)).where(
+            ScrapeJob.entity == entity,
+            or_(ScrapeJob.changed_at >= since, and_(ScrapeJob.fetched_at >= since, ScrapeJob.fetch_count == 1))
+        )).scalar()
+
+    def __repr__(self) -> str:
+        return f"""JobId: {self.job_id}, Entity: {self.entity}, SourceId: {self.get_site_id()}, State: {JobState(self.state).name}, Attempts: {self.attempts}"""
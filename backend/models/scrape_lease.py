@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column, scoped_session
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy import Integer, Float, String, UniqueConstraint, select, update, or_
+import time
+
+from database import Base
+from models.scrape_job import ScrapeJob, JobState
+from utils.typing import TfSource
+
+class ScrapeLease(Base):
+    """
+    Lease of one shard of a job queue by a scrape worker, so that the workers of every node (leasing through the
+    coordinator, see `ShardWorker`) split the queue between them. A shard holds the jobs whose site ID is `shard`
+    modulo `num_shards`, which spreads the newest IDs, where most of the work is, over every shard. Workers keep their
+    leases alive with heartbeats, and the shards of a worker that stops heartbeating (i.e. died) are taken over once
+    its lease runs out
+    """
+    __tablename__ = "scrape_leases"
+    __table_args__ = (
+        UniqueConstraint("source", "entity", "num_shards", "shard", name="uq_scrape_lease"),
+    )
+
+    lease_id: Mapped[Integer] = mapped_column(Integer, primary_key=True, autoincrement=True)
+
+    source: Mapped[Integer] = mapped_column(Integer) # TfSource of the queue
+    entity: Mapped[String] = mapped_column(String) # Kind of entity of the queue, e.g. "match"
+    num_shards: Mapped[Integer] = mapped_column(Integer)
+    shard: Mapped[Integer] = mapped_column(Integer)
+
+    worker_id: Mapped[String] = mapped_column(String, nullable=True) # Holder of the lease, if any
+    leased_until: Mapped[Float] = mapped_column(Float, nullable=True)
+    heartbeat_at: Mapped[Float] = mapped_column(Float, nullable=True)
+    acquired_count: Mapped[Integer] = mapped_column(Integer, default=0)
+
+    @staticmethod
+    def in_shard(column, shard: int, num_shards: int):
+        """
+        Builds the condition that a site ID column falls in the given shard
+        """
+        return column % num_shards == shard
+
+    @staticmethod
+    def acquire(session: scoped_session,
+                worker_id: str,
+                entity: str,
+                source: TfSource,
+                num_shards: int,
+                lease: float = 60) -> int | None:
+        """
+        Leases a free shard that has jobs left to do. Shards whose lease has run out are free too: their jobs that are
+        still leased (the previous holder died before finishing them) are handed out again straight away, rather than
+        once their own lease runs out. The lease is committed straight away
+
+        params:
+            session[scoped_session]: The session to lease the shard with
+            worker_id[str]: The worker taking the lease
+            entity[str]: The kind of entity of the queue
+            source[TfSource]: The site of the queue
+            num_shards[int]: The number of shards the queue is split into
+            lease[float]: Number of seconds until the lease runs out, unless renewed by a heartbeat
+
+        returns:
+            shard[int]: the leased shard, or `None` if no free shard has jobs left
+        """
+        now = time.time()
+        session.execute(insert(ScrapeLease).values([
+            {"source": int(source), "entity": entity, "num_shards": num_shards, "shard": shard, "acquired_count": 0}
+            for shard in range(num_shards)
+        ]).on_conflict_do_nothing())
+
+        of_queue = (ScrapeLease.source == int(source), ScrapeLease.entity == entity, ScrapeLease.num_shards == num_shards)
+        is_free = or_(ScrapeLease.worker_id.is_(None), ScrapeLease.leased_until < now)
+        with_jobs = select(ScrapeJob.site_id % num_shards).where(
+            ScrapeJob.entity == entity, ScrapeJob.source == int(source), ScrapeJob.state.in_([JobState.PENDING, JobState.LEASED]))
+
+        for shard in session.execute(
+            select(ScrapeLease.shard).where(*of_queue, is_free, ScrapeLease.shard.in_(with_jobs)).order_by(ScrapeLease.shard)
+        ).scalars().all():
+            taken = session.execute(
+                update(ScrapeLease)
+                .where(*of_queue, ScrapeLease.shard == shard, is_free)
+                .values(worker_id=worker_id, leased_until=now + lease, heartbeat_at=now, acquired_count=ScrapeLease.acquired_count + 1)
+            ).rowcount
+            if taken:
+                session.execute(
+                    update(ScrapeJob)
+                    .where(ScrapeJob.entity == entity, ScrapeJob.source == int(source), ScrapeJob.state == JobState.LEASED,
+                           ScrapeLease.in_shard(ScrapeJob.site_id, shard, num_shards))
+                    .values(state=JobState.PENDING, leased_until=None, updated_at=now)
+                )
+                session.commit()
+                return shard
+
+        session.commit()
+        return None
+
+    @staticmethod
+    def heartbeat(session: scoped_session, worker_id: str, lease: float = 60) -> list[tuple[int, str, int, int]]:
+        """
+        Renews every lease the worker holds
+
+        returns:
+            leases[list[tuple]]: `(source, entity, num_shards, shard)` of the leases still held, a shard missing from it
+            was lost (its lease ran out and another worker took it over)
+        """
+        now = time.time()
+        session.execute(
+            update(ScrapeLease).where(ScrapeLease.worker_id == worker_id).values(leased_until=now + lease, heartbeat_at=now)
+        )
+        held = session.execute(
+            select(ScrapeLease.source, ScrapeLease.entity, ScrapeLease.num_shards, ScrapeLease.shard)
+            .where(ScrapeLease.worker_id == worker_id)
+        ).tuples().all()
+        session.commit()
+        return held
+
+    @staticmethod
+    def release(session: scoped_session, worker_id: str, source: TfSource | None = None, shard: int | None = None) -> None:
+        """
+        Gives up the worker's lease of a shard (or all of its leases), e.g. once the shard has no jobs left
+        """
+        conditions = [ScrapeLease.worker_id == worker_id]
+        if source is not None:
+            conditions.append(ScrapeLease.source == int(source))
+        if shard is not None:
+            conditions.append(ScrapeLease.shard == shard)
+        session.execute(update(ScrapeLease).where(*conditions).values(worker_id=None, leased_until=None))
+        session.commit()
+
+    def __repr__(self) -> str:
+        return f"""ScrapeLease: {TfSource(self.source).name} {self.entity} shard {self.shard}/{self.num_shards}, Worker: {self.worker_id}"""
@@ -0,0 +1,66 @@
+"""
+SQLite FTS5 search indexes over player and roster names. The indexes are external content tables, so they store no copy
+of the names, and triggers on the `players` and `rosters` tables keep them in sync with every insert, update and
+delete, whether it comes from the ORM or from bulk statements
+"""
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from database import Base
+
+SEARCH_TABLES = ["player_search", "roster_search"]
+
+SEARCH_DDL = [
+    # Prefix indexes make typeahead queries of 2+ characters index lookups rather than term scans
+    """CREATE VIRTUAL TABLE IF NOT EXISTS player_search USING fts5(
+        display_name, content='players', content_rowid='steam_id', prefix='2 3', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS players_search_insert AFTER INSERT ON players BEGIN
+        INSERT INTO player_search(rowid, display_name) VALUES (new.steam_id, new.display_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS players_search_delete AFTER DELETE ON players BEGIN
+        INSERT INTO player_search(player_search, rowid, display_name) VALUES ('delete', old.steam_id, old.display_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS players_search_update AFTER UPDATE OF display_name ON players BEGIN
+        INSERT INTO player_search(player_search, rowid, display_name) VALUES ('delete', old.steam_id, old.display_name);
+        INSERT INTO player_search(rowid, display_name) VALUES (new.steam_id, new.display_name);
+    END""",
+
+    """CREATE VIRTUAL TABLE IF NOT EXISTS roster_search USING fts5(
+        roster_name, roster_tag, content='rosters', content_rowid='roster_id', prefix='2 3', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS rosters_search_insert AFTER INSERT ON rosters BEGIN
+        INSERT INTO roster_search(rowid, roster_name, roster_tag) VALUES (new.roster_id, new.roster_name, new.roster_tag);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS rosters_search_delete AFTER DELETE ON rosters BEGIN
+        INSERT INTO roster_search(roster_search, rowid, roster_name, roster_tag) VALUES ('delete', old.roster_id, old.roster_name, old.roster_tag);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS rosters_search_update AFTER UPDATE OF roster_name, roster_tag ON rosters BEGIN
+        INSERT INTO roster_search(roster_search, rowid, roster_name, roster_tag) VALUES ('delete', old.roster_id, old.roster_name, old.roster_tag);
+        INSERT INTO roster_search(rowid, roster_name, roster_tag) VALUES (new.roster_id, new.roster_name, new.roster_tag);
+    END"""
+]
+
+def create_search_indexes(connection: Connection) -> bool:
+    """
+    Creates the search indexes and their triggers if they do not exist yet. Indexes created over tables that already
+    hold data are filled from them
+
+    returns:
+        created[bool]: whether the indexes were newly created
+    """
+    existing = {name for (name,) in connection.execute(
+        text(f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(repr(table) for table in SEARCH_TABLES)})"))}
+    for statement in SEARCH_DDL:
+        connection.execute(text(statement))
+    for table in SEARCH_TABLES:
+        if table not in existing:
+            connection.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+    return len(existing) < len(SEARCH_TABLES)
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_indexes(target, connection: Connection, **kwargs) -> None:
+    create_search_indexes(connection)
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_search_indexes(target, connection: Connection, **kwargs) -> None:
+    for table in SEARCH_TABLES:
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
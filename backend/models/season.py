@@ -48,6 +48,13 @@ class Season(Base):
     def get(season_id: int) -> Season | None:
         return Season.query.filter(Season.season_id == int(season_id)).first() or None
 
+    @staticmethod
+    def site_column(source: TfSource):
+        """
+        Gets the column holding the season IDs of the given site
+        """
+        return {TfSource.RGL: Season.rgl_season_id, TfSource.ETF2L: Season.etf2l_season_id, TfSource.UGC: Season.ugc_season_id}[source]
+
     @staticmethod
     def get_fromsource(event_id: SiteID) -> Season | None:
         if event_id.get_source() == TfSource.RGL:
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, ForeignKey, Index
+
+from database import Base
+
+class Standing(Base):
+    """
+    A roster's standing in a season, materialised from the season's played matches by the standing service
+    """
+    __tablename__ = "standings"
+    __table_args__ = (
+        # Serves a whole season's table, already in ranking order
+        Index("ix_standings_rank", "season_id", "wins", "map_difference"),
+    )
+
+    season_id: Mapped[Integer] = mapped_column(ForeignKey("seasons.season_id"), primary_key=True)
+    roster_id: Mapped[Integer] = mapped_column(ForeignKey("rosters.roster_id"), primary_key=True)
+
+    played: Mapped[Integer] = mapped_column(Integer, default=0) # Matches played
+    wins: Mapped[Integer] = mapped_column(Integer, default=0)
+    losses: Mapped[Integer] = mapped_column(Integer, default=0)
+    draws: Mapped[Integer] = mapped_column(Integer, default=0)
+    maps_won: Mapped[Integer] = mapped_column(Integer, default=0)
+    maps_lost: Mapped[Integer] = mapped_column(Integer, default=0)
+    map_difference: Mapped[Integer] = mapped_column(Integer, default=0) # Rounds won minus rounds lost over all maps
+    forfeits: Mapped[Integer] = mapped_column(Integer, default=0) # Played matches that were forfeited
+
+    @staticmethod
+    def get_season(season_id: int) -> list[Standing]:
+        """
+        Gets the standings of a season, best first (most wins, then best map difference)
+        """
+        return (Standing.query.filter(Standing.season_id == int(season_id))
+                .order_by(Standing.wins.desc(), Standing.map_difference.desc(), Standing.roster_id)
+                .all())
+
+    def json(self) -> dict:
+        return {
+            "roster-id": self.roster_id,
+            "played": self.played,
+            "wins": self.wins,
+            "losses": self.losses,
+            "draws": self.draws,
+            "maps-won": self.maps_won,
+            "maps-lost": self.maps_lost,
+            "map-difference": self.map_difference,
+            "forfeits": self.forfeits
+        }
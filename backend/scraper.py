@@ -1,4 +1,4 @@
-from services import test_func
+from services import test_func, scrape_leagues, discover_matches, run_coordinator, run_worker, run_daemon, redecode_archive, rebuild_ratings, rebuild_standings, cluster_teams, export_tables, build_snapshot
 from utils import Logger
 
 import sys
@@ -12,3 +12,36 @@ if __name__ == "__main__":
     if "rgl" in args:
         __logger.log_info("Scraping RGL data")
         test_func()
+    if "leagues" in args:
+        __logger.log_info("Scraping RGL, ETF2L and UGC data concurrently")
+        scrape_leagues()
+    if "discover" in args:
+        __logger.log_info("Queueing new and due matches for scrape workers")
+        discover_matches()
+    if "coordinator" in args:
+        __logger.log_info("Running as the scrape workers' coordinator")
+        run_coordinator()
+    if "worker" in args:
+        __logger.log_info("Running as a scrape worker")
+        run_worker()
+    if "daemon" in args:
+        __logger.log_info("Running as a sync daemon")
+        run_daemon()
+    if "redecode" in args:
+        __logger.log_info("Re-decoding archived API data")
+        redecode_archive()
+    if "ratings" in args:
+        __logger.log_info("Rebuilding roster ratings")
+        rebuild_ratings()
+    if "standings" in args:
+        __logger.log_info("Rebuilding season standings")
+        rebuild_standings()
+    if "teams" in args:
+        __logger.log_info("Clustering rosters into teams")
+        cluster_teams()
+    if "export" in args:
+        __logger.log_info("Exporting tables to Parquet")
+        export_tables()
+    if "snapshot" in args:
+        __logger.log_info("Building the serving snapshot")
+        build_snapshot()
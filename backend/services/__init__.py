@@ -1,9 +1,26 @@
 import services.teamservice as TeamService
 import services.matchservice as MatchService
 import services.playerservice as PlayerService
-from database import init_db, db_session
+import services.refreshservice as RefreshService
+import services.archiveservice as ArchiveService
+import services.ratingservice as RatingService
+import services.statservice as StatService
+import services.standingservice as StandingService
+import services.membershipservice as MembershipService
+import services.graphservice as GraphService
+import services.searchservice as SearchService
+import services.predictionservice as PredictionService
+import services.simulationservice as SimulationService
+import services.careerservice as CareerService
+import services.exportservice as ExportService
+import services.snapshotservice as SnapshotService
+import services.workerservice as WorkerService
+import services.syncservice as SyncService
+from database import init_db, db_session, serialize_writes
+import threading
+import os
 
-__all__ = [TeamService, MatchService, PlayerService]
+__all__ = [TeamService, MatchService, PlayerService, RefreshService, ArchiveService, RatingService, StatService, StandingService, MembershipService, GraphService, SearchService, PredictionService, SimulationService, CareerService, ExportService, SnapshotService, WorkerService, SyncService]
 
 
 def scrape_all_services() -> None:
@@ -13,6 +30,8 @@ def scrape_all_services() -> None:
     MatchService.update()
     TeamService.update()
     PlayerService.update(True)
+    CareerService.refresh_stale(db_session)
+    SnapshotService.build(db_session)
 
 def insert_all_services() -> None:
     init_db()
@@ -21,8 +40,107 @@ def insert_all_services() -> None:
     TeamService.insert_rosters(infile="data\\rgl_roster_data.json", verbose=True)
     db_session.remove()
 
+def redecode_archive() -> None:
+    """
+    Rebuilds the match and roster tables from the raw payload archive, without touching the network. Matches are
+    decoded in parallel, rosters are still replayed one by one (see `ArchiveService.redecode`)
+    """
+    init_db()
+    ArchiveService.redecode()
+    StandingService.rebuild(db_session)
+    db_session.remove()
+
+def rebuild_ratings() -> None:
+    """
+    Recomputes every roster rating from the full match history
+    """
+    init_db()
+    RatingService.rebuild(db_session)
+    db_session.remove()
+
+def rebuild_standings() -> None:
+    """
+    Recomputes the standings of every season from the full match history
+    """
+    init_db()
+    StandingService.rebuild(db_session)
+    db_session.remove()
+
+def cluster_teams() -> None:
+    """
+    Re-clusters every roster into teams by the players they share
+    """
+    init_db()
+    TeamService.cluster_rosters(db_session)
+    db_session.remove()
+
+def export_tables() -> None:
+    """
+    Appends every change since the last export to the Parquet snapshots, for analytics off the live database
+    """
+    init_db()
+    ExportService.export()
+    db_session.remove()
+
+def scrape_leagues() -> None:
+    """
+    Scrapes the matches of every league concurrently, then everything derived from them
+    """
+    init_db()
+    MatchService.scrape_leagues()
+    TeamService.update()
+    CareerService.refresh_stale(db_session)
+    SnapshotService.build(db_session)
+    db_session.remove()
+
+def discover_matches() -> None:
+    """
+    Queues the new and due matches of every league, for scrape workers to fetch. May run alongside the coordinator,
+    on its host
+    """
+    serialize_writes()
+    init_db()
+    MatchService.discover_leagues()
+    db_session.remove()
+
+def run_coordinator() -> None:
+    """
+    Serves the match job queues, shard leases and writes of this host's database to the scrape workers of every node,
+    on the `coordinator_host` and `coordinator_port` environment variables (0.0.0.0:5001 by default), until interrupted
+    """
+    from coordinator import app
+    app.run(host=os.environ.get("coordinator_host", "0.0.0.0"), port=int(os.environ.get("coordinator_port", 5001)), threaded=True)
+
+def run_worker() -> None:
+    """
+    Works through leased shards of the match job queues alongside the other scrape workers, on this node or any other,
+    until the queues are empty. The coordinator at the `coordinator_url` environment variable does every write
+    """
+    with WorkerService.CoordinatorClient() as coordinator:
+        WorkerService.ShardWorker(coordinator=coordinator).run()
+
+def run_daemon() -> None:
+    """
+    Keeps the database in sync with every league, polling for new matches until interrupted (SIGINT or SIGTERM)
+    """
+    stop = threading.Event()
+    SyncService.stop_on_signals(stop)
+    init_db()
+    SyncService.SyncDaemon().run(db_session, stop)
+    db_session.remove()
+
+def build_snapshot() -> None:
+    """
+    Rebuilds the read-only snapshot the API serves players and matches from
+    """
+    init_db()
+    SnapshotService.build(db_session)
+    db_session.remove()
+
 def test_func() -> None:
     init_db()
-    MatchService.update()
+    MatchService.scrape_rgl()
     TeamService.update()
+    CareerService.refresh_stale(db_session)
+    SnapshotService.build(db_session)
     db_session.remove()
@@ -0,0 +1,107 @@
+from multiprocessing import Pool
+from itertools import groupby
+import orjson
+import json
+import os
+
+from models import Match
+from utils.archive import PayloadArchive, read_records
+from utils.scraping import TfDataDecoder
+from utils.decoding import DecodedMatch, decode_match_payload
+from utils.typing import TfSource
+from utils.logger import Logger
+from database import db_session, UnitOfWork
+import services.teamservice as TeamService
+
+archive_logger = Logger.get_logger()
+
+def load_records(task: tuple[str, list[tuple]]) -> list[tuple[TfSource, str, dict]]:
+    """
+    Reads, decompresses and parses a chunk of records from a single segment. Runs in the worker processes
+
+    params:
+        task[tuple]: the segment path, and the `(source, entity, offset, length)` of each record to load
+
+    returns:
+        records[list[tuple]]: `(source, entity, data)` for every record, in the order given
+    """
+    path, entries = task
+    payloads = read_records(path, [(offset, length) for _, _, offset, length in entries])
+    return [(TfSource(source), entity, json.loads(payload)) for (source, entity, _, _), payload in zip(entries, payloads)]
+
+def decode_records(task: tuple[str, list[tuple]]) -> list[tuple[TfSource, str, DecodedMatch | dict | str]]:
+    """
+    Like `load_records`, but matches come back already decoded into rows (or the error message if they could not be
+    decoded), so the main process only has to write them. Runs in the worker processes
+    """
+    path, entries = task
+    payloads = read_records(path, [(offset, length) for _, _, offset, length in entries])
+    return [(TfSource(source), entity, decode_match_payload((source, payload)) if entity == "match" else orjson.loads(payload))
+            for (source, entity, _, _), payload in zip(entries, payloads)]
+
+def replay(source: TfSource, entity: str, data: dict) -> None:
+    """
+    Decodes a single archived payload and stages it in the database, as if it had just been scraped
+    """
+    if entity == "match":
+        match = TfDataDecoder.decode_match(source, data)
+        # The archive may be replayed into a database that has never seen the match
+        if not Match.get_fromsource(match.get_site_id()):
+            Match.insert(db_session, match.get_site_id(), commit=False)
+            db_session.flush()
+        match.is_complete = True
+        Match.update(db_session, match, commit=False)
+    elif entity == "roster":
+        TeamService.insert_roster(data, commit=False)
+
+def redecode(source: TfSource | None = None,
+                entity: str | None = None,
+                workers: int | None = None,
+                chunk_size: int = 1000) -> int:
+    """
+    Replays the latest archived payload of every entity through the decoder into the database, without touching the
+    network. Reading, decompressing, parsing and decoding matches is spread over a process pool, and the decoded matches
+    of each chunk are written in bulk.
+
+    Only matches are sped up this way. Roster payloads are read and parsed in the pool too, but every roster is then
+    replayed one at a time through `replay` in this process, which looks up each of its players and memberships in the
+    database, so replaying an archive that is mostly rosters takes about as long as it did serially
+
+    params:
+        source[TfSource]: only replay payloads from this site
+        entity[str]: only replay payloads of this kind of entity ("match" or "roster")
+        workers[int]: the number of worker processes (defaults to the number of cores)
+        chunk_size[int]: the number of records handed to a worker at once
+
+    returns:
+        num_replayed[int]: the number of payloads replayed
+    """
+    with PayloadArchive() as archive:
+        entries = archive.latest(source, entity)
+        tasks = []
+        for segment, records in groupby(entries, key=lambda entry: entry[4]):
+            records = [(record[0], record[1], record[5], record[6]) for record in records]
+            for start in range(0, len(records), chunk_size):
+                tasks.append((archive.segment_path(segment), records[start:start + chunk_size]))
+
+    archive_logger.log_info(f"Replaying {len(entries)} archived payloads from {len(tasks)} chunks")
+
+    num_replayed = 0
+    with Pool(workers or os.cpu_count()) as p, UnitOfWork(db_session) as uow:
+        # imap keeps segment order, so payloads are replayed in the order they were fetched
+        for records in p.imap(decode_records, tasks):
+            matches = []
+            for source_, entity_, data in records:
+                if entity_ != "match":
+                    replay(source_, entity_, data)
+                elif isinstance(data, str):
+                    archive_logger.log_error(f"Could not decode archived match: {data}")
+                else:
+                    matches.append(data)
+            Match.write_decoded(db_session, matches, commit=False)
+            uow.step(len(records))
+            num_replayed += len(records)
+            archive_logger.log_info(f"Replaying archived payloads {num_replayed * 100 / max(len(entries), 1):.2f}%", end='\r')
+
+    archive_logger.log_info(f"Replayed {num_replayed} archived payloads", start='\n')
+    return num_replayed
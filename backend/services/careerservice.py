@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from sqlalchemy import select, union_all, func
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlalchemy.orm import scoped_session
+import numpy as np
+import json
+import time
+
+from models import MatchResult, Roster, RosterPlayerAssociation, PlayerCareer
+from database import db_session
+from utils.logger import Logger
+
+career_logger = Logger.get_logger()
+
+MERGE_GAP = 24 * 60 * 60 # Memberships of the same roster less than this far apart are one span
+
+def merge_spans(memberships: list[tuple[int, float, float | None]]) -> list[list]:
+    """
+    Merges a player's memberships of the same roster that overlap or follow on from each other into single spans
+
+    params:
+        memberships[list[tuple]]: `(roster_id, joined_at, left_at)`, `left_at` being 0 or `None` while still on the roster
+
+    returns:
+        spans[list[list]]: `[roster_id, start, end]` spans ordered by start, `end` being `None` while ongoing
+    """
+    spans = []
+    last = {}
+    for roster_id, joined_at, left_at in sorted(memberships, key=lambda membership: (membership[1] or 0, membership[0])):
+        joined_at, left_at = joined_at or 0, left_at or None
+        span = last.get(roster_id)
+        if span is not None and (span[2] is None or joined_at - span[2] <= MERGE_GAP):
+            span[2] = None if span[2] is None or left_at is None else max(span[2], left_at)
+            continue
+        last[roster_id] = [roster_id, joined_at, left_at]
+        spans.append(last[roster_id])
+    return spans
+
+def load_records(session: scoped_session, roster_ids: set[int]) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+    """
+    Bulk loads the outcome of every played match of the given rosters
+
+    returns:
+        records[dict]: per roster, the sorted match epochs and the cumulative (wins, losses, draws) up to each match
+    """
+    pairs = MatchResult.pairs().subquery()
+    sides = union_all(
+        select(pairs.c.match_id, pairs.c.match_epoch, pairs.c.roster_a.label("roster_id"),
+                (pairs.c.score_a > pairs.c.score_b).label("won"), (pairs.c.score_a < pairs.c.score_b).label("lost"))
+        .where(pairs.c.roster_a.in_(roster_ids)),
+        select(pairs.c.match_id, pairs.c.match_epoch, pairs.c.roster_b,
+                pairs.c.score_b > pairs.c.score_a, pairs.c.score_b < pairs.c.score_a)
+        .where(pairs.c.roster_b.in_(roster_ids))
+    ).subquery()
+    matches = session.execute(
+        select(sides.c.roster_id, func.coalesce(sides.c.match_epoch, 0), func.sum(sides.c.won), func.sum(sides.c.lost))
+        .group_by(sides.c.match_id, sides.c.roster_id)
+        .order_by(sides.c.roster_id, sides.c.match_epoch)
+    ).all()
+
+    records = {}
+    rows = np.array(matches, dtype=np.float64).reshape(-1, 4)
+    roster_ids, starts = np.unique(rows[:, 0], return_index=True)
+    for roster_id, roster in zip(roster_ids.astype(np.int64).tolist(), np.split(rows, starts[1:])):
+        outcome = np.stack([roster[:, 2] > roster[:, 3], roster[:, 2] < roster[:, 3], roster[:, 2] == roster[:, 3]], axis=1)
+        records[roster_id] = (roster[:, 1], np.vstack([np.zeros((1, 3)), np.cumsum(outcome, axis=0)]).astype(np.int64))
+    return records
+
+def build_timelines(session: scoped_session, steam_ids: list[int]) -> dict[int, list[dict]]:
+    """
+    Builds the career timelines of the given players in bulk: their memberships merged into spans, and the record of
+    every span from the matches its roster played during it, counted by binary search over the roster's match epochs
+
+    returns:
+        timelines[dict[int, list[dict]]]: the spans of each player, oldest first
+    """
+    memberships = defaultdict(list)
+    for player_id, roster_id, joined_at, left_at in session.execute(
+        select(RosterPlayerAssociation.player_id, RosterPlayerAssociation.roster_id,
+                RosterPlayerAssociation.joined_at, RosterPlayerAssociation.left_at)
+        .where(RosterPlayerAssociation.player_id.in_(steam_ids))
+    ):
+        memberships[player_id].append((roster_id, joined_at, left_at))
+
+    roster_ids = {roster_id for player in memberships.values() for roster_id, _, _ in player}
+    records = load_records(session, roster_ids)
+    rosters = {roster_id: (team_id, name) for roster_id, team_id, name in session.execute(
+        select(Roster.roster_id, Roster.team_id, Roster.roster_name).where(Roster.roster_id.in_(roster_ids)))}
+
+    timelines = {}
+    for steam_id in steam_ids:
+        timeline = []
+        for roster_id, start, end in merge_spans(memberships.get(steam_id, [])):
+            epochs, totals = records.get(roster_id, (np.empty(0), np.zeros((1, 3), dtype=np.int64)))
+            first = np.searchsorted(epochs, start, side="left")
+            last = np.searchsorted(epochs, end, side="left") if end is not None else len(epochs)
+            wins, losses, draws = (totals[max(last, first)] - totals[first]).tolist()
+            team_id, name = rosters.get(roster_id, (None, None))
+            timeline.append({"roster-id": roster_id, "team-id": team_id, "roster-name": name, "start": start, "end": end,
+                                "matches": wins + losses + draws, "wins": wins, "losses": losses, "draws": draws})
+        timelines[steam_id] = timeline
+    return timelines
+
+def rebuild(session: scoped_session, steam_ids: list[int], commit: bool = True) -> dict[int, list[dict]]:
+    """
+    Rebuilds and stores the career timelines of the given players
+    """
+    timelines = build_timelines(session, steam_ids)
+    if timelines:
+        statement = upsert(PlayerCareer)
+        session.execute(
+            statement.on_conflict_do_update(index_elements=["steam_id"], set_={
+                "timeline": statement.excluded.timeline, "built_at": statement.excluded.built_at, "is_stale": False}),
+            [{"steam_id": steam_id, "timeline": json.dumps(timeline), "built_at": time.time(), "is_stale": False}
+                for steam_id, timeline in timelines.items()]
+        )
+    if commit:
+        session.commit()
+    return timelines
+
+def refresh_stale(session: scoped_session, batch_size: int = 1000) -> int:
+    """
+    Rebuilds every cached timeline that has been marked stale, `batch_size` players at a time
+
+    returns:
+        num_rebuilt[int]: the number of timelines rebuilt
+    """
+    num_rebuilt = 0
+    while steam_ids := session.execute(select(PlayerCareer.steam_id).where(PlayerCareer.is_stale == True).limit(batch_size)).scalars().all():
+        rebuild(session, steam_ids)
+        num_rebuilt += len(steam_ids)
+    career_logger.log_info(f"Rebuilt {num_rebuilt} stale career timelines")
+    return num_rebuilt
+
+def get_career(steam_id: int, session: scoped_session = db_session) -> list[dict]:
+    """
+    Gets the career timeline of a player, from the cache unless it is missing or stale
+    """
+    row = session.execute(select(PlayerCareer.timeline, PlayerCareer.is_stale).where(PlayerCareer.steam_id == int(steam_id))).first()
+    if row and not row.is_stale:
+        return json.loads(row.timeline)
+    return rebuild(session, [int(steam_id)])[int(steam_id)]
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from sqlalchemy import Boolean, Float, Integer, text
+from sqlalchemy.orm import scoped_session
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import json
+import os
+
+from models.change_log import EXPORTED_TABLES
+from database import Base, db_session
+from utils.logger import Logger
+
+export_logger = Logger.get_logger()
+
+BATCH_SIZE = 100000 # Rows per row group
+
+def arrow_schema(table: str) -> pa.Schema:
+    """
+    Gets the Arrow schema of an exported table: its columns, plus the `_rowid` identifying the row, the `_seq` of the
+    change that produced it (the latest version of a row has the highest `_seq`), and `_deleted` for deleted rows
+    """
+    fields = [pa.field("_rowid", pa.int64()), pa.field("_seq", pa.int64()), pa.field("_deleted", pa.bool_())]
+    for column in Base.metadata.tables[table].columns:
+        if isinstance(column.type, Boolean):
+            type_ = pa.bool_()
+        elif isinstance(column.type, Integer):
+            type_ = pa.int64()
+        elif isinstance(column.type, Float):
+            type_ = pa.float64()
+        else:
+            type_ = pa.string()
+        fields.append(pa.field(column.name, type_))
+    return pa.schema(fields)
+
+class ParquetExporter:
+    """
+    Writes columnar, zstd compressed Parquet snapshots of the scraped tables into `root`, one directory per table. The
+    first export of a table writes all of its rows, every later one appends a part holding only the rows changed since
+    (going by the change log), so the parts of a table replayed in order, keeping the highest `_seq` of each `_rowid`,
+    give its current state. The watermark of every table is kept next to the parts, in `_watermarks.json`
+
+    params:
+        root[str]: directory of the export (defaults to the `export` environment variable, or data/export)
+    """
+
+    def __init__(self, root: str | None = None) -> None:
+        self.root = root or os.environ.get("export", os.path.join("data", "export"))
+        os.makedirs(self.root, exist_ok=True)
+        self.watermark_path = os.path.join(self.root, "_watermarks.json")
+
+    def watermarks(self) -> dict[str, int]:
+        if not os.path.exists(self.watermark_path):
+            return {}
+        with open(self.watermark_path, "r") as f:
+            return json.load(f)
+
+    def __save_watermarks(self, watermarks: dict[str, int]) -> None:
+        # Written after the parts, and swapped in atomically, so a crash at worst re-exports some rows
+        with open(self.watermark_path + ".tmp", "w") as f:
+            json.dump(watermarks, f)
+        os.replace(self.watermark_path + ".tmp", self.watermark_path)
+
+    def __query(self, table: str, since: int | None) -> str:
+        columns = ", ".join(f"t.{column.name}" for column in Base.metadata.tables[table].columns)
+        if since is None:
+            return f"SELECT t.rowid, :seq, 0, {columns} FROM {table} t ORDER BY t.rowid"
+        # Only the latest version of every changed row, deleted rows coming back without their columns
+        return f"""
+            SELECT c.row_id, c.seq, t.rowid IS NULL, {columns} FROM (
+                SELECT row_id, MAX(seq) AS seq FROM change_log WHERE table_name = '{table}' AND seq > :since AND seq <= :seq
+                GROUP BY row_id
+            ) c LEFT JOIN {table} t ON t.rowid = c.row_id ORDER BY c.row_id"""
+
+    def export_table(self, session: scoped_session, table: str, seq: int, since: int | None) -> int:
+        """
+        Writes the rows of `table` changed in `(since, seq]` (or all of them if `since` is `None`) as a new part
+
+        returns:
+            num_rows[int]: the number of rows written
+        """
+        schema = arrow_schema(table)
+        path = os.path.join(self.root, table, f"part-{(since or 0) + 1:012d}-{seq:012d}.parquet")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        num_rows = 0
+        result = session.execute(text(self.__query(table, since)), {"seq": seq, "since": since or 0})
+        writer = None
+        try:
+            while rows := result.fetchmany(BATCH_SIZE):
+                if writer is None:
+                    writer = pq.ParquetWriter(path + ".tmp", schema, compression="zstd")
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array([bool(value) if value is not None else None for value in column], pa.bool_()) if field.type == pa.bool_()
+                        else pa.array(column, field.type) for column, field in zip(columns, schema)], schema=schema))
+                num_rows += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None:
+            os.replace(path + ".tmp", path)
+        return num_rows
+
+    def export(self, session: scoped_session, tables: list[str] = EXPORTED_TABLES) -> dict[str, int]:
+        """
+        Exports every table's changes since its last export, then drops the change log entries every table has been
+        exported past
+
+        returns:
+            num_rows[dict[str, int]]: the number of rows written per table
+        """
+        seq = session.execute(text("SELECT COALESCE(MAX(seq), 0) FROM change_log")).scalar()
+        watermarks = self.watermarks()
+        num_rows = {}
+        for table in tables:
+            since = watermarks.get(table)
+            if since is not None and since >= seq:
+                num_rows[table] = 0
+                continue
+            num_rows[table] = self.export_table(session, table, seq, since)
+            watermarks[table] = seq
+            self.__save_watermarks(watermarks)
+            export_logger.log_info(f"Exported {num_rows[table]} rows of {table}")
+
+        # Only one export directory is kept up to date, so the log is only needed past the oldest watermark
+        if all(table in watermarks for table in EXPORTED_TABLES):
+            session.execute(text("DELETE FROM change_log WHERE seq <= :seq"), {"seq": min(watermarks[table] for table in EXPORTED_TABLES)})
+            session.commit()
+        return num_rows
+
+    def read(self, table: str) -> pa.Table:
+        """
+        Reads the current state of an exported table from its parts: the latest version of every row, without deleted rows
+        """
+        directory = os.path.join(self.root, table)
+        parts = sorted(name for name in os.listdir(directory) if name.endswith(".parquet")) if os.path.isdir(directory) else []
+        if not parts:
+            return arrow_schema(table).empty_table()
+        rows = pa.concat_tables([pq.read_table(os.path.join(directory, part)) for part in parts])
+        latest = rows.group_by("_rowid").aggregate([("_seq", "max")])
+        rows = rows.join(latest, keys=["_rowid", "_seq"], right_keys=["_rowid", "_seq_max"], join_type="inner")
+        return rows.filter(pc.invert(rows["_deleted"])).sort_by("_rowid")
+
+def export(root: str | None = None, session: scoped_session = db_session) -> dict[str, int]:
+    """
+    Exports every scraped table's changes since the last export to Parquet
+    """
+    return ParquetExporter(root).export(session)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+import numpy as np
+
+from models import MatchResult, Match
+from utils.graph import CsrGraph
+from database import db_session, data_generation
+import services.membershipservice as MembershipService
+
+def load_lineups(session: scoped_session) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Gets the lineup of every roster in every match, from the rosters' memberships at the time of the match
+
+    returns:
+        (match, roster, player[np.ndarray]): one row per player per match, sorted by match
+    """
+    index = MembershipService.get_index(session)
+    matches, rosters, players = [], [], []
+    for match_id, roster_id, epoch in session.execute(
+        select(MatchResult.match_id, MatchResult.roster_id, Match.match_epoch)
+        .join(Match, Match.match_id == MatchResult.match_id)
+        .group_by(MatchResult.match_id, MatchResult.roster_id)
+        .order_by(MatchResult.match_id)
+    ):
+        lineup = index.roster_players(roster_id, epoch or 0)
+        matches += [match_id] * len(lineup)
+        rosters += [roster_id] * len(lineup)
+        players += lineup
+    return np.array(matches, dtype=np.int64), np.array(rosters, dtype=np.int64), np.array(players, dtype=np.int64)
+
+def build_graph(match: np.ndarray, roster: np.ndarray, player: np.ndarray) -> CsrGraph:
+    """
+    Builds the player graph from match lineups (sorted by match). Every pair of players in a match gets an edge, with a
+    `together` weight counting the matches they played on the same roster and an `against` weight counting the
+    matches they played on opposing rosters
+    """
+    if not len(player):
+        return CsrGraph.from_edges(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                                    {"together": np.empty(0, dtype=np.int64), "against": np.empty(0, dtype=np.int64)})
+    keys, player = np.unique(player, return_inverse=True)
+    # A player listed on both rosters of a match only counts once
+    rows = np.unique(np.stack([match, player, roster], axis=1), axis=0)
+    _, first = np.unique(rows[:, :2], axis=0, return_index=True)
+    match, player, roster = rows[first].T
+
+    # Pair every row with every row of the same match, vectorised over all matches at once
+    _, starts, sizes = np.unique(match, return_index=True, return_counts=True)
+    group_size = np.repeat(sizes, sizes)
+    group_start = np.repeat(starts, sizes)
+    left = np.repeat(np.arange(len(match)), group_size)
+    offset = np.arange(len(left)) - np.repeat(np.cumsum(group_size) - group_size, group_size)
+    right = np.repeat(group_start, group_size) + offset
+
+    keep = player[left] < player[right]
+    left, right = left[keep], right[keep]
+    a, b = player[left], player[right]
+    same = roster[left] == roster[right]
+
+    edges, edge = np.unique(a * len(keys) + b, return_inverse=True)
+    edge = edge.reshape(-1)
+    return CsrGraph.from_edges(keys, edges // len(keys), edges % len(keys), {
+        "together": np.bincount(edge, weights=same, minlength=len(edges)).astype(np.int64),
+        "against": np.bincount(edge, weights=~same, minlength=len(edges)).astype(np.int64)
+    })
+
+_cache = {"generation": None, "graph": None}
+
+def get_graph(session: scoped_session = db_session) -> CsrGraph:
+    """
+    Gets the player graph, only rebuilding it when matches or memberships have changed. Both generations are single
+    row lookups, so a cached graph is served without touching the tables it was built from
+    """
+    generation = (data_generation(session), data_generation(session, "memberships"))
+    if _cache["generation"] != generation:
+        _cache.update(generation=generation, graph=build_graph(*load_lineups(session)))
+    return _cache["graph"]
+
+def top_players(player_id: int, weight: str = "together", k: int = 10, session: scoped_session = db_session) -> list[dict] | None:
+    """
+    Gets the `k` players a player has played the most matches with (`together`) or against (`against`)
+
+    returns:
+        players[list[dict] | None]: the players and their number of matches, or `None` if the player has no matches
+    """
+    graph = get_graph(session)
+    i = graph.index(int(player_id))
+    if i is None:
+        return None
+    return [{"steam-id": steam_id, "matches": matches} for steam_id, matches in graph.top(i, weight, k)]
+
+def connection(player_id: int, other_id: int, max_depth: int | None = None, session: scoped_session = db_session) -> list[int] | None:
+    """
+    Gets a shortest chain of players connecting two players, each having played with or against the next
+    """
+    graph = get_graph(session)
+    source, target = graph.index(int(player_id)), graph.index(int(other_id))
+    if source is None or target is None:
+        return None
+    return graph.shortest_path(source, target, max_depth)
+
+def ego_network(player_id: int, n: int = 25, session: scoped_session = db_session) -> dict | None:
+    """
+    Gets the network around a player: their `n` most played with or against players, and every edge between them
+
+    returns:
+        network[dict | None]: the nodes and the edges of the network, or `None` if the player has no matches
+    """
+    graph = get_graph(session)
+    i = graph.index(int(player_id))
+    if i is None:
+        return None
+    neighbours, together = graph.neighbours(i, "together")
+    _, against = graph.neighbours(i, "against")
+    total = together + against
+    if len(total) > n:
+        neighbours = neighbours[np.argpartition(-total, n - 1)[:n]]
+
+    keys, a, b, weights = graph.subgraph(np.append(neighbours, i))
+    return {
+        "nodes": keys.tolist(),
+        "edges": [{"a": a_, "b": b_, "together": t, "against": v}
+                    for a_, b_, t, v in zip(a.tolist(), b.tolist(), weights["together"].tolist(), weights["against"].tolist())]
+    }
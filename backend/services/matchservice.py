@@ -1,12 +1,94 @@
+from __future__ import annotations
+
 from utils.logger import Logger
-from utils.scraping import post_request, scrape_parallel
-from utils.typing import SiteID, TfSource, TfDataDecoder
+from utils.scraping import post_request, HostClient
+from utils.decoding import DecodePool, DecodedMatch
+from utils.http_cache import HttpCache
+from utils.archive import PayloadArchive
+from utils.typing import SiteID, TfSource
+from utils.bloom import BloomFilter
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import scoped_session
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Callable, NamedTuple
+import numpy as np
+import threading
+import queue
+import time
+import os
 
-from models import Match
+from models import Match, ScrapeJob, JobState
 from database import db_session
+from services.refreshservice import schedule_matches
+import services.ratingservice as RatingService
+import services.standingservice as StandingService
 
 match_logger = Logger.get_logger()
 
+class SeenFilter:
+    """
+    Bloom filter of the site IDs of every stored match, so that match ID discovery only queries the database for IDs
+    that may already be stored: an ID the filter has never seen is definitely new. The filter is kept next to the
+    database file, along with how far into the matches table it is up to date, and caught up with the rows added
+    since whenever it is loaded
+
+    params:
+        path[str]: where the filter is kept (defaults to the `seen_filter` environment variable, or next to the
+        database, nowhere for in-memory databases)
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        database = os.environ.get("db", "dev.db")
+        self.path = path or os.environ.get("seen_filter", None if database == ":memory:" else database + ".seen")
+        self.bloom = None
+        self.watermark = 0 # Highest match rowid in the filter
+        self.rows = 0 # Number of matches in the filter
+
+    @staticmethod
+    def keys(site_ids: list[SiteID]) -> np.ndarray:
+        return np.array([(int(site_id.get_source()) << 40) | site_id.get_id() for site_id in site_ids], dtype=np.int64)
+
+    def sync(self, session: scoped_session) -> None:
+        """
+        Loads the filter (or builds it from the database), then adds the matches stored since it was last synced.
+        Rebuilds it if matches were added below its watermark or deleted, or if it has outgrown its capacity
+        """
+        if self.bloom is None and self.path and (loaded := BloomFilter.load(self.path)):
+            self.bloom, metadata = loaded
+            self.watermark, self.rows = metadata.get("watermark", 0), metadata.get("rows", 0)
+
+        num_rows = session.execute(select(func.count(Match.match_id))).scalar()
+        num_new = session.execute(select(func.count(Match.match_id)).where(Match.match_id > self.watermark)).scalar()
+        if self.bloom is None or self.rows + num_new != num_rows or num_rows > self.bloom.capacity:
+            self.bloom = BloomFilter(max(2 * num_rows, 100000))
+            self.watermark = self.rows = 0
+
+        for rowid, rgl_id, etf2l_id, ugc_id in session.execute(
+            select(Match.match_id, Match.rgl_match_id, Match.etf2l_match_id, Match.ugc_match_id).where(Match.match_id > self.watermark)
+        ):
+            site_ids = [SiteID(id_, source) for id_, source in ((rgl_id, TfSource.RGL), (etf2l_id, TfSource.ETF2L), (ugc_id, TfSource.UGC))
+                        if id_ is not None]
+            if site_ids:
+                self.bloom.add(SeenFilter.keys(site_ids))
+            self.watermark = max(self.watermark, rowid)
+            self.rows += 1
+
+    def new_ids(self, session: scoped_session, site_ids: list[SiteID]) -> list[SiteID]:
+        """
+        Gets the site IDs that are not stored yet. Only the IDs the filter may have seen are looked up, in one batch
+        """
+        if not site_ids:
+            return []
+        possibly_seen = self.bloom.contains(SeenFilter.keys(site_ids)).tolist()
+        existing = Match.existing_ids(session, [site_id for site_id, seen in zip(site_ids, possibly_seen) if seen])
+        return [site_id for site_id in site_ids if site_id not in existing]
+
+    def save(self) -> None:
+        if self.path and self.bloom is not None:
+            self.bloom.save(self.path, {"watermark": self.watermark, "rows": self.rows})
+
 def scrape_rgl_match_page(start: int, take: int = 1000) -> list:
     """
     Scrape a single match page from RGL and return the match IDs found
@@ -20,66 +102,622 @@ def scrape_rgl_match_page(start: int, take: int = 1000) -> list:
     """
     _, response = post_request("https://api.rgl.gg/v0/matches/paged", default=[], take=str(take), skip=str(start))
 
-    return [SiteID(data["matchId"], TfSource.RGL) for data in response]
+    return SiteID.rgl_ids(data["matchId"] for data in response)
 
-def scrape_rgl_match_ids() -> int:
+def scrape_rgl_match_ids(seen_filter: SeenFilter | None = None) -> int:
     """
     Scrapes a set containing the IDs of all RGL matches played since its inception.
+
+    params:
+        seen_filter[SeenFilter]: the filter of stored match IDs to check against, kept by callers that discover
+        repeatedly (loaded from disk if not given)
+
+    returns:
+        num_new[int]: the number of new matches
+    """
+    with RglLeague() as league:
+        league.seen_filter = seen_filter or league.seen_filter
+        return league.discover_ids(db_session)
+
+class MatchIdWriter:
     """
-    match_logger.log_info("Scraping rgl match IDs")
+    Writes the pages of match IDs a league's discovery comes across: the IDs not stored yet are inserted, and their
+    detail fetches queued in the same commit, one commit per page, so that no match can be lost between pages
 
-    # Get the data from after the last match stored in the database
-    num_stored = Match.get_count(TfSource.RGL)
-    next_match_data = scrape_rgl_match_page(num_stored)
+    params:
+        session[scoped_session]: the session to write with
+        source[TfSource]: the league the IDs are of
+        seen_filter[SeenFilter]: the filter of stored match IDs to check against (loaded from disk if not given)
+    """
 
-    # If no data returned then we are up to date
-    if not next_match_data:
-        match_logger.log_info("No new matches found")
-        return 0
+    def __init__(self, session: scoped_session, source: TfSource, seen_filter: SeenFilter | None = None) -> None:
+        self.session = session
+        self.source = source
+        self.seen_filter = seen_filter or SeenFilter()
+        self.seen_filter.sync(session)
+        self.seen = set()
+        self.num_stored = self.start = session.execute(
+            select(func.count(Match.match_id)).where(Match.site_column(source).is_not(None))).scalar()
 
-    # While we are getting data from the endpoint, add it to the database
-    while next_match_data:
-        for _id in next_match_data:
+    def write(self, site_ids: list[SiteID]) -> tuple[int, int]:
+        """
+        Writes a page of match IDs
+
+        returns:
+            (num_new[int], num_stored[int]): the number of new matches on the page, and of matches of the league stored
+        """
+        new_ids = []
+        # Pages shift as matches are added while paging, so the same IDs can come back on the next page
+        page = [_id for _id in dict.fromkeys(site_ids) if _id not in self.seen]
+        self.seen.update(page)
+        for _id in self.seen_filter.new_ids(self.session, page):
             match_logger.log_info(f"Inserting match with ID {_id.get_id()}", end='\r')
-            Match.insert(db_session, _id, commit=False)
-        db_session.commit()
-        # Offset request by number of matches in database
-        next_match_data = scrape_rgl_match_page(Match.get_count(TfSource.RGL))
+            if Match.insert(self.session, _id, commit=False, check=False):
+                new_ids.append(_id)
+        ScrapeJob.enqueue(self.session, "match", new_ids, commit=False)
+        self.session.commit()
+        self.num_stored += len(new_ids)
+        return len(new_ids), self.num_stored
 
-    match_logger.log_info(f"Added {Match.get_count(TfSource.RGL) - num_stored} new matches to the database")
+    def close(self) -> int:
+        """
+        Catches the seen filter up with the written matches and saves it
 
-def scrape_rgl_matches(rgl_ids: list[int]):
-    match_logger.log_info("Scraping match details from RGL website")
-    to_scrape = [f"https://api.rgl.gg/v0/matches/{_id}" for _id in rgl_ids]
-    num_added = 0
+        returns:
+            num_new[int]: the number of new matches written
+        """
+        self.seen_filter.sync(self.session)
+        self.seen_filter.save()
+        num_new = self.num_stored - self.start
+        match_logger.log_info(f"Added {num_new} new {self.source.name} matches to the database")
+        return num_new
+
+class MatchBatch(NamedTuple):
+    """
+    A batch of fetched match jobs once decoded: the matches to write, the jobs that are done along with the digest of
+    their payload (`None` if unchanged since the last fetch), and the jobs that failed. Plain rows, so that a remote
+    scrape worker can hand it to the coordinator as JSON (see `services.workerservice`)
+    """
+    matches: list[DecodedMatch]
+    done: list[int]
+    digests: list[str | None]
+    failed: list[int] # Could not be decoded
+    unreachable: list[int] # Could not be fetched
+    num_unchanged: int
+
+    def json(self) -> dict:
+        return {
+            'matches': [list(match) for match in self.matches],
+            'done': self.done,
+            'digests': self.digests,
+            'failed': self.failed,
+            'unreachable': self.unreachable,
+            'num-unchanged': self.num_unchanged
+        }
+
+    @staticmethod
+    def from_json(data: dict) -> MatchBatch:
+        matches = [DecodedMatch(*match) for match in data['matches']]
+        return MatchBatch([match._replace(results=tuple(tuple(result) for result in match.results)) for match in matches],
+                          data['done'], data['digests'], data['failed'], data['unreachable'], data['num-unchanged'])
+
+def decode_match_responses(fetched: list[tuple[tuple[TfSource, int, int], str, object]],
+                            cache: HttpCache,
+                            archive: PayloadArchive,
+                            decoder: DecodePool) -> MatchBatch:
+    """
+    Decodes the fetched match details of a batch of jobs, of any mix of leagues: unchanged payloads are skipped, the
+    others archived and decoded in the decode workers. Nothing is written to the database, see `write_match_batch`
+
+    params:
+        fetched[list[tuple]]: `((source, job_id, site_id), url, response)` of every fetched job, `response` being
+        `None` if the host could not be reached
+
+    returns:
+        batch[MatchBatch]: the decoded matches, and which jobs are done or failed
+    """
+    done, digests, unreachable, to_decode = [], [], [], {}
+    for (source, job_id, site_id), url, response in fetched:
+        if response is None or response.status_code not in (200, 304):
+            match_logger.log_warn(f"Could not fetch {url}: {'unreachable' if response is None else response.status_code}")
+            unreachable.append(job_id)
+            continue
+        # Unchanged since the last fetch, so there is nothing to archive, decode or write
+        if response.status_code == 304 or not cache.store(url, response.headers, response.content):
+            if response.status_code == 304:
+                cache.touch(url)
+            done.append(job_id)
+            digests.append(None)
+            continue
+        archive.append(source, "match", site_id, response.content)
+        to_decode.setdefault(source, []).append((job_id, site_id, url, response.content))
+    num_unchanged = len(done)
+
+    # Parsing and decoding happens in the decode workers, only the writes are left to this process
+    matches, failed = [], []
+    for source, jobs in to_decode.items():
+        for (job_id, site_id, url, _), match in zip(jobs, decoder.decode_matches(source, [content for _, _, _, content in jobs])):
+            if isinstance(match, str):
+                match_logger.log_error(f"Could not decode {source.name} match {site_id}: {match}")
+                cache.invalidate(url)
+                failed.append(job_id)
+                continue
+            matches.append(match)
+            done.append(job_id)
+            digests.append(match.digest)
+    archive.commit()
+    return MatchBatch(matches, done, digests, failed, unreachable, num_unchanged)
+
+def write_match_batch(session: scoped_session, batch: MatchBatch) -> set[int]:
+    """
+    Stages a decoded batch of match jobs: the matches are written in bulk along with the change they make to the
+    standings, and every job is marked as done or released
+
+    params:
+        session[scoped_session]: the session to stage the matches and jobs in
+        batch[MatchBatch]: the decoded batch
+
+    returns:
+        season_ids[set[int]]: the seasons of the written matches
+    """
+    # Standings are updated by the difference each written match makes, rather than recomputed over whole seasons
+    written = [SiteID(match.site_id, TfSource(match.source)) for match in batch.matches]
+    before = StandingService.match_contributions(session, written)
+    seasons = Match.write_decoded(session, batch.matches, commit=False)
+    StandingService.apply_changes(session, before, StandingService.match_contributions(session, written))
+    ScrapeJob.complete(session, batch.done, batch.digests)
+    ScrapeJob.fail(session, batch.failed, error="decode error")
+    ScrapeJob.fail(session, batch.unreachable, error="fetch error")
+    return seasons
+
+class JobQueue:
+    """
+    The match job queue that `scrape_match_details` works through, and where the decoded batches go: the database
+    of this process. A scrape worker on another node swaps in the coordinator instead (see
+    `services.workerservice.CoordinatorClient`)
+
+    params:
+        session[scoped_session]: the session to claim and write with
+    """
+    def __init__(self, session: scoped_session):
+        self.session = session
+
+    def count(self, source: TfSource) -> int:
+        return ScrapeJob.count("match", source, JobState.PENDING)
+
+    def remaining(self, sources: list[TfSource]) -> int:
+        """
+        Counts the match jobs of the leagues that are not done yet: pending, or leased by a worker still on them
+        """
+        num_left = self.session.execute(select(func.count(ScrapeJob.job_id)).where(
+            ScrapeJob.entity == "match", ScrapeJob.source.in_([int(source) for source in sources]),
+            ScrapeJob.state.in_([JobState.PENDING, JobState.LEASED]))).scalar()
+        # Nothing is held while waiting, the write lock of the database included
+        self.session.commit()
+        return num_left
+
+    def fail_pending(self, source: TfSource, error: str) -> int:
+        """
+        Fails every pending match job of a league for good
+
+        returns:
+            num_failed[int]: the number of jobs failed
+        """
+        pending = self.session.execute(select(ScrapeJob.job_id).where(
+            ScrapeJob.entity == "match", ScrapeJob.source == int(source), ScrapeJob.state == JobState.PENDING)).scalars().all()
+        ScrapeJob.fail(self.session, pending, error=error, max_attempts=0, commit=True)
+        return len(pending)
+
+    def claim(self, source: TfSource, limit: int, shard: tuple[int, int] | None = None) -> list[tuple[int, int, int]]:
+        """
+        Claims match jobs of a league (see `ScrapeJob.claim`)
+
+        returns:
+            jobs[list[tuple[int, int, int]]]: `(job_id, site_id, fetch_count)` of every claimed job
+        """
+        jobs = [(job.job_id, job.site_id, job.fetch_count) for job in ScrapeJob.claim(self.session, "match", source, limit=limit, shard=shard)]
+        # No transaction is left open while fetching
+        self.session.commit()
+        return jobs
+
+    def write(self, batch: MatchBatch) -> set[int]:
+        """
+        Writes and commits a decoded batch (see `write_match_batch`)
+        """
+        try:
+            seasons = write_match_batch(self.session, batch)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        # Only the batch in hand is kept in the identity map
+        self.session.expunge_all()
+        return seasons
+
+    def update_ratings(self) -> None:
+        RatingService.update(self.session)
+
+def scrape_match_details(session: scoped_session | None,
+                            leagues: list[League],
+                            batch_size: int = 90,
+                            workers: int | None = None,
+                            shard: tuple[int, int] | None = None,
+                            stop: threading.Event | None = None,
+                            update_ratings: bool = True,
+                            decoder: DecodePool | None = None,
+                            linger: float = 2,
+                            cache: HttpCache | None = None,
+                            archive: PayloadArchive | None = None,
+                            job_queue: JobQueue | None = None) -> dict[TfSource, int]:
+    """
+    Works through the match job queues of several leagues at once. Every league fetches on its own host client (and
+    so at its own rate), topped up with `batch_size` jobs at a time, while this process ingests whatever has been
+    fetched, from any league, in batches of up to `batch_size` responses, waiting up to `linger` seconds for a batch to
+    fill so that slow hosts do not turn every write into a batch of one. A multi-league sync therefore takes as long as the slowest league. Each job
+    is marked as done in the same commit as its match data, so an interrupted run picks up exactly where it stopped.
+    Every batch is committed before waiting on the network again, so no transaction is left open while fetching
+
+    params:
+        session[scoped_session]: the session to write with (unused if a `job_queue` is given)
+        leagues[list[League]]: the leagues to scrape
+        batch_size[int]: how many jobs to claim (and ingest) at once
+        workers[int]: the number of decode worker processes (defaults to the number of cores)
+        shard[tuple[int, int]]: only scrape the jobs of this `(shard, num_shards)` (see `ScrapeLease`)
+        stop[threading.Event]: once set, no more jobs are claimed, and the jobs in flight are finished
+        update_ratings[bool]: whether to rate the newly played matches once done
+        decoder[DecodePool]: a decode pool that is already running, e.g. kept by a long running sync (otherwise one
+        with `workers` processes is started for the run)
+        linger[float]: how many seconds to wait for more responses before ingesting a batch that is not full
+        cache[HttpCache]: an HTTP cache that is already open, e.g. kept by a long running sync (otherwise the one at
+        the default path is opened for the run)
+        archive[PayloadArchive]: a payload archive that is already open (otherwise the one at the default path is
+        opened for the run)
+        job_queue[JobQueue]: where jobs are claimed and decoded batches written (defaults to the database of
+        `session`)
 
-    for result in scrape_parallel(to_scrape, 9):
-        num_added += len(result)
-        match_logger.log_info(f"Scraping detailed matches {(num_added*100) / len(to_scrape):.2f}%, ({num_added} / {len(to_scrape)})", end='\r')
-        for match_data in result:
-            new_match = TfDataDecoder.decode_match(TfSource.RGL, match_data)
-            Match.update(new_match, commit=False)
-        db_session.commit()
+    returns:
+        num_scraped[dict[TfSource, int]]: the number of matches scraped of each league
+    """
+    job_queue = JobQueue(session) if job_queue is None else job_queue
+    num_scraped = {league.source: 0 for league in leagues}
+    # Jobs of leagues without a match API could never be fetched, so they are failed rather than claimed
+    for league in [league for league in leagues if not league.has_match_api]:
+        if num_failed := job_queue.fail_pending(league.source, "no match API"):
+            match_logger.log_warn(f"Failed {num_failed} {league.source.name} match jobs, {league.source.name} has no match API")
+    leagues = [league for league in leagues if league.has_match_api]
+
+    fetched = queue.Queue()
+    in_flight = {league.source: 0 for league in leagues}
+    num_to_scrape = sum(job_queue.count(league.source) for league in leagues)
+    num_unchanged = 0
+    exhausted = set()
+
+    def claim(league: League) -> None:
+        if stop is not None and stop.is_set():
+            exhausted.add(league.source)
+            return
+        jobs = job_queue.claim(league.source, batch_size, shard)
+        if not jobs:
+            exhausted.add(league.source)
+        for job_id, site_id, fetch_count in jobs:
+            url = league.match_url(site_id)
+            # Matches that were never written to this database are always fetched and decoded in full
+            if not fetch_count:
+                cache.invalidate(url)
+            league.client.submit(url, cache.headers(url),
+                                 lambda url, response, job=(league.source, job_id, site_id): fetched.put((job, url, response)))
+        in_flight[league.source] += len(jobs)
+
+    with (HttpCache() if cache is None else nullcontext(cache) as cache,
+            PayloadArchive() if archive is None else nullcontext(archive) as archive,
+            DecodePool(workers) if decoder is None else nullcontext(decoder) as decoder):
+        for league in leagues:
+            claim(league)
+
+        while any(in_flight.values()):
+            batch = [fetched.get()]
+            deadline = time.monotonic() + linger
+            # No point waiting once every response in flight is in the batch
+            while len(batch) < min(batch_size, sum(in_flight.values())):
+                try:
+                    batch.append(fetched.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            # Standings are written in the same commit as their matches, and the cache only made durable once they are
+            decoded = decode_match_responses(batch, cache, archive, decoder)
+            job_queue.write(decoded)
+            cache.commit()
+            num_unchanged += decoded.num_unchanged
+            for (source, _, _), _, _ in batch:
+                in_flight[source] -= 1
+                num_scraped[source] += 1
+                # Jobs that failed were released, and may be claimed again
+                exhausted.discard(source)
+
+            # Leagues running low on jobs are topped up, so that no host sits idle
+            for league in leagues:
+                if league.source not in exhausted and in_flight[league.source] <= batch_size // 2:
+                    claim(league)
 
-    match_logger.log_info(f"Added {num_added} new detailed match data", start='\n')
+            total = sum(num_scraped.values())
+            match_logger.log_info(f"Scraping detailed matches {(total*100) / max(num_to_scrape, total, 1):.2f}%, ({total} / {num_to_scrape})", end='\r')
 
+    # Rate the newly played matches on top of the current ratings
+    if update_ratings:
+        job_queue.update_ratings()
+    match_logger.log_info(f"Added {sum(num_scraped.values()) - num_unchanged} new detailed match data ({num_unchanged} unchanged)", start='\n')
+    return num_scraped
+
+def scrape_rgl_matches(batch_size: int = 90, workers: int | None = None) -> int:
+    """
+    Works through the queue of RGL match jobs, claiming `batch_size` jobs at a time
+
+    params:
+        batch_size[int]: how many jobs to claim at once
+        workers[int]: the number of decode worker processes (defaults to the number of cores)
+
+    returns:
+        num_scraped[int]: the number of matches scraped
+    """
+    match_logger.log_info("Scraping match details from RGL website")
+    with RglLeague() as league:
+        num_scraped = scrape_match_details(db_session, [league], batch_size, workers)[TfSource.RGL]
+    db_session.remove()
+    return num_scraped
 
 def scrape_rgl() -> int:
+    return scrape_leagues([TfSource.RGL]).get(TfSource.RGL, 0)
+
+class League:
+    """
+    Source adapter of a single league: how its new matches are discovered, where the details of a match are fetched
+    from, and the rate its API is sent requests at (every league has its own host client)
+    """
+    source: TfSource
+    api: str = "" # Environment variable overriding the base URL of the API, e.g. to point at a mirror
+    base_url: str = ""
+    rate: float = 5
+    burst: int = 1
+    connections: int = 8
+    has_match_api: bool = True # Whether the details of a match can be fetched at all
+
+    def __init__(self) -> None:
+        self.base_url = os.environ.get(self.api, self.base_url).rstrip("/")
+        self.client = HostClient(self.rate, self.burst, self.connections)
+        self.seen_filter = SeenFilter()
+
+    def __enter__(self) -> League:
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback) -> None:
+        self.client.close()
+
+    def page_match_ids(self, write: Callable[[list[SiteID]], tuple[int, int]], num_stored: int) -> None:
+        """
+        Pages through the league's match list on its host client, handing every page of IDs to `write` (see
+        `MatchIdWriter.write`). Runs on a thread of its own during concurrent discovery, so it never touches the
+        database itself
+
+        params:
+            write[Callable]: writes a page of IDs, returning `(num_new, num_stored)` once it is written
+            num_stored[int]: the number of matches of the league stored before paging
+        """
+        # Leagues without a match list have nothing to page through
+
+    def discover_ids(self, session: scoped_session) -> int:
+        """
+        Pages through the league's match list, storing the new matches and queueing their detail fetches
+
+        returns:
+            num_new[int]: the number of new matches
+        """
+        match_logger.log_info(f"Scraping {self.source.name} match IDs")
+        writer = MatchIdWriter(session, self.source, self.seen_filter)
+        self.page_match_ids(writer.write, writer.num_stored)
+        return writer.close()
+
+    def queue_due(self, full: bool = True, session: scoped_session = db_session) -> None:
+        """
+        Queues the detail fetches of stored matches that are incomplete or due to be refreshed
+
+        params:
+            full[bool]: whether to look through every stored match for incomplete and due ones, rather than only
+            through the recently played ones (a long running sync does so only every so often)
+            session[scoped_session]: the session to queue the jobs with
+        """
+        if not full:
+            # Recent matches are due within hours, older ones can wait for the next full pass
+            schedule_matches(session, self.source, recent=True)
+            return
+        # Matches left incomplete before the job queue existed are queued too, jobs that are already waiting are unaffected
+        ScrapeJob.enqueue(session, "match", [match.get_site_id() for match in Match.get_incomplete(self.source)])
+        # Complete matches are only fetched again once they are due
+        schedule_matches(session, self.source)
+
+    def discover(self, full: bool = True) -> None:
+        """
+        Queues the detail fetches of new matches, and of stored matches that are due to be refreshed
+        """
+        self.discover_ids(db_session)
+        self.queue_due(full)
+
+    def match_url(self, site_id: int) -> str:
+        raise NotImplementedError
+
+class RglLeague(League):
+    source = TfSource.RGL
+    api, base_url = "rgl_api", "https://api.rgl.gg/v0"
+    rate, burst, connections = 5, 9, 9
 
-    scrape_rgl_match_ids()
-    match_ids = [match.rgl_match_id for match in Match.get_incomplete(TfSource.RGL)]
+    def match_page(self, start: int, take: int = 1000) -> list[SiteID]:
+        """
+        Gets a page of match IDs, skipping the first `start` matches
+        """
+        response = self.client.post(f"{self.base_url}/matches/paged", {"accept": "*/*"}, {}, take=str(take), skip=str(start))
+        if response is None or response.status_code != 200:
+            match_logger.log_warn(f"Could not fetch RGL match page at {start}")
+            return []
+        return SiteID.rgl_ids(data["matchId"] for data in response.json())
 
-    if not match_ids:
-        match_logger.log_info("No additional matches to scrape")
-        return
+    def page_match_ids(self, write: Callable[[list[SiteID]], tuple[int, int]], num_stored: int) -> None:
+        # Pages are offset by the number of matches stored, so paging starts after the last stored match
+        while page := self.match_page(num_stored):
+            num_new, num_stored = write(page)
+            # Nothing new on the page means the next request would return the very same page
+            if not num_new:
+                break
+
+    def match_url(self, site_id: int) -> str:
+        return f"{self.base_url}/matches/{site_id}"
+
+class Etf2lLeague(League):
+    source = TfSource.ETF2L
+    api, base_url = "etf2l_api", "https://api-v2.etf2l.org"
+    rate, burst, connections = 25, 5, 5
+    per_page = 100
+
+    def page_match_ids(self, write: Callable[[list[SiteID]], tuple[int, int]], num_stored: int) -> None:
+        # Pages are in the order matches were added, so the pages before the first one that may hold a new match are skipped
+        page = num_stored // self.per_page + 1
+        while True:
+            response = self.client.get(f"{self.base_url}/matches", page=page, per_page=self.per_page)
+            if response is None or response.status_code != 200:
+                match_logger.log_warn(f"Could not fetch ETF2L match page {page}")
+                break
+            results = response.json().get("results") or {}
+            write(SiteID.etf2l_ids(match["id"] for match in results.get("data", [])))
+            if not results.get("next_page_url"):
+                break
+            page += 1
+
+    def match_url(self, site_id: int) -> str:
+        return f"{self.base_url}/matches/{site_id}"
+
+class UgcLeague(League):
+    source = TfSource.UGC
+    has_match_api = False
+
+    def discover(self, full: bool = True) -> None:
+        # UGC has no public API to list or fetch matches from, so there is nothing to queue
+        match_logger.log_warn("Scraping UGC matches is not supported")
+
+    def match_url(self, site_id: int) -> str:
+        raise NotImplementedError("UGC has no public match API")
+
+LEAGUES = {
+    TfSource.RGL: RglLeague,
+    TfSource.ETF2L: Etf2lLeague,
+    TfSource.UGC: UgcLeague
+}
+
+def discover_concurrently(session: scoped_session, leagues: list[League], full: bool = True) -> None:
+    """
+    Discovers the new matches of several leagues at once: every league pages through its match list on a thread of its
+    own (with its own host client, and so at its own rate), while the pages are written by this thread as they come in,
+    like the detail fetches of `scrape_match_details`. Discovery therefore takes as long as the slowest league rather
+    than all of them one after another. The incomplete and due matches are queued once every league is done
+
+    params:
+        session[scoped_session]: the session to write with
+        leagues[list[League]]: the leagues to discover matches of
+        full[bool]: whether to queue the incomplete and due matches too (see `League.queue_due`)
+    """
+    pages = queue.Queue()
+    writers = {league.source: MatchIdWriter(session, league.source, league.seen_filter) for league in leagues}
+
+    def page_through(league: League) -> None:
+        def write(site_ids: list[SiteID]) -> tuple[int, int]:
+            reply = Future()
+            pages.put((league.source, site_ids, reply))
+            return reply.result()
+        try:
+            league.page_match_ids(write, writers[league.source].num_stored)
+        except Exception as e:
+            match_logger.log_error(f"Could not discover {league.source.name} matches: {type(e).__name__}: {e}")
+        finally:
+            pages.put((league.source, None, None))
+
+    threads = [threading.Thread(target=page_through, args=(league,), daemon=True) for league in leagues]
+    for thread in threads:
+        thread.start()
+    running = len(threads)
+    while running:
+        source, site_ids, reply = pages.get()
+        if reply is None:
+            running -= 1
+            continue
+        try:
+            reply.set_result(writers[source].write(site_ids))
+        except Exception as e:
+            session.rollback()
+            reply.set_exception(e)
+    for thread in threads:
+        thread.join()
+
+    for writer in writers.values():
+        writer.close()
+    for league in leagues:
+        league.queue_due(full, session)
+
+def discover_leagues(sources: list[TfSource] | None = None) -> int:
+    """
+    Queues the detail fetches of new and due matches of several leagues, without fetching them, e.g. for scrape
+    workers on other nodes to work through (see `WorkerService`)
+
+    params:
+        sources[list[TfSource]]: the leagues to discover matches of (defaults to every league)
+
+    returns:
+        num_pending[int]: the number of match jobs waiting to be fetched
+    """
+    leagues = [LEAGUES[source]() for source in (sources or list(LEAGUES))]
+    try:
+        discover_concurrently(db_session, leagues)
+        return sum(ScrapeJob.count("match", league.source, JobState.PENDING) for league in leagues)
+    finally:
+        for league in leagues:
+            league.client.close()
+        db_session.remove()
+
+def scrape_leagues(sources: list[TfSource] | None = None, batch_size: int = 90, workers: int | None = None) -> dict[TfSource, int]:
+    """
+    Scrapes new and due matches of several leagues concurrently, each at its own rate, into one ingestion pipeline
+
+    params:
+        sources[list[TfSource]]: the leagues to scrape (defaults to every league)
+        batch_size[int]: how many jobs to claim per league at once
+        workers[int]: the number of decode worker processes (defaults to the number of cores)
+
+    returns:
+        num_scraped[dict[TfSource, int]]: the number of matches scraped of each league
+    """
+    leagues = [LEAGUES[source]() for source in (sources or list(LEAGUES))]
+    try:
+        discover_concurrently(db_session, leagues)
+        # Leagues with nothing to fetch are left out of the pipeline
+        pending = [league for league in leagues
+                   if ScrapeJob.count("match", league.source, JobState.PENDING) + ScrapeJob.count("match", league.source, JobState.LEASED)]
+        if not pending:
+            match_logger.log_info("No additional matches to scrape")
+            return {}
+        return scrape_match_details(db_session, pending, batch_size, workers)
+    finally:
+        for league in leagues:
+            league.client.close()
+        db_session.remove()
 
-    scrape_rgl_match_ids(match_ids)
+def update() -> None:
+    scrape_leagues()
 
 def scrape_etf2l_matches() -> int:
-    pass
+    with Etf2lLeague() as league:
+        num_scraped = scrape_match_details(db_session, [league])[TfSource.ETF2L]
+    db_session.remove()
+    return num_scraped
 
-def scrape_etf2l():
-    pass
+def scrape_etf2l() -> int:
+    return scrape_leagues([TfSource.ETF2L]).get(TfSource.ETF2L, 0)
 
-def scrape_ugc():
-    pass
+def scrape_ugc() -> int:
+    return scrape_leagues([TfSource.UGC]).get(TfSource.UGC, 0)
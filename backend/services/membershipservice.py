@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+
+from models import RosterPlayerAssociation, MatchResult, Match
+from utils.intervals import IntervalIndex
+from database import db_session, data_generation
+
+class MembershipIndex:
+    """
+    Interval indexes over roster memberships, one per roster (of its players) and one per player (of their rosters),
+    answering who was on a roster, or which roster a player was on, at any point in time. A membership without a
+    `left_at` (stored as 0 by the decoder) is still ongoing
+    """
+
+    def __init__(self, memberships: list[tuple[int, int, float, float | None]]) -> None:
+        by_roster, by_player = defaultdict(list), defaultdict(list)
+        for player_id, roster_id, joined_at, left_at in memberships:
+            left_at = left_at or None
+            by_roster[roster_id].append((joined_at or 0, left_at, player_id))
+            by_player[player_id].append((joined_at or 0, left_at, roster_id))
+        self.rosters = {roster_id: IntervalIndex(players) for roster_id, players in by_roster.items()}
+        self.players = {player_id: IntervalIndex(rosters) for player_id, rosters in by_player.items()}
+
+    @staticmethod
+    def load(session: scoped_session) -> MembershipIndex:
+        return MembershipIndex(session.execute(
+            select(RosterPlayerAssociation.player_id, RosterPlayerAssociation.roster_id,
+                    RosterPlayerAssociation.joined_at, RosterPlayerAssociation.left_at)
+        ).all())
+
+    def roster_players(self, roster_id: int, start: float, end: float | None = None) -> list[int]:
+        """
+        Gets the players on a roster at `start`, or at any point between `start` and `end`
+        """
+        index = self.rosters.get(int(roster_id))
+        return index.overlapping(start, start if end is None else end) if index else []
+
+    def player_rosters(self, player_id: int, start: float, end: float | None = None) -> list[int]:
+        """
+        Gets the rosters a player was on at `start`, or at any point between `start` and `end`
+        """
+        index = self.players.get(int(player_id))
+        return index.overlapping(start, start if end is None else end) if index else []
+
+_cache = {"generation": None, "index": None}
+
+def membership_generation(session: scoped_session) -> int:
+    """
+    Gets the generation of the membership table, which changes whenever memberships are added or closed
+    """
+    return data_generation(session, "memberships")
+
+def get_index(session: scoped_session = db_session) -> MembershipIndex:
+    """
+    Gets the membership index, only rebuilding it when the memberships have changed
+    """
+    generation = membership_generation(session)
+    if _cache["generation"] != generation:
+        _cache.update(generation=generation, index=MembershipIndex.load(session))
+    return _cache["index"]
+
+def roster_players(roster_id: int, at: float, session: scoped_session = db_session) -> list[int]:
+    """
+    Gets the steam IDs of the players on a roster at the given time
+    """
+    return get_index(session).roster_players(roster_id, at)
+
+def player_rosters(player_id: int, at: float, session: scoped_session = db_session) -> list[int]:
+    """
+    Gets the IDs of the rosters a player was on at the given time
+    """
+    return get_index(session).player_rosters(player_id, at)
+
+def match_players(match: Match, session: scoped_session = db_session) -> dict[int, list[int]]:
+    """
+    Attributes a match to players, by the rosters' memberships at the time it was played
+
+    returns:
+        players[dict[int, list[int]]]: the steam IDs of the players on each roster of the match
+    """
+    index = get_index(session)
+    roster_ids = {result.roster_id for result in match.results}
+    return {roster_id: index.roster_players(roster_id, match.match_epoch or 0) for roster_id in roster_ids}
+
+def player_matches(player_id: int, session: scoped_session = db_session) -> list[Match]:
+    """
+    Gets every match a player played in, i.e. the matches of their rosters played while they were on them, newest first
+    """
+    index = get_index(session).players.get(int(player_id))
+    if not index:
+        return []
+
+    # Narrow down to the matches of the player's rosters in SQL, then keep only those inside a membership
+    matches = session.execute(
+        select(Match, MatchResult.roster_id)
+        .join(MatchResult, MatchResult.match_id == Match.match_id)
+        .where(MatchResult.roster_id.in_(set(index.values)))
+        .group_by(Match.match_id, MatchResult.roster_id)
+        .order_by(Match.match_epoch.desc())
+    ).all()
+    played, seen = [], set()
+    for match, roster_id in matches:
+        if match.match_id not in seen and roster_id in index.at(match.match_epoch or 0):
+            seen.add(match.match_id)
+            played.append(match)
+    return played
@@ -41,7 +41,8 @@ def insert_player(player_data: dict) -> bool:
     if Player.query.filter(Player.steam_id == int(player_data['steamId'])).first():
         return False
 
-    to_add = Player(int(player_data["steamId"]), player_data["name"], bool(player_data["status"]["isBanned"]), bool(player_data["status"]["isVerified"]), player_data["avatar"])
+    to_add = Player(int(player_data["steamId"]), player_data["name"], banned=bool(player_data["status"]["isBanned"]),
+                    verified=bool(player_data["status"]["isVerified"]), avatar=player_data["avatar"])
     db_session.add(to_add)
     db_session.commit()
     return True
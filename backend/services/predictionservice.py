@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from math import comb
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+import numpy as np
+
+from models import MatchResult, Map, RosterRating, RatingHistory
+from database import db_session, data_generation
+from services.ratingservice import INITIAL_RATING, expected_score
+
+MAP_PRIOR = 10.0 # Maps worth of "no adjustment" every map adjustment is shrunk towards
+MAX_MAP_ADJUSTMENT = 200.0
+MAX_BEST_OF = 7 # Longest series that can be predicted, series of an even number of maps could end in a draw
+# Rating points per unit of expected score, at even odds (the inverse slope of the Elo curve at 50%)
+POINTS_PER_SCORE = 1600.0 / np.log(10.0)
+
+class WinModel:
+    """
+    Predicts win probabilities from the roster ratings, adjusted per map by how much better or worse than expected each
+    roster has done on that map. Rosters and maps are held in sorted key arrays, so any number of pairs is looked up
+    and scored in a handful of vectorised operations
+
+    params:
+        roster_ids[np.ndarray]: sorted roster IDs
+        ratings[np.ndarray]: the rating of each roster
+        map_names[np.ndarray]: sorted map names
+        adjustment_keys[np.ndarray]: sorted `roster index * len(map_names) + map index` keys
+        adjustments[np.ndarray]: the rating adjustment of each key
+    """
+
+    def __init__(self,
+                    roster_ids: np.ndarray,
+                    ratings: np.ndarray,
+                    map_names: np.ndarray,
+                    adjustment_keys: np.ndarray,
+                    adjustments: np.ndarray) -> None:
+        self.roster_ids = roster_ids
+        self.ratings = ratings
+        self.map_names = map_names
+        self.adjustment_keys = adjustment_keys
+        self.adjustments = adjustments
+
+    @staticmethod
+    def load(session: scoped_session) -> WinModel:
+        """
+        Loads the current ratings, and the map adjustments from every rated map: the shrunk average of each roster's
+        actual minus expected score on a map (against the ratings going into each match), in rating points
+        """
+        ratings = np.array(session.execute(select(RosterRating.roster_id, RosterRating.rating).order_by(RosterRating.roster_id)).all(),
+                            dtype=np.float64).reshape(-1, 2)
+        roster_ids = ratings[:, 0].astype(np.int64)
+
+        pairs = MatchResult.pairs().subquery()
+        rows = session.execute(
+            select(pairs.c.roster_a, pairs.c.roster_b, Map.map_name, pairs.c.score_a, pairs.c.score_b,
+                    RatingHistory.rating_a, RatingHistory.rating_b)
+            .join(RatingHistory, RatingHistory.match_id == pairs.c.match_id)
+            .join(Map, Map.map_id == pairs.c.map_id)
+        ).all()
+        if not rows:
+            empty = np.empty(0, dtype=np.int64)
+            return WinModel(roster_ids, ratings[:, 1], np.empty(0, dtype=str), empty, empty.astype(np.float64))
+
+        roster_a, roster_b, map_name, score_a, score_b, rating_a, rating_b = (np.array(column) for column in zip(*rows))
+        map_names, map_index = np.unique(map_name.astype(str), return_inverse=True)
+        actual = np.where(score_a > score_b, 1.0, np.where(score_a == score_b, 0.5, 0.0))
+        residual = actual - expected_score(rating_a.astype(np.float64), rating_b.astype(np.float64))
+
+        # Both rosters' side of every map, keyed by (roster, map)
+        roster_index = np.searchsorted(roster_ids, np.concatenate([roster_a, roster_b]).astype(np.int64))
+        known = roster_index < len(roster_ids)
+        known[known] = roster_ids[roster_index[known]] == np.concatenate([roster_a, roster_b])[known]
+        keys = (roster_index * len(map_names) + np.concatenate([map_index, map_index]))[known]
+        residual = np.concatenate([residual, -residual])[known]
+
+        adjustment_keys, key = np.unique(keys, return_inverse=True)
+        totals = np.bincount(key, weights=residual, minlength=len(adjustment_keys))
+        counts = np.bincount(key, minlength=len(adjustment_keys))
+        adjustments = np.clip(POINTS_PER_SCORE * totals / (counts + MAP_PRIOR), -MAX_MAP_ADJUSTMENT, MAX_MAP_ADJUSTMENT)
+        return WinModel(roster_ids, ratings[:, 1], map_names, adjustment_keys, adjustments)
+
+    def __lookup(self, roster_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        index = np.minimum(np.searchsorted(self.roster_ids, roster_ids), max(len(self.roster_ids) - 1, 0))
+        found = self.roster_ids[index] == roster_ids if len(self.roster_ids) else np.zeros(len(roster_ids), dtype=bool)
+        return index, found
+
+    def effective_ratings(self, roster_ids: np.ndarray, maps: np.ndarray | None = None) -> np.ndarray:
+        """
+        Gets the ratings of the given rosters, adjusted for the given maps if any. Unrated rosters and unknown maps
+        get the initial rating and no adjustment
+        """
+        index, found = self.__lookup(roster_ids)
+        ratings = np.where(found, self.ratings[index] if len(self.ratings) else INITIAL_RATING, INITIAL_RATING)
+        if maps is None or not len(self.adjustment_keys):
+            return ratings
+
+        map_index = np.minimum(np.searchsorted(self.map_names, maps), len(self.map_names) - 1)
+        known = found & (self.map_names[map_index] == maps)
+        keys = index * len(self.map_names) + map_index
+        position = np.minimum(np.searchsorted(self.adjustment_keys, keys), len(self.adjustment_keys) - 1)
+        known &= self.adjustment_keys[position] == keys
+        return ratings + np.where(known, self.adjustments[position], 0.0)
+
+    def map_probability(self, roster_a: np.ndarray, roster_b: np.ndarray, maps: np.ndarray | None = None) -> np.ndarray:
+        """
+        Gets the probability of `roster_a` winning a map against `roster_b`, for every pair at once
+        """
+        return expected_score(self.effective_ratings(roster_a, maps), self.effective_ratings(roster_b, maps))
+
+def series_probability(p: np.ndarray, best_of: int) -> np.ndarray:
+    """
+    Gets the probability of winning a best-of-`best_of` series, given the probability `p` of winning each map. Only
+    odd series up to `MAX_BEST_OF` maps are supported, as even ones can be drawn
+    """
+    if best_of < 1 or best_of % 2 == 0 or best_of > MAX_BEST_OF:
+        raise ValueError(f"Expected an odd best-of of at most {MAX_BEST_OF} maps, got {best_of}")
+    needed = best_of // 2 + 1
+    # Win the series on map `needed + k`, having lost k of the maps before it
+    return sum(comb(needed - 1 + k, k) * p ** needed * (1 - p) ** k for k in range(best_of - needed + 1))
+
+_cache = {"generation": None, "model": None}
+
+def get_model(session: scoped_session = db_session) -> WinModel:
+    """
+    Gets the win model, only reloading it when the ratings have changed
+    """
+    generation = (data_generation(session), data_generation(session, "ratings"))
+    if _cache["generation"] != generation:
+        _cache.update(generation=generation, model=WinModel.load(session))
+    return _cache["model"]
+
+def predict(roster_a: list[int],
+            roster_b: list[int],
+            maps: list[str] | None = None,
+            best_of: int = 1,
+            session: scoped_session = db_session) -> np.ndarray:
+    """
+    Predicts the probability of each `roster_a` beating the matching `roster_b`, all pairs in one vectorised call
+
+    params:
+        roster_a[list[int]]: the first roster of each pair
+        roster_b[list[int]]: the second roster of each pair
+        maps[list[str]]: the map of each pair, for map specific predictions
+        best_of[int]: the number of maps in each series
+
+    returns:
+        probabilities[np.ndarray]: the probability of each `roster_a` winning
+    """
+    model = get_model(session)
+    p = model.map_probability(np.asarray(roster_a, dtype=np.int64), np.asarray(roster_b, dtype=np.int64),
+                                np.asarray(maps, dtype=str) if maps is not None else None)
+    return series_probability(p, best_of) if best_of > 1 else p
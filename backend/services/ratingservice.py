@@ -0,0 +1,172 @@
+from sqlalchemy import select, delete, insert, func, case
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlalchemy.orm import scoped_session
+import numpy as np
+
+from models import MatchResult, Match, Roster, RosterRating, RatingHistory
+from utils.logger import Logger
+
+rating_logger = Logger.get_logger()
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+def expected_score(rating_a: np.ndarray, rating_b: np.ndarray) -> np.ndarray:
+    """
+    Gets the expected score (probability of winning) of `a` against `b` under the Elo model
+    """
+    return 1.0 / (1.0 + 10.0 ** ((rating_b - rating_a) / 400.0))
+
+def load_outcomes(session: scoped_session, unrated_only: bool = False) -> dict[str, np.ndarray]:
+    """
+    Bulk loads the outcome of every played match as columnar arrays, ordered by match date. A match's score is the
+    fraction of its maps won by `roster_a` (the lower roster ID), with drawn maps counting as half
+
+    params:
+        session[scoped_session]: The session to load the matches with
+        unrated_only[bool]: Only load matches that have not been rated yet
+
+    returns:
+        outcomes[dict[str, np.ndarray]]: `match_id`, `epoch`, `roster_a`, `roster_b` and `score_a` arrays
+    """
+    query = MatchResult.pairs().where(Match.match_epoch.is_not(None))
+    if unrated_only:
+        query = query.where(Match.match_id.not_in(select(RatingHistory.match_id)))
+    pairs = query.subquery()
+
+    rows = session.execute(
+        select(pairs.c.match_id, pairs.c.match_epoch, pairs.c.roster_a, pairs.c.roster_b,
+                func.count(), func.sum(case((pairs.c.score_a > pairs.c.score_b, 1.0), (pairs.c.score_a == pairs.c.score_b, 0.5), else_=0.0)))
+        .group_by(pairs.c.match_id, pairs.c.roster_a, pairs.c.roster_b)
+        .order_by(pairs.c.match_epoch, pairs.c.match_id)
+    ).all()
+
+    columns = np.array(rows, dtype=np.float64).reshape(-1, 6)
+    return {
+        "match_id": columns[:, 0].astype(np.int64),
+        "epoch": columns[:, 1],
+        "roster_a": columns[:, 2].astype(np.int64),
+        "roster_b": columns[:, 3].astype(np.int64),
+        "score_a": columns[:, 5] / np.maximum(columns[:, 4], 1)
+    }
+
+def generations(roster_a: np.ndarray, roster_b: np.ndarray, num_rosters: int) -> np.ndarray:
+    """
+    Assigns each match (in date order) to the earliest "generation" after every earlier match of both of its rosters.
+    No roster plays twice within a generation, so a whole generation can be rated at once, and rating generation by
+    generation gives exactly the same result as rating match by match
+    """
+    last = [0] * num_rosters
+    generation = np.empty(len(roster_a), dtype=np.int64)
+    for i, (a, b) in enumerate(zip(roster_a.tolist(), roster_b.tolist())):
+        generation[i] = last[a] = last[b] = max(last[a], last[b]) + 1
+    return generation
+
+def play(roster_a: np.ndarray, roster_b: np.ndarray, score_a: np.ndarray, ratings: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Rates the given matches, in order, updating `ratings` in place. Rosters are given as indexes into `ratings`
+
+    returns:
+        (rating_a[np.ndarray], rating_b[np.ndarray], delta[np.ndarray]): both rosters' ratings going into each match,
+        and the rating gained by roster a in each match
+    """
+    rating_a, rating_b, delta = (np.empty(len(roster_a)) for _ in range(3))
+
+    generation = generations(roster_a, roster_b, len(ratings))
+    order = np.argsort(generation, kind="stable")
+    bounds = np.flatnonzero(np.diff(generation[order])) + 1
+
+    for matches in np.split(order, bounds):
+        a, b = roster_a[matches], roster_b[matches]
+        rating_a[matches], rating_b[matches] = ratings[a], ratings[b]
+        delta[matches] = K_FACTOR * (score_a[matches] - expected_score(ratings[a], ratings[b]))
+        ratings[a] += delta[matches]
+        ratings[b] -= delta[matches]
+
+    return rating_a, rating_b, delta
+
+def apply(session: scoped_session, outcomes: dict[str, np.ndarray], current: dict[int, RosterRating]) -> None:
+    """
+    Rates the given outcomes on top of the `current` ratings, and stages the new ratings and the rating history
+    """
+    roster_ids, inverse = np.unique(np.concatenate([outcomes["roster_a"], outcomes["roster_b"]]), return_inverse=True)
+    a, b = np.split(inverse, 2)
+
+    ratings = np.array([current[roster_id].rating if roster_id in current else INITIAL_RATING for roster_id in roster_ids.tolist()])
+    rating_a, rating_b, delta = play(a, b, outcomes["score_a"], ratings)
+
+    played = np.bincount(inverse, minlength=len(roster_ids))
+    last_epoch = np.full(len(roster_ids), -np.inf)
+    np.maximum.at(last_epoch, inverse, np.concatenate([outcomes["epoch"], outcomes["epoch"]]))
+
+    statement = upsert(RosterRating)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["roster_id"],
+            set_={"rating": statement.excluded.rating,
+                    "matches_played": RosterRating.matches_played + statement.excluded.matches_played,
+                    "last_epoch": func.max(func.coalesce(RosterRating.last_epoch, 0), statement.excluded.last_epoch)}
+        ),
+        [{"roster_id": roster_id, "rating": rating, "matches_played": count, "last_epoch": epoch}
+            for roster_id, rating, count, epoch in zip(roster_ids.tolist(), ratings.tolist(), played.tolist(), last_epoch.tolist())]
+    )
+    session.execute(
+        insert(RatingHistory),
+        [{"match_id": match_id, "roster_a": roster_a, "roster_b": roster_b, "rating_a": r_a, "rating_b": r_b, "score_a": s, "delta": d}
+            for match_id, roster_a, roster_b, r_a, r_b, s, d in zip(outcomes["match_id"].tolist(), outcomes["roster_a"].tolist(),
+                                                                    outcomes["roster_b"].tolist(), rating_a.tolist(), rating_b.tolist(),
+                                                                    outcomes["score_a"].tolist(), delta.tolist())]
+    )
+
+def rebuild(session: scoped_session, commit: bool = True) -> int:
+    """
+    Recomputes every roster rating from scratch, rating all played matches in date order
+
+    returns:
+        num_rated[int]: the number of matches rated
+    """
+    outcomes = load_outcomes(session)
+
+    session.execute(delete(RatingHistory))
+    session.execute(delete(RosterRating))
+    if len(outcomes["match_id"]):
+        apply(session, outcomes, {})
+
+    if commit:
+        session.commit()
+    rating_logger.log_info(f"Rebuilt ratings from {len(outcomes['match_id'])} matches")
+    return len(outcomes["match_id"])
+
+def update(session: scoped_session, commit: bool = True) -> int:
+    """
+    Rates every played match that has not been rated yet, on top of the current ratings, without touching history.
+    Matches that turn up late (dated before already rated ones) are rated against the current ratings; a `rebuild`
+    puts them back in date order
+
+    returns:
+        num_rated[int]: the number of matches rated
+    """
+    outcomes = load_outcomes(session, unrated_only=True)
+    if not len(outcomes["match_id"]):
+        return 0
+
+    roster_ids = np.unique(np.concatenate([outcomes["roster_a"], outcomes["roster_b"]])).tolist()
+    current = {rating.roster_id: rating for rating in session.execute(
+        select(RosterRating).where(RosterRating.roster_id.in_(roster_ids))).scalars()}
+    apply(session, outcomes, current)
+
+    if commit:
+        session.commit()
+    return len(outcomes["match_id"])
+
+def team_rating(team_id: int) -> RosterRating | None:
+    """
+    Gets the rating of a team, which is the rating of its most recently active roster
+    """
+    return (RosterRating.query.join(Roster, Roster.roster_id == RosterRating.roster_id)
+            .filter(Roster.team_id == int(team_id))
+            .order_by(RosterRating.last_epoch.desc())
+            .first())
+
+def top(n: int = 50) -> list[RosterRating]:
+    return RosterRating.query.order_by(RosterRating.rating.desc()).limit(n).all()
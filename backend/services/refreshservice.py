@@ -0,0 +1,152 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import scoped_session
+import time
+
+from models import Match, MatchResult, Roster, ScrapeJob, JobState
+from utils.typing import TfSource
+from utils.logger import Logger
+
+refresh_logger = Logger.get_logger()
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+MIN_TTL = 30 * 60 # Nothing is refreshed more often than this
+MAX_TTL = 180 * DAY # Old, settled entities are refreshed about twice a year
+ACTIVE_WINDOW = 14 * DAY # Seasons (and rosters) that played in this window are considered active
+
+MATCH_ID_COLUMNS = {
+    TfSource.RGL: Match.rgl_match_id,
+    TfSource.ETF2L: Match.etf2l_match_id,
+    TfSource.UGC: Match.ugc_match_id
+}
+
+ROSTER_ID_COLUMNS = {
+    TfSource.RGL: Roster.rgl_team_id,
+    TfSource.ETF2L: Roster.etf2l_team_id,
+    TfSource.UGC: Roster.ugc_team_id
+}
+
+def compute_ttl(age: float, active: bool, change_rate: float) -> float:
+    """
+    Gets how long a fetched entity stays fresh for
+
+    params:
+        age[float]: how long after the entity was last relevant (match date, or the roster's last match) it was fetched
+        active[bool]: whether the entity belongs to a season that is still being played
+        change_rate[float]: the fraction of previous refetches (0 to 1) in which the entity actually changed
+
+    returns:
+        ttl[float]: the number of seconds after a fetch until the entity is due to be fetched again
+    """
+    # Entities settle down as they get older, so their TTL grows with their age
+    ttl = max(age, 0) * 0.1
+    # Finished seasons barely change, active ones change daily
+    if not active:
+        ttl *= 10
+    # Entities that kept changing on every fetch are fetched up to 10 times as often
+    ttl *= 1 - 0.9 * min(max(change_rate, 0), 1)
+    return min(max(ttl, MIN_TTL), MAX_TTL)
+
+def is_due(fetched_at: float | None,
+            fetch_count: int,
+            change_count: int,
+            last_seen: float | None,
+            active: bool,
+            now: float) -> bool:
+    """
+    Whether an entity fetched at `fetched_at` is due to be fetched again. Entities that have never been fetched are always due
+
+    params:
+        fetched_at[float]: when the entity was last fetched
+        fetch_count[int]: how many times the entity has been fetched
+        change_count[int]: how many of those fetches returned a changed entity
+        last_seen[float]: when the entity was last relevant (match date, or the roster's last match)
+        active[bool]: whether the entity belongs to a season that is still being played
+        now[float]: the current epoch
+    """
+    if fetched_at is None:
+        return True
+    change_rate = change_count / (fetch_count - 1) if fetch_count > 1 else 0
+    age = fetched_at - (last_seen or fetched_at)
+    return fetched_at + compute_ttl(age, active, change_rate) <= now
+
+def active_seasons(session: scoped_session, now: float) -> set[int]:
+    """
+    Gets the internal IDs of every season that has had a match in the last `ACTIVE_WINDOW`
+    """
+    return set(session.execute(
+        select(Match.season_id).distinct().where(Match.season_id.is_not(None), Match.match_epoch >= now - ACTIVE_WINDOW)
+    ).scalars().all())
+
+def schedule_matches(session: scoped_session, source: TfSource, now: float | None = None, recent: bool = False) -> int:
+    """
+    Queues every finished match job of the given source that is due to be refreshed
+
+    params:
+        session[scoped_session]: The session to queue the jobs with
+        source[TfSource]: The site to schedule jobs for
+        now[float]: The current epoch (defaults to the actual time)
+        recent[bool]: Only look at matches played in the last `ACTIVE_WINDOW`, which are the ones due most often, so
+        that it is cheap enough to do every few minutes
+
+    returns:
+        num_queued[int]: the number of match jobs that were queued again
+    """
+    now = now or time.time()
+    active = active_seasons(session, now)
+
+    rows = session.execute(
+        select(ScrapeJob.job_id, ScrapeJob.fetched_at, ScrapeJob.fetch_count, ScrapeJob.change_count,
+                Match.match_epoch, Match.season_id)
+        .join(Match, MATCH_ID_COLUMNS[source] == ScrapeJob.site_id)
+        .where(ScrapeJob.entity == "match", ScrapeJob.source == int(source), ScrapeJob.state == JobState.DONE,
+                Match.match_epoch >= now - ACTIVE_WINDOW if recent else True)
+    ).all()
+
+    due = [job_id for job_id, fetched_at, fetch_count, change_count, epoch, season_id in rows
+            if is_due(fetched_at, fetch_count or 0, change_count or 0, epoch, season_id in active, now)]
+    return ScrapeJob.requeue(session, due)
+
+def schedule_rosters(session: scoped_session, source: TfSource, now: float | None = None) -> int:
+    """
+    Queues every finished roster job of the given source that is due to be refreshed. A roster's age is taken from
+    its last match, falling back to when it was last updated
+
+    params:
+        session[scoped_session]: The session to queue the jobs with
+        source[TfSource]: The site to schedule jobs for
+        now[float]: The current epoch (defaults to the actual time)
+
+    returns:
+        num_queued[int]: the number of roster jobs that were queued again
+    """
+    now = now or time.time()
+
+    last_match = (
+        select(MatchResult.roster_id, func.max(Match.match_epoch).label("last_epoch"))
+        .join(Match, Match.match_id == MatchResult.match_id)
+        .group_by(MatchResult.roster_id)
+        .subquery()
+    )
+
+    rows = session.execute(
+        select(ScrapeJob.job_id, ScrapeJob.fetched_at, ScrapeJob.fetch_count, ScrapeJob.change_count,
+                func.coalesce(last_match.c.last_epoch, Roster.updated_at, Roster.created_at))
+        .join(Roster, ROSTER_ID_COLUMNS[source] == ScrapeJob.site_id)
+        .outerjoin(last_match, last_match.c.roster_id == Roster.roster_id)
+        .where(ScrapeJob.entity == "roster", ScrapeJob.source == int(source), ScrapeJob.state == JobState.DONE)
+    ).all()
+
+    due = [job_id for job_id, fetched_at, fetch_count, change_count, last_seen in rows
+            if is_due(fetched_at, fetch_count or 0, change_count or 0, last_seen, now - (last_seen or now) <= ACTIVE_WINDOW, now)]
+    return ScrapeJob.requeue(session, due)
+
+def schedule(session: scoped_session, source: TfSource, now: float | None = None) -> int:
+    """
+    Queues every match and roster of the given source that is due to be refreshed
+    """
+    num_matches = schedule_matches(session, source, now)
+    num_rosters = schedule_rosters(session, source, now)
+    refresh_logger.log_info(f"Scheduled {num_matches} matches and {num_rosters} rosters for a refresh")
+    return num_matches + num_rosters
@@ -0,0 +1,58 @@
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import scoped_session
+
+from models.search import SEARCH_TABLES
+from database import db_session
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def match_expression(query: str) -> str | None:
+    """
+    Turns free text typed by a user into an FTS5 match expression: every word must match, the last one as a prefix so
+    that results show up while the user is still typing. Each word is quoted, so no FTS5 syntax can be injected
+
+    returns:
+        expression[str | None]: the expression, or `None` if the query holds no words
+    """
+    words = TOKEN.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def search_players(query: str, limit: int = 10, session: scoped_session = db_session) -> list[dict]:
+    """
+    Searches players by display name, best match first
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    return [{"steam-id": steam_id, "display-name": name} for steam_id, name in session.execute(text("""
+        SELECT rowid, display_name FROM player_search WHERE player_search MATCH :expression
+        ORDER BY bm25(player_search) LIMIT :limit"""), {"expression": expression, "limit": limit})]
+
+def search_rosters(query: str, limit: int = 10, session: scoped_session = db_session) -> list[dict]:
+    """
+    Searches rosters by name and tag, best match first. Tag matches weigh more, as tags are short and distinctive
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    return [{"roster-id": roster_id, "name": name, "tag": tag, "team-id": team_id} for roster_id, name, tag, team_id in session.execute(text("""
+        SELECT roster_search.rowid, roster_search.roster_name, roster_search.roster_tag, rosters.team_id
+        FROM roster_search JOIN rosters ON rosters.roster_id = roster_search.rowid
+        WHERE roster_search MATCH :expression
+        ORDER BY bm25(roster_search, 1.0, 2.0) LIMIT :limit"""), {"expression": expression, "limit": limit})]
+
+def rebuild(session: scoped_session = db_session, commit: bool = True) -> None:
+    """
+    Rebuilds the search indexes from the player and roster tables, e.g. after the tables were written with the
+    triggers missing
+    """
+    for table in SEARCH_TABLES:
+        session.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+    if commit:
+        session.commit()
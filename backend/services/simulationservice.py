@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from multiprocessing import Pool
+from sqlalchemy import select, func
+from sqlalchemy.orm import scoped_session
+import numpy as np
+import os
+
+from models import MatchResult, Match, Standing
+from database import db_session
+import services.predictionservice as PredictionService
+
+CHUNK_SIZE = 5000 # Simulations per task; fixed so that results only depend on the seed, not on the number of workers
+
+def remaining_fixtures(session: scoped_session, season_id: int) -> list[tuple[int, int]]:
+    """
+    Gets the fixtures of a season that have not been played yet: matches whose maps are all still 0 - 0
+
+    returns:
+        fixtures[list[tuple[int, int]]]: the `(roster_a, roster_b)` of every remaining match
+    """
+    unplayed = (
+        select(MatchResult.match_id)
+        .join(Match, Match.match_id == MatchResult.match_id)
+        .where(Match.season_id == int(season_id))
+        .group_by(MatchResult.match_id)
+        .having(func.max(MatchResult.score) == 0)
+    )
+    rosters = session.execute(
+        select(MatchResult.match_id, MatchResult.roster_id)
+        .where(MatchResult.match_id.in_(unplayed))
+        .distinct()
+        .order_by(MatchResult.match_id, MatchResult.roster_id)
+    ).all()
+
+    by_match = {}
+    for match_id, roster_id in rosters:
+        by_match.setdefault(match_id, []).append(roster_id)
+    return [tuple(roster_ids) for roster_ids in by_match.values() if len(roster_ids) == 2]
+
+def simulate_chunk(task: tuple) -> np.ndarray:
+    """
+    Plays out the remaining fixtures `n` times, vectorised over all simulations of the chunk. Runs in the worker processes
+
+    params:
+        task[tuple]: `(seed, n, wins, map_difference, home, away, probability)`, where `home` / `away` are the roster
+        indexes of each fixture and `probability` is the probability of the home roster winning it
+
+    returns:
+        counts[np.ndarray]: `counts[r, p]` is how often roster `r` finished in position `p` (0 being first)
+    """
+    seed, n, wins, map_difference, home, away, probability = task
+    rng = np.random.default_rng(seed)
+    num_rosters = len(wins)
+
+    # Fixture by roster incidence, so that every simulation's wins are added up with two matrix products
+    home_fixtures = np.zeros((len(probability), num_rosters))
+    home_fixtures[np.arange(len(probability)), home] = 1
+    away_fixtures = np.zeros((len(probability), num_rosters))
+    away_fixtures[np.arange(len(probability)), away] = 1
+
+    home_won = rng.random((n, len(probability))) < probability
+    simulated = wins + home_won @ home_fixtures + ~home_won @ away_fixtures
+
+    # Wins first, then map difference (of the matches already played), with any remaining ties broken at random
+    score = simulated * 1e6 + map_difference + 0.5 * rng.random((n, num_rosters))
+    positions = np.argsort(np.argsort(-score, axis=1), axis=1)
+    return np.bincount((np.arange(num_rosters) * num_rosters + positions).ravel(),
+                        minlength=num_rosters * num_rosters).reshape(num_rosters, num_rosters)
+
+def simulate(season_id: int,
+                n: int = 10000,
+                seed: int = 0,
+                fixtures: list[tuple[int, int]] | None = None,
+                workers: int | None = None,
+                session: scoped_session = db_session) -> list[dict]:
+    """
+    Simulates the rest of a season `n` times from the current standings, using the predicted win probability of every
+    remaining fixture, and reports how often each roster finishes in each position. The same seed always gives the same
+    result, whatever the number of workers
+
+    params:
+        season_id[int]: the season to simulate
+        n[int]: the number of simulations
+        seed[int]: the seed of the random number generator
+        fixtures[list[tuple[int, int]]]: the remaining `(roster_a, roster_b)` fixtures (defaults to the unplayed
+        matches of the season)
+        workers[int]: the number of worker processes (defaults to the number of cores, 1 runs in this process)
+
+    returns:
+        rosters[list[dict]]: every roster's finishing position distribution, best expected position first
+    """
+    fixtures = remaining_fixtures(session, season_id) if fixtures is None else fixtures
+    standings = {standing.roster_id: standing for standing in Standing.get_season(season_id)}
+    roster_ids = np.array(sorted(set(standings) | {roster_id for fixture in fixtures for roster_id in fixture}), dtype=np.int64)
+    if not len(roster_ids):
+        return []
+
+    wins = np.array([standings[roster_id].wins if roster_id in standings else 0 for roster_id in roster_ids.tolist()])
+    map_difference = np.array([standings[roster_id].map_difference if roster_id in standings else 0 for roster_id in roster_ids.tolist()])
+    home = np.searchsorted(roster_ids, np.array([fixture[0] for fixture in fixtures], dtype=np.int64))
+    away = np.searchsorted(roster_ids, np.array([fixture[1] for fixture in fixtures], dtype=np.int64))
+    probability = PredictionService.predict(roster_ids[home], roster_ids[away], session=session)
+
+    sizes = [min(CHUNK_SIZE, n - start) for start in range(0, n, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(chunk_seed, size, wins, map_difference, home, away, probability) for chunk_seed, size in zip(seeds, sizes)]
+    if workers == 1 or len(tasks) == 1:
+        counts = sum(map(simulate_chunk, tasks))
+    else:
+        with Pool(min(workers or os.cpu_count(), len(tasks))) as p:
+            counts = sum(p.imap_unordered(simulate_chunk, tasks))
+
+    distribution = counts / n
+    expected = (distribution @ np.arange(1, len(roster_ids) + 1)).tolist()
+    return [{"roster-id": roster_id, "expected-position": expected[i], "positions": distribution[i].tolist()}
+            for i, roster_id in sorted(enumerate(roster_ids.tolist()), key=lambda roster: expected[roster[0]])]
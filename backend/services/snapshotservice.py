@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+import numpy as np
+import os
+
+from models import Player, Roster, Match, MatchResult, Map, RosterPlayerAssociation
+from database import db_session
+from utils.snapshot import StringHeap, Snapshot, SnapshotReader, write_snapshot
+from utils.logger import Logger
+import services.membershipservice as MembershipService
+
+snapshot_logger = Logger.get_logger()
+
+STRING = [("offset", np.uint32), ("length", np.int32)]
+PLAYER = np.dtype([("steam_id", np.int64), ("name", STRING)])
+ROSTER = np.dtype([("roster_id", np.int64), ("team_id", np.int64), ("name", STRING), ("tag", STRING)])
+MEMBERSHIP = np.dtype([("player_id", np.int64), ("roster_id", np.int64), ("joined_at", np.float64), ("left_at", np.float64)])
+MATCH = np.dtype([("match_id", np.int64), ("season_id", np.int64), ("match_epoch", np.float64), ("was_forfeit", np.int8),
+                    ("name", STRING), ("results_start", np.uint32), ("results_count", np.uint32)])
+RESULT = np.dtype([("match_id", np.int64), ("roster_id", np.int64), ("map_name", STRING), ("score", np.int32)])
+ROSTER_MATCH = np.dtype([("roster_id", np.int64), ("match_epoch", np.float64), ("match_id", np.int64)])
+
+def snapshot_path() -> str:
+    """
+    Gets the path of the serving snapshot (the `snapshot` environment variable, or data/snapshot.bin)
+    """
+    return os.environ.get("snapshot", os.path.join("data", "snapshot.bin"))
+
+def build(session: scoped_session = db_session, path: str | None = None) -> dict[str, int]:
+    """
+    Writes a read-only snapshot of the players, rosters, memberships, matches and results for the API to serve from.
+    Every section is a sorted array of fixed-width records, so a lookup is a binary search over the mapped file, and
+    the snapshot is swapped in atomically, so API workers never see a partial one
+
+    returns:
+        num_records[dict[str, int]]: the number of records of each section
+    """
+    strings = StringHeap()
+    players = np.array([(steam_id, strings.add(name)) for steam_id, name in session.execute(
+        select(Player.steam_id, Player.display_name).order_by(Player.steam_id))], dtype=PLAYER)
+    rosters = np.array([(roster_id, -1 if team_id is None else team_id, strings.add(name), strings.add(tag))
+        for roster_id, team_id, name, tag in session.execute(
+            select(Roster.roster_id, Roster.team_id, Roster.roster_name, Roster.roster_tag).order_by(Roster.roster_id))], dtype=ROSTER)
+    memberships = np.array(session.execute(
+        select(RosterPlayerAssociation.player_id, RosterPlayerAssociation.roster_id, RosterPlayerAssociation.joined_at,
+                RosterPlayerAssociation.left_at)
+        .order_by(RosterPlayerAssociation.player_id, RosterPlayerAssociation.joined_at)
+    ).all(), dtype=np.float64).reshape(-1, 4)
+    membership_records = np.empty(len(memberships), dtype=MEMBERSHIP)
+    membership_records["player_id"], membership_records["roster_id"] = memberships[:, 0], memberships[:, 1]
+    # Open memberships (no or 0 `left_at`) are stored as NaN
+    membership_records["joined_at"] = np.nan_to_num(memberships[:, 2])
+    membership_records["left_at"] = np.where(np.nan_to_num(memberships[:, 3]) == 0, np.nan, memberships[:, 3])
+
+    map_names = {map_id: strings.add(map_name) for map_id, map_name in session.execute(select(Map.map_id, Map.map_name))}
+    results = np.array([(match_id, roster_id, map_names[map_id], score) for match_id, roster_id, map_id, score in session.execute(
+        select(MatchResult.match_id, MatchResult.roster_id, MatchResult.map_id, MatchResult.score)
+        .order_by(MatchResult.match_id, MatchResult.roster_id, MatchResult.map_id))], dtype=RESULT)
+    matches = np.array([(match_id, -1 if season_id is None else season_id, epoch or 0.0, -1 if forfeit is None else forfeit,
+                            strings.add(name), 0, 0) for match_id, season_id, epoch, forfeit, name in session.execute(
+        select(Match.match_id, Match.season_id, Match.match_epoch, Match.was_forfeit, Match.match_name).order_by(Match.match_id))],
+        dtype=MATCH)
+    matches["results_start"] = np.searchsorted(results["match_id"], matches["match_id"], "left")
+    matches["results_count"] = np.searchsorted(results["match_id"], matches["match_id"], "right") - matches["results_start"]
+
+    # Every match of every roster, by time, for a player's matches over each of their memberships
+    roster_matches = np.unique(np.stack([results["roster_id"], results["match_id"]], axis=1).reshape(-1, 2), axis=0)
+    roster_match_records = np.empty(len(roster_matches), dtype=ROSTER_MATCH)
+    roster_match_records["roster_id"], roster_match_records["match_id"] = roster_matches[:, 0], roster_matches[:, 1]
+    roster_match_records["match_epoch"] = matches["match_epoch"][np.searchsorted(matches["match_id"], roster_matches[:, 1])]
+    roster_match_records = roster_match_records[np.lexsort((roster_match_records["match_epoch"], roster_match_records["roster_id"]))]
+
+    sections = {"players": players, "rosters": rosters, "memberships": membership_records, "matches": matches,
+                "results": results, "roster_matches": roster_match_records, "strings": strings.array()}
+    write_snapshot(path or snapshot_path(), sections)
+    snapshot_logger.log_info(f"Wrote snapshot of {len(players)} players, {len(rosters)} rosters and {len(matches)} matches")
+    return {name: len(section) for name, section in sections.items()}
+
+_reader = {"path": None, "reader": None}
+
+def get_snapshot() -> Snapshot | None:
+    """
+    Gets the current snapshot, mapping a new one whenever it has been rebuilt, or `None` if none has been built yet
+    """
+    path = snapshot_path()
+    if _reader["path"] != path:
+        _reader.update(path=path, reader=SnapshotReader(path))
+    return _reader["reader"].get()
+
+def match(match_id: int, snapshot: Snapshot | None = None) -> dict | None:
+    """
+    Gets a match in the same format as `Match.json`, from the snapshot if there is one, otherwise from the database
+    """
+    snapshot = snapshot or get_snapshot()
+    if snapshot is None:
+        match = Match.get(match_id)
+        return match.json() if match else None
+
+    i = snapshot.find("matches", "match_id", int(match_id))
+    if i is None:
+        return None
+    record = snapshot["matches"][i]
+    results = snapshot["results"][record["results_start"]:record["results_start"] + record["results_count"]]
+    return {
+        "matchName": snapshot.string(*record["name"]),
+        "matchDate": float(record["match_epoch"]),
+        "wasForfeit": None if record["was_forfeit"] < 0 else bool(record["was_forfeit"]),
+        "maps": [{"roster-id": int(result["roster_id"]), "map-name": snapshot.string(*result["map_name"]), "score": int(result["score"])}
+                    for result in results]
+    }
+
+def player(steam_id: int, snapshot: Snapshot | None = None) -> dict | None:
+    """
+    Gets a player's name, current roster and team, and the IDs of the matches they played (newest first), from the
+    snapshot if there is one, otherwise from the database
+    """
+    snapshot = snapshot or get_snapshot()
+    if snapshot is None:
+        return player_fromdb(steam_id)
+
+    i = snapshot.find("players", "steam_id", int(steam_id))
+    if i is None:
+        return None
+    start, end = snapshot.find_range("memberships", "player_id", int(steam_id))
+    memberships = snapshot["memberships"][start:end]
+
+    current = None
+    match_ids = set()
+    for membership in memberships:
+        if np.isnan(membership["left_at"]) and (current is None or membership["joined_at"] >= current["joined_at"]):
+            current = membership
+        first, last = snapshot.find_range("roster_matches", "roster_id", int(membership["roster_id"]))
+        epochs = snapshot["roster_matches"]["match_epoch"][first:last]
+        # Only the matches played while the player was on the roster, i.e. in [joined_at, left_at)
+        stop = len(epochs) if np.isnan(membership["left_at"]) else np.searchsorted(epochs, membership["left_at"], "left")
+        matches = snapshot["roster_matches"][first:last][np.searchsorted(epochs, membership["joined_at"], "left"):stop]
+        match_ids.update(zip((-matches["match_epoch"]).tolist(), matches["match_id"].tolist()))
+
+    roster = snapshot.find("rosters", "roster_id", int(current["roster_id"])) if current is not None else None
+    roster = snapshot["rosters"][roster] if roster is not None else None
+    return {
+        "display-name": snapshot.string(*snapshot["players"][i]["name"]),
+        "display-tag": snapshot.string(*roster["tag"]) if roster is not None else None,
+        "current-roster": int(roster["roster_id"]) if roster is not None else None,
+        "current-team": int(roster["team_id"]) if roster is not None and roster["team_id"] >= 0 else None,
+        "matches": [match_id for _, match_id in sorted(match_ids)]
+    }
+
+def player_fromdb(steam_id: int, session: scoped_session = db_session) -> dict | None:
+    """
+    Gets the same summary of a player as `player`, from the database
+    """
+    player = session.get(Player, int(steam_id))
+    if player is None:
+        return None
+    current = session.execute(
+        select(Roster.roster_id, Roster.team_id, Roster.roster_tag)
+        .join(RosterPlayerAssociation, RosterPlayerAssociation.roster_id == Roster.roster_id)
+        .where(RosterPlayerAssociation.player_id == player.steam_id,
+                (RosterPlayerAssociation.left_at == None) | (RosterPlayerAssociation.left_at == 0))
+        .order_by(RosterPlayerAssociation.joined_at.desc())
+    ).first()
+    return {
+        "display-name": player.display_name,
+        "display-tag": current.roster_tag if current else None,
+        "current-roster": current.roster_id if current else None,
+        "current-team": current.team_id if current else None,
+        "matches": [match.match_id for match in MembershipService.player_matches(player.steam_id, session)]
+    }
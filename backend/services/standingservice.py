@@ -0,0 +1,149 @@
+from collections import defaultdict
+from sqlalchemy import Select, select, delete, insert, func, case, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import scoped_session
+
+from models import MatchResult, Match, Standing
+from utils.typing import SiteID
+from utils.logger import Logger
+
+standing_logger = Logger.get_logger()
+
+STANDING_COLUMNS = ["played", "wins", "losses", "draws", "maps_won", "maps_lost", "map_difference", "forfeits"]
+
+def standing_rows(pairs: Select) -> Select:
+    """
+    Groups the map pairs of `MatchResult.pairs()` (filtered as needed) into standing rows, one per season and roster:
+    `(season_id, roster_id, *STANDING_COLUMNS)`. A match is won by the roster that won more of its maps
+    """
+    pairs = pairs.add_columns(Match.was_forfeit).where(Match.season_id.is_not(None)).subquery()
+
+    matches = (
+        select(pairs.c.season_id, pairs.c.roster_a, pairs.c.roster_b,
+                func.max(case((pairs.c.was_forfeit == True, 1), else_=0)).label("forfeit"),
+                func.sum(case((pairs.c.score_a > pairs.c.score_b, 1), else_=0)).label("maps_a"),
+                func.sum(case((pairs.c.score_b > pairs.c.score_a, 1), else_=0)).label("maps_b"),
+                func.sum(pairs.c.score_a - pairs.c.score_b).label("difference"))
+        .group_by(pairs.c.match_id, pairs.c.roster_a, pairs.c.roster_b)
+        .subquery()
+    )
+    # Every match once from each roster's side
+    sides = union_all(
+        select(matches.c.season_id, matches.c.roster_a.label("roster_id"), matches.c.maps_a.label("won"),
+                matches.c.maps_b.label("lost"), matches.c.difference, matches.c.forfeit),
+        select(matches.c.season_id, matches.c.roster_b, matches.c.maps_b, matches.c.maps_a, -matches.c.difference, matches.c.forfeit)
+    ).subquery()
+
+    return (
+        select(sides.c.season_id, sides.c.roster_id, func.count(),
+                func.sum(case((sides.c.won > sides.c.lost, 1), else_=0)),
+                func.sum(case((sides.c.won < sides.c.lost, 1), else_=0)),
+                func.sum(case((sides.c.won == sides.c.lost, 1), else_=0)),
+                func.sum(sides.c.won), func.sum(sides.c.lost), func.sum(sides.c.difference), func.sum(sides.c.forfeit))
+        .group_by(sides.c.season_id, sides.c.roster_id)
+    )
+
+def refresh(session: scoped_session, season_ids: set[int] | None = None, commit: bool = True) -> int:
+    """
+    Recomputes the standings of the given seasons from their played matches with a single grouped INSERT ... SELECT,
+    replacing what was stored before, so re-scraped matches are never counted twice. Used for full rebuilds, matches
+    ingested one batch at a time go through `match_contributions` and `apply_changes` instead
+
+    params:
+        session[scoped_session]: The session to refresh the standings with
+        season_ids[set[int]]: The seasons to refresh (defaults to every season)
+        commit[bool]: Commit the session after refreshing
+
+    returns:
+        num_standings[int]: the number of standings written
+    """
+    season_ids = {season_id for season_id in season_ids if season_id is not None} if season_ids is not None else None
+    if season_ids is not None and not season_ids:
+        return 0
+    # Staged matches must be visible to the query below
+    session.flush()
+
+    pairs = MatchResult.pairs()
+    if season_ids is not None:
+        pairs = pairs.where(Match.season_id.in_(season_ids))
+
+    stale = delete(Standing)
+    if season_ids is not None:
+        stale = stale.where(Standing.season_id.in_(season_ids))
+    session.execute(stale)
+    num_standings = session.execute(
+        insert(Standing).from_select(["season_id", "roster_id", *STANDING_COLUMNS], standing_rows(pairs))
+    ).rowcount
+
+    if commit:
+        session.commit()
+    return num_standings
+
+def match_contributions(session: scoped_session, site_ids: list[SiteID]) -> dict[tuple[int, int], tuple[int, ...]]:
+    """
+    Gets what the given matches, as currently stored, add to the standings of their seasons. Taken before and after
+    the matches are written, the difference is what `apply_changes` adds to the standings
+
+    returns:
+        contributions[dict[tuple[int, int], tuple[int, ...]]]: the `STANDING_COLUMNS` of every `(season_id, roster_id)`
+    """
+    # Staged matches must be visible to the query below
+    session.flush()
+    by_source = defaultdict(list)
+    for site_id in site_ids:
+        by_source[site_id.get_source()].append(site_id.get_id())
+
+    contributions = defaultdict(lambda: [0] * len(STANDING_COLUMNS))
+    for source, ids in by_source.items():
+        column = Match.site_column(source)
+        for start in range(0, len(ids), 1000):
+            for season_id, roster_id, *values in session.execute(standing_rows(MatchResult.pairs().where(column.in_(ids[start:start + 1000])))):
+                totals = contributions[season_id, roster_id]
+                for i, value in enumerate(values):
+                    totals[i] += value or 0
+    return {key: tuple(values) for key, values in contributions.items()}
+
+def apply_changes(session: scoped_session,
+                    before: dict[tuple[int, int], tuple[int, ...]],
+                    after: dict[tuple[int, int], tuple[int, ...]],
+                    commit: bool = False) -> int:
+    """
+    Updates the stored standings by the difference between the contributions of a batch of matches before and after
+    they were written (see `match_contributions`): a re-scraped match has its old result taken off and its new one
+    added, and a match that moved season is taken off the old season's table. Rosters left without a played match
+    drop out of their season's table
+
+    returns:
+        num_changed[int]: the number of standings changed
+    """
+    zero = (0,) * len(STANDING_COLUMNS)
+    deltas = []
+    for season_id, roster_id in before.keys() | after.keys():
+        delta = [new - old for new, old in zip(after.get((season_id, roster_id), zero), before.get((season_id, roster_id), zero))]
+        if any(delta):
+            deltas.append({"season_id": season_id, "roster_id": roster_id, **dict(zip(STANDING_COLUMNS, delta))})
+
+    if deltas:
+        upsert = sqlite_insert(Standing)
+        upsert = upsert.on_conflict_do_update(index_elements=[Standing.season_id, Standing.roster_id],
+                                              set_={column: getattr(Standing, column) + getattr(upsert.excluded, column) for column in STANDING_COLUMNS})
+        session.execute(upsert, deltas)
+        session.execute(delete(Standing).where(Standing.played <= 0, Standing.season_id.in_({delta["season_id"] for delta in deltas})))
+
+    if commit:
+        session.commit()
+    return len(deltas)
+
+def rebuild(session: scoped_session, commit: bool = True) -> int:
+    """
+    Recomputes the standings of every season
+    """
+    num_standings = refresh(session, None, commit)
+    standing_logger.log_info(f"Rebuilt {num_standings} season standings")
+    return num_standings
+
+def season_standings(season_id: int) -> list[dict]:
+    """
+    Gets the standings table of a season, best first, each entry holding its position
+    """
+    return [{"position": position, **standing.json()} for position, standing in enumerate(Standing.get_season(season_id), 1)]
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+import numpy as np
+
+from models import MatchResult, Match, Map, Season
+from database import db_session, data_generation
+
+GROUP_KEYS = ("map", "season", "format", "roster")
+
+class ResultTable:
+    """
+    Every played map as columnar NumPy arrays, one row per map. Strings are dictionary encoded as integer codes (maps by
+    their `Map` ID, formats into `formats`), so grouping and filtering never touch Python objects
+    """
+
+    def __init__(self, rows: list[tuple], map_names: dict[int, str] | None = None) -> None:
+        (match_id, epoch, season, roster_a, roster_b, map_id, score_a, score_b, forfeit, format_) = (
+            list(column) for column in zip(*rows)) if rows else ([] for _ in range(10))
+
+        self.match = np.array(match_id, dtype=np.int64)
+        self.epoch = np.array([e or 0.0 for e in epoch], dtype=np.float64)
+        self.season = np.array([s if s is not None else -1 for s in season], dtype=np.int64)
+        self.roster_a = np.array(roster_a, dtype=np.int64)
+        self.roster_b = np.array(roster_b, dtype=np.int64)
+        self.score_a = np.array(score_a, dtype=np.float64)
+        self.score_b = np.array(score_b, dtype=np.float64)
+        self.forfeit = np.array([bool(f) for f in forfeit], dtype=bool)
+
+        self.map = np.array(map_id, dtype=np.int64)
+        self.map_names = map_names or {}
+        self.map_ids = {map_name: map_id for map_id, map_name in self.map_names.items()}
+        self.formats, self.format = np.unique(np.array([f or "" for f in format_], dtype=object).astype(str), return_inverse=True)
+
+    @staticmethod
+    def load(session: scoped_session) -> ResultTable:
+        """
+        Bulk loads every played map joined to its match and season with a single query
+        """
+        rows = session.execute(
+            MatchResult.pairs()
+            .add_columns(Match.was_forfeit, Season.season_format)
+            .outerjoin(Season, Season.season_id == Match.season_id)
+        ).all()
+        return ResultTable(rows, dict(session.execute(select(Map.map_id, Map.map_name)).all()))
+
+    def __len__(self) -> int:
+        return len(self.match)
+
+    def mask(self, season: int | None = None, roster: int | None = None, map_name: str | None = None, format_: str | None = None) -> np.ndarray:
+        """
+        Gets a boolean mask of the rows matching every given filter
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if season is not None:
+            mask &= self.season == int(season)
+        if roster is not None:
+            mask &= (self.roster_a == int(roster)) | (self.roster_b == int(roster))
+        if map_name is not None:
+            mask &= self.map == self.map_ids.get(map_name, -1)
+        if format_ is not None:
+            mask &= self.format == np.searchsorted(self.formats, format_) if format_ in self.formats else False
+        return mask
+
+    def aggregate(self, by: tuple[str, ...], mask: np.ndarray | None = None, roster: int | None = None) -> list[dict]:
+        """
+        Computes grouped aggregates over the (masked) rows with a vectorised group-by
+
+        When grouping by roster every map is counted once from each roster's side, giving win / loss / draw counts and
+        the average round differential from that roster's point of view. Otherwise every map is counted once, and the
+        round differential is the average winning margin
+
+        params:
+            by[tuple[str, ...]]: the keys to group by, any of "map", "season", "format" and "roster"
+            mask[np.ndarray]: only aggregate these rows (defaults to all)
+            roster[int]: when grouping by roster, only keep this roster's groups
+
+        returns:
+            groups[list[dict]]: one dict per group, holding the group keys and its aggregates
+        """
+        if any(key not in GROUP_KEYS for key in by):
+            raise ValueError(f"Can only group by {GROUP_KEYS}, not {by}")
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+
+        columns = {"map": self.map[rows], "season": self.season[rows], "format": self.format[rows]}
+        forfeit = self.forfeit[rows]
+        if "roster" in by:
+            # Count every map once from each side
+            columns = {key: np.concatenate([column, column]) for key, column in columns.items()}
+            columns["roster"] = np.concatenate([self.roster_a[rows], self.roster_b[rows]])
+            own = np.concatenate([self.score_a[rows], self.score_b[rows]])
+            other = np.concatenate([self.score_b[rows], self.score_a[rows]])
+            forfeit = np.concatenate([forfeit, forfeit])
+            if roster is not None:
+                keep = columns["roster"] == int(roster)
+                columns = {key: column[keep] for key, column in columns.items()}
+                own, other, forfeit = own[keep], other[keep], forfeit[keep]
+            difference = own - other
+        else:
+            difference = np.abs(self.score_a[rows] - self.score_b[rows])
+
+        if not len(difference):
+            return []
+
+        keys = np.stack([columns[key] for key in by], axis=1) if by else np.zeros((len(difference), 1), dtype=np.int64)
+        groups, group = np.unique(keys, axis=0, return_inverse=True)
+        group = group.reshape(-1)
+        played = np.bincount(group, minlength=len(groups))
+
+        stats = {
+            "played": played,
+            "round-differential": np.bincount(group, weights=difference, minlength=len(groups)) / played,
+            "forfeit-rate": np.bincount(group, weights=forfeit, minlength=len(groups)) / played
+        }
+        if "roster" in by:
+            stats["wins"] = np.bincount(group, weights=difference > 0, minlength=len(groups)).astype(np.int64)
+            stats["losses"] = np.bincount(group, weights=difference < 0, minlength=len(groups)).astype(np.int64)
+            stats["draws"] = played - stats["wins"] - stats["losses"]
+            stats["win-rate"] = (stats["wins"] + 0.5 * stats["draws"]) / played
+
+        return [self.__describe(by, groups[i]) | {name: values[i].item() for name, values in stats.items()} for i in range(len(groups))]
+
+    def __describe(self, by: tuple[str, ...], codes: np.ndarray) -> dict:
+        description = {}
+        for key, code in zip(by, codes.tolist()):
+            if key == "map":
+                description["map"] = self.map_names.get(code)
+            elif key == "format":
+                description["format"] = str(self.formats[code]) or None
+            elif key == "season":
+                description["season-id"] = code if code >= 0 else None
+            else:
+                description["roster-id"] = code
+        return description
+
+_cache = {"generation": None, "table": None, "results": {}}
+
+def get_table(session: scoped_session = db_session) -> ResultTable:
+    """
+    Gets the result table, only reloading it from the database when the data generation has changed
+    """
+    generation = data_generation(session)
+    if _cache["generation"] != generation:
+        _cache.update(generation=generation, table=ResultTable.load(session), results={})
+    return _cache["table"]
+
+def stats(by: tuple[str, ...],
+            season: int | None = None,
+            roster: int | None = None,
+            map_name: str | None = None,
+            format_: str | None = None,
+            session: scoped_session = db_session) -> list[dict]:
+    """
+    Gets grouped statistics over every played map matching the given filters, cached until the data changes
+
+    params:
+        by[tuple[str, ...]]: the keys to group by, any of "map", "season", "format" and "roster"
+        season[int]: only include maps of this season
+        roster[int]: only include maps played by this roster
+        map_name[str]: only include maps with this name
+        format_[str]: only include maps of seasons with this format
+
+    returns:
+        groups[list[dict]]: one dict per group, holding the group keys and its aggregates
+    """
+    table = get_table(session)
+    key = (tuple(by), season, roster, map_name, format_)
+    if key not in _cache["results"]:
+        _cache["results"][key] = table.aggregate(tuple(by), table.mask(season, roster, map_name, format_), roster)
+    return _cache["results"][key]
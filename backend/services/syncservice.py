@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import scoped_session
+import threading
+import random
+import signal
+import time
+import os
+
+from models import ScrapeJob, JobState
+from services.matchservice import League, LEAGUES, discover_concurrently, scrape_match_details
+from utils.decoding import DecodePool
+from utils.http_cache import HttpCache
+from utils.archive import PayloadArchive
+from utils.typing import SiteID, TfSource
+from utils.logger import Logger
+import services.careerservice as CareerService
+import services.snapshotservice as SnapshotService
+
+sync_logger = Logger.get_logger()
+
+def stop_on_signals(stop: threading.Event) -> None:
+    """
+    Makes SIGINT and SIGTERM set `stop` rather than kill the process, so that a running sync finishes the jobs in flight
+    and commits them before exiting. Must be called from the main thread
+    """
+    def handle(signum, frame) -> None:
+        sync_logger.log_info(f"Received {signal.Signals(signum).name}, stopping once the jobs in flight are done")
+        stop.set()
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+
+class SyncDaemon:
+    """
+    Long running sync that polls every league for new matches at a fixed cadence, so new results reach the API
+    within minutes rather than at the next scheduled scrape. The host clients (and their connection pools), the seen
+    ID filters, the decode pool, the HTTP cache, the payload archive and the database connection are kept between
+    cycles. Each cycle pages through the new match IDs, queues the recently played matches that are due again, and
+    fetches what was queued: the scans of every stored match for incomplete and due ones are left to a full cycle every
+    `full_interval` seconds. The career timelines are brought up to date by every cycle that wrote new data, while the
+    serving snapshot, which has to be rewritten as a whole, is rebuilt at most every `snapshot_interval` seconds
+
+    params:
+        sources[list[TfSource]]: the leagues to sync (defaults to every league)
+        interval[float]: seconds between cycles (defaults to the `sync_interval` environment variable, or 300)
+        jitter[float]: fraction of the interval each wait is randomly shortened or lengthened by, so that several
+        daemons do not poll the hosts in step (defaults to the `sync_jitter` environment variable, or 0.1)
+        full_interval[float]: seconds between full cycles (defaults to the `sync_full_interval` environment variable,
+        or 3600)
+        snapshot_interval[float]: minimum seconds between snapshot rebuilds (defaults to the `sync_snapshot_interval`
+        environment variable, or 900), data written in between is served from the next one
+    """
+
+    def __init__(self,
+                    sources: list[TfSource] | None = None,
+                    interval: float | None = None,
+                    jitter: float | None = None,
+                    full_interval: float | None = None,
+                    snapshot_interval: float | None = None) -> None:
+        self.sources = sources or list(LEAGUES)
+        self.interval = float(interval if interval is not None else os.environ.get("sync_interval", 300))
+        self.jitter = float(jitter if jitter is not None else os.environ.get("sync_jitter", 0.1))
+        self.full_interval = float(full_interval if full_interval is not None else os.environ.get("sync_full_interval", 3600))
+        self.snapshot_interval = float(snapshot_interval if snapshot_interval is not None else os.environ.get("sync_snapshot_interval", 900))
+        # Whether data was written since the snapshot was last built, and when that was
+        self.snapshot_stale, self.last_snapshot = False, None
+
+    def next_wait(self) -> float:
+        """
+        Gets the number of seconds to wait before the next cycle
+        """
+        return max(0.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def cycle(self,
+                session: scoped_session,
+                leagues: list[League],
+                decoder: DecodePool,
+                full: bool = False,
+                stop: threading.Event | None = None,
+                batch_size: int = 90,
+                cache: HttpCache | None = None,
+                archive: PayloadArchive | None = None) -> dict[TfSource, int]:
+        """
+        Runs a single sync: discovers new and due (and, for a full cycle, incomplete) matches, fetches them, and
+        brings the career timelines and the serving snapshot up to date if anything changed
+
+        returns:
+            num_scraped[dict[TfSource, int]]: the number of matches scraped of each league
+        """
+        started = time.time()
+        discover_concurrently(session, leagues, full)
+        session.commit()
+
+        pending = [league for league in leagues
+                   if ScrapeJob.count("match", league.source, JobState.PENDING) + ScrapeJob.count("match", league.source, JobState.LEASED)]
+        num_scraped = scrape_match_details(session, pending, batch_size, stop=stop, decoder=decoder,
+                                            cache=cache, archive=archive) if pending else {}
+
+        if ScrapeJob.count_changed(session, "match", started):
+            CareerService.refresh_stale(session)
+            self.snapshot_stale = True
+        if self.snapshot_stale and (self.last_snapshot is None or time.monotonic() - self.last_snapshot >= self.snapshot_interval):
+            SnapshotService.build(session)
+            self.snapshot_stale, self.last_snapshot = False, time.monotonic()
+        session.commit()
+        # The IDs of this cycle's pages and jobs are not needed by the next one
+        SiteID.clear_interned()
+        return num_scraped
+
+    def run(self,
+            session: scoped_session,
+            stop: threading.Event | None = None,
+            batch_size: int = 90,
+            workers: int | None = None,
+            cycles: int | None = None) -> int:
+        """
+        Syncs until `stop` is set. A cycle that fails is logged and rolled back, and the next one is tried as usual
+
+        params:
+            session[scoped_session]: the session to write with
+            stop[threading.Event]: once set, the cycle in progress finishes the jobs in flight and the daemon returns
+            batch_size[int]: how many jobs to claim per league at once
+            workers[int]: the number of decode worker processes (defaults to the number of cores)
+            cycles[int]: the number of cycles to run before returning (defaults to no limit)
+
+        returns:
+            num_scraped[int]: the number of matches scraped
+        """
+        stop = stop or threading.Event()
+        leagues = [LEAGUES[source]() for source in self.sources]
+        num_scraped, num_cycles, last_full = 0, 0, None
+        try:
+            with DecodePool(workers) as decoder, HttpCache() as cache, PayloadArchive() as archive:
+                while not stop.is_set():
+                    full = last_full is None or time.monotonic() - last_full >= self.full_interval
+                    try:
+                        num_scraped += sum(self.cycle(session, leagues, decoder, full, stop, batch_size, cache, archive).values())
+                        if full:
+                            last_full = time.monotonic()
+                    except Exception as e:
+                        sync_logger.log_error(f"Sync cycle failed: {type(e).__name__}: {e}")
+                        session.rollback()
+                        # Cache entries of the rolled back matches would otherwise be committed with the next cycle
+                        cache.rollback()
+
+                    # Log messages are only written out on exit otherwise
+                    Logger.write()
+                    num_cycles += 1
+                    if cycles is not None and num_cycles >= cycles:
+                        break
+                    stop.wait(self.next_wait())
+        finally:
+            for league in leagues:
+                league.client.close()
+
+        sync_logger.log_info(f"Sync stopped after {num_cycles} cycles, {num_scraped} matches scraped")
+        return num_scraped
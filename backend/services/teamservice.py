@@ -1,50 +1,205 @@
-from models import Roster, Player, RosterPlayerAssociation
-from utils.scraping import scrape_parallel
-from utils import epoch_from_timestamp
-from database import db_session
+from collections import Counter, defaultdict
+from itertools import groupby
+from sqlalchemy import select, update as update_rows, delete
+from sqlalchemy.orm import scoped_session
+
+from models import Team, Roster, Player, RosterPlayerAssociation, ScrapeJob, JobState
+from utils.scraping import scrape_parallel_cached, content_digest
+from utils.http_cache import HttpCache
+from utils.archive import PayloadArchive
+from utils.typing import SiteID, TfSource
+from utils import epoch_from_timestamp, parse_timestamps
+from database import db_session, UnitOfWork
+from services.refreshservice import schedule_rosters
+from utils.unionfind import UnionFind
 from utils import Logger
 
 team_logger = Logger.get_logger()
 
+MIN_SHARED_PLAYERS = 3
+MIN_SHARED_FRACTION = 0.5 # Of the smaller roster's players
+MAX_MEMBERSHIP_GAP = 90 * 24 * 60 * 60 # Longest break between two rosters for a player to count as moving between them
+
+
+def insert_roster(roster_data: dict, commit: bool = True) -> Roster:
 
-def insert_roster(roster_data: dict) -> None:
+    roster = Roster.get_or_insert(db_session, SiteID.rgl_id(roster_data["teamId"]), commit=False)
+    roster.roster_name = roster_data.get("name", roster.roster_name)
+    roster.roster_tag = roster_data.get("tag", roster.roster_tag)
+    roster.created_at = epoch_from_timestamp(roster_data.get("createdAt")) or roster.created_at
+    roster.updated_at = epoch_from_timestamp(roster_data.get("updatedAt")) or roster.updated_at
 
-    roster = Roster.get_rgl_roster(int(roster_data["teamId"]))
-    roster.update_from_rgl_data(roster_data)
+    # Every player's join and leave timestamps parsed in one batch
+    players = roster_data["players"]
+    joined, left = parse_timestamps([player["joinedAt"] for player in players] + [player["leftAt"] for player in players]).reshape(2, -1).tolist()
 
-    for player in roster_data["players"]:
-        p = Player.query.filter(Player.steam_id == int(player["steamId"])).first()
-        if not p:
-            p = Player()
-            p.steam_id = int(player["steamId"])
-            db_session.add(p)
-            db_session.commit()
-        if not RosterPlayerAssociation.query.filter(RosterPlayerAssociation.player_id == int(player["steamId"]),
-                                                    RosterPlayerAssociation.roster_id == roster.roster_id,
-                                                    RosterPlayerAssociation.joined_at == epoch_from_timestamp(player["joinedAt"])):
-            ass = RosterPlayerAssociation(p, roster, epoch_from_timestamp(player["joinedAt"]), epoch_from_timestamp(player["leftAt"]))
+    for player, joined_at, left_at in zip(players, joined, left):
+        p = Player.get_or_insert(db_session, int(player["steamId"]), commit=False)
+        membership = RosterPlayerAssociation.query.filter(RosterPlayerAssociation.player_id == int(player["steamId"]),
+                                                            RosterPlayerAssociation.roster_id == roster.roster_id,
+                                                            RosterPlayerAssociation.joined_at == joined_at).first()
+        if not membership:
+            ass = RosterPlayerAssociation(p, roster, joined_at, left_at)
             db_session.add(ass)
+        else:
+            # Players that have since left close their open membership
+            membership.left_at = left_at
 
     roster.is_complete = True
-    db_session.commit()
 
-def scrape_rgl_rosters() -> int:
+    # Flush so that players shared between rosters of the same batch are not inserted twice
+    db_session.flush()
+    if commit:
+        db_session.commit()
+    return roster
+
+def linked_rosters(memberships: list[tuple[int, int, float, float]], roster_ids: set[int] | None = None) -> list[tuple[int, int]]:
+    """
+    Finds pairs of rosters that are the same team, going by players moving from one straight to the other: both rosters
+    must share at least `MIN_SHARED_PLAYERS` players, and `MIN_SHARED_FRACTION` of the smaller roster, that joined the
+    second roster within `MAX_MEMBERSHIP_GAP` of leaving the first (or while still on it)
+
+    params:
+        memberships[list[tuple]]: `(player_id, roster_id, joined_at, left_at)` rows, including every membership of each
+        player and of each roster involved, `left_at` being 0 while still on the roster
+        roster_ids[set[int]]: only return pairs involving one of these rosters
+
+    returns:
+        pairs[list[tuple[int, int]]]: the linked `(roster_a, roster_b)` pairs
+    """
+    sizes = Counter(roster_id for _, roster_id in {(player_id, roster_id) for player_id, roster_id, _, _ in memberships})
+
+    shared = Counter()
+    memberships = sorted(memberships, key=lambda membership: (membership[0], membership[2] or 0))
+    for _, history in groupby(memberships, key=lambda membership: membership[0]):
+        history = list(history)
+        moves = set()
+        for (_, roster_a, _, left_at), (_, roster_b, joined_at, _) in zip(history, history[1:]):
+            if roster_a != roster_b and (not left_at or (joined_at or 0) - left_at <= MAX_MEMBERSHIP_GAP):
+                moves.add((min(roster_a, roster_b), max(roster_a, roster_b)))
+        shared.update(moves)
+
+    return [(a, b) for (a, b), count in shared.items()
+            if count >= MIN_SHARED_PLAYERS and count >= MIN_SHARED_FRACTION * min(sizes[a], sizes[b])
+            and (roster_ids is None or a in roster_ids or b in roster_ids)]
+
+def cluster_rosters(session: scoped_session, roster_ids: list[int] | None = None, commit: bool = True) -> int:
+    """
+    Links rosters into teams with union-find over the rosters that share players (see `linked_rosters`), keeping
+    rosters that already share a team together. Each cluster keeps its lowest existing team ID, merging any other teams
+    into it, and clusters without a team get a new one
+
+    params:
+        session[scoped_session]: The session to assign teams with
+        roster_ids[list[int]]: Only cluster these (newly scraped) rosters with the rosters they share players with,
+        rather than every roster
+        commit[bool]: Commit the session after clustering
+
+    returns:
+        num_changed[int]: the number of rosters whose team changed
+    """
+    session.flush()
+    query = select(RosterPlayerAssociation.player_id, RosterPlayerAssociation.roster_id,
+                    RosterPlayerAssociation.joined_at, RosterPlayerAssociation.left_at)
+    if roster_ids is not None:
+        roster_ids = set(roster_ids)
+        # Every membership of every player of the new rosters, and of every player of the rosters they moved between
+        players = select(RosterPlayerAssociation.player_id).where(RosterPlayerAssociation.roster_id.in_(roster_ids))
+        related = select(RosterPlayerAssociation.roster_id).where(RosterPlayerAssociation.player_id.in_(players))
+        query = query.where(RosterPlayerAssociation.roster_id.in_(related))
+    memberships = session.execute(query).all()
+
+    sets = UnionFind(roster_ids or ())
+    for roster_a, roster_b in linked_rosters(memberships, roster_ids):
+        sets.union(roster_a, roster_b)
+
+    # Rosters already on a team stay together, including team mates that were not part of this run
+    rosters = select(Roster.roster_id, Roster.team_id)
+    if roster_ids is not None:
+        team_ids = select(Roster.team_id).where(Roster.roster_id.in_(list(sets.parent)), Roster.team_id.is_not(None))
+        rosters = rosters.where(Roster.roster_id.in_(list(sets.parent)) | Roster.team_id.in_(team_ids))
+    current = dict(session.execute(rosters).all())
+    teams = defaultdict(list)
+    for roster_id, team_id in current.items():
+        sets.add(roster_id)
+        if team_id is not None:
+            teams[team_id].append(roster_id)
+    for members in teams.values():
+        for roster_id in members[1:]:
+            sets.union(members[0], roster_id)
+
+    assignments, merged = {}, set()
+    for group in sets.groups():
+        team_ids = sorted({current[roster_id] for roster_id in group if current.get(roster_id) is not None})
+        if team_ids:
+            team_id = team_ids[0]
+            merged.update(team_ids[1:])
+        else:
+            team = Team()
+            session.add(team)
+            team_id = team.team_id
+        for roster_id in group:
+            if current.get(roster_id) != team_id:
+                assignments[roster_id] = team_id
+    session.flush()
+
+    if assignments:
+        session.execute(update_rows(Roster), [{"roster_id": roster_id, "team_id": team_id} for roster_id, team_id in assignments.items()])
+    if merged:
+        session.execute(delete(Team).where(Team.team_id.in_(merged)))
+
+    if commit:
+        session.commit()
+    team_logger.log_info(f"Clustered rosters, {len(assignments)} rosters changed team and {len(merged)} teams were merged")
+    return len(assignments)
+
+def scrape_rgl_rosters(batch_size: int = 90) -> int:
     team_logger.log_info("Scraping roster data")
 
-    rosters_to_scrape = [f"https://api.rgl.gg/v0/teams/{roster.rgl_team_id}" for roster in Roster.get_incomplete()]
+    # Queue every incomplete roster, rosters that are already queued are unaffected
+    ScrapeJob.enqueue(db_session, "roster", [SiteID.rgl_id(roster.rgl_team_id) for roster in Roster.get_incomplete()])
+    # Complete rosters are only fetched again once they are due
+    schedule_rosters(db_session, TfSource.RGL)
+    num_to_scrape = ScrapeJob.count("roster", TfSource.RGL, JobState.PENDING)
+
+    scraped = unchanged = 0
+    roster_ids = []
+    with HttpCache() as cache, PayloadArchive() as archive:
+        while jobs := ScrapeJob.claim(db_session, "roster", TfSource.RGL, limit=batch_size):
+            job_ids = {f"https://api.rgl.gg/v0/teams/{job.site_id}": job.job_id for job in jobs}
+            # Rosters that were never written to this database are always fetched and decoded in full
+            for job in jobs:
+                if not job.fetch_count:
+                    cache.invalidate(f"https://api.rgl.gg/v0/teams/{job.site_id}")
+
+            with UnitOfWork(db_session, close=False, on_commit=cache.commit) as uow:
+                for results in scrape_parallel_cached(list(job_ids), cache, 9):
+                    scraped += len(results)
+                    team_logger.log_info(f"Scraping rosters {(scraped) * 100 / max(num_to_scrape, 1):.2f}%, ({scraped}/{num_to_scrape})", end='\r')
 
-    scraped = 0
-    for results in scrape_parallel(rosters_to_scrape, 9):
-        scraped += len(results)
-        team_logger.log_info(f"Scraping rosters {(scraped) * 100 / len(rosters_to_scrape):.2f}%, ({scraped}/{len(rosters_to_scrape)})", end='\r')
+                    if not results:
+                        team_logger.log_warn(f"No results came back for team IDs {scraped}")
 
-        if not results:
-            team_logger.log_warn(f"No results came back for team IDs {scraped}")
+                    # Rosters that are unchanged since the last fetch are not archived, decoded or written
+                    changed = [(url, response.content, response.json()) for url, response in results if response is not None]
+                    unchanged += len(results) - len(changed)
+                    digests = {}
+                    for url, content, result in changed:
+                        archive.append(TfSource.RGL, "roster", result["teamId"], content)
+                        roster_ids.append(insert_roster(result, commit=False).roster_id)
+                        digests[url] = content_digest(result)
+                    archive.commit()
 
-        for result in results:
-            insert_roster(result)
+                    # Jobs are committed along with the rosters they produced
+                    ScrapeJob.complete(db_session, [job_ids[url] for url, _ in results], [digests.get(url) for url, _ in results])
+                    uow.step(sum(1 + len(result["players"]) for _, _, result in changed))
 
-    team_logger.log_info(f"Added {len(rosters_to_scrape)} new rosters", start='\n')
+    # Link the changed rosters to the teams of the rosters they share players with
+    if roster_ids:
+        cluster_rosters(db_session, roster_ids)
+    db_session.remove()
+    team_logger.log_info(f"Added {scraped - unchanged} new rosters ({unchanged} unchanged)", start='\n')
+    return scraped
 
 def update():
     # Make sure that all team data is
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from typing import Any
+import threading
+import socket
+import os
+
+from services.matchservice import League, LEAGUES, JobQueue, MatchBatch, scrape_match_details
+from utils.scraping import HostClient
+from utils.typing import TfSource
+from utils.logger import Logger
+
+worker_logger = Logger.get_logger()
+
+class CoordinatorClient(JobQueue):
+    """
+    Connection of a scrape worker to the coordinator (`coordinator.py`), the one process that owns the database. Shard
+    leases, job claims and the decoded batches all go through it, so that `scrape_match_details` can run on any node
+    that reaches the coordinator over HTTP, in place of the local `JobQueue`
+
+    params:
+        url[str]: base URL of the coordinator (defaults to the `coordinator_url` environment variable, or
+        http://127.0.0.1:5001/coordinator)
+        token[str]: the coordinator's shared secret, if it has one (defaults to the `coordinator_token` environment
+        variable)
+        retries[int]: the number of times a request is retried after a connection error, claims and writes included
+        (jobs claimed twice are claimed again once their lease runs out, and writing a batch twice changes nothing)
+        timeout[float]: seconds to wait for a response, writing a large batch can take a while
+    """
+
+    def __init__(self, url: str | None = None, token: str | None = None, retries: int = 5, timeout: float = 120) -> None:
+        self.url = (url or os.environ.get("coordinator_url", "http://127.0.0.1:5001/coordinator")).rstrip("/")
+        token = token or os.environ.get("coordinator_token")
+        self.headers = {"X-Coordinator-Token": token} if token else None
+        # One connection for the worker and one for its heartbeats, which are never rate limited
+        self.client = HostClient(rate=1000, burst=1000, connections=2, retries=retries, timeout=timeout)
+
+    def __enter__(self) -> CoordinatorClient:
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback) -> None:
+        self.close()
+
+    def __request(self, method: str, path: str, json: Any = None, **params) -> Any:
+        response = self.client.request(method, f"{self.url}{path}", self.headers, json, **params)
+        if response is None:
+            raise RuntimeError(f"Coordinator {self.url} could not be reached")
+        try:
+            body = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise
+        if not body['success']:
+            raise RuntimeError(f"Coordinator {self.url} refused {path}: {body['error']}")
+        return body['data']
+
+    def acquire(self, worker_id: str, source: TfSource, num_shards: int, lease: float) -> int | None:
+        return self.__request("POST", "/lease/acquire", {'worker-id': worker_id, 'source': int(source), 'num-shards': num_shards, 'lease': lease})
+
+    def heartbeat(self, worker_id: str, lease: float) -> list[tuple[int, str, int, int]]:
+        return [tuple(held) for held in self.__request("POST", "/lease/heartbeat", {'worker-id': worker_id, 'lease': lease})]
+
+    def release(self, worker_id: str, source: TfSource | None = None, shard: int | None = None) -> None:
+        self.__request("POST", "/lease/release", {'worker-id': worker_id, 'source': None if source is None else int(source), 'shard': shard})
+
+    def count(self, source: TfSource) -> int:
+        return self.__request("GET", "/jobs/count", source=int(source))
+
+    def remaining(self, sources: list[TfSource]) -> int:
+        return self.__request("GET", "/jobs/remaining", source=[int(source) for source in sources])
+
+    def fail_pending(self, source: TfSource, error: str) -> int:
+        return self.__request("POST", "/jobs/fail-pending", {'source': int(source), 'error': error})
+
+    def claim(self, source: TfSource, limit: int, shard: tuple[int, int] | None = None) -> list[tuple[int, int, int]]:
+        return [tuple(job) for job in self.__request("POST", "/jobs/claim", {'source': int(source), 'limit': limit, 'shard': shard})]
+
+    def write(self, batch: MatchBatch) -> set[int]:
+        return set(self.__request("POST", "/matches", batch.json()))
+
+    def update_ratings(self) -> None:
+        self.__request("POST", "/ratings")
+
+    def close(self) -> None:
+        self.client.close()
+
+class ShardWorker:
+    """
+    Scrape worker that works through the match job queues one leased shard at a time, so that workers on any number of
+    nodes can share the queues. The workers never open the database: the leases, the job queues and the results live
+    with the coordinator (see `CoordinatorClient`), and each worker only fetches and decodes, on its own host clients,
+    from its own address, and so at the full rate each league allows every address. Leases are renewed by a heartbeat
+    thread; a shard whose lease is lost (e.g. the worker stalled past its lease) is left as soon as the jobs in flight
+    are finished, and the shards of workers that died are taken over once their lease runs out
+
+    params:
+        sources[list[TfSource]]: the leagues to work on (defaults to every league)
+        worker_id[str]: the name of the worker (defaults to the `worker_id` environment variable, or host and process)
+        num_shards[int]: the number of shards every queue is split into, the same for every worker (defaults to the
+        `scrape_shards` environment variable, or 16)
+        lease[float]: seconds until a lease runs out unless renewed (defaults to the `scrape_lease` environment
+        variable, or 60), heartbeats are sent three times per lease
+        coordinator[CoordinatorClient]: the coordinator to work for (defaults to the one at `coordinator_url`)
+    """
+
+    def __init__(self,
+                    sources: list[TfSource] | None = None,
+                    worker_id: str | None = None,
+                    num_shards: int | None = None,
+                    lease: float | None = None,
+                    coordinator: CoordinatorClient | None = None) -> None:
+        self.sources = sources or list(LEAGUES)
+        self.worker_id = worker_id or os.environ.get("worker_id", f"{socket.gethostname()}-{os.getpid()}")
+        self.num_shards = int(num_shards or os.environ.get("scrape_shards", 16))
+        self.lease = float(lease or os.environ.get("scrape_lease", 60))
+        self.coordinator = coordinator or CoordinatorClient()
+        self.held = None # (source, shard) currently worked on
+        self.lost = threading.Event()
+
+    def __heartbeat(self, done: threading.Event, stop: threading.Event) -> None:
+        while not done.wait(self.lease / 3):
+            try:
+                held = {(source, shard) for source, entity, num_shards, shard in self.coordinator.heartbeat(self.worker_id, self.lease)
+                        if entity == "match" and num_shards == self.num_shards}
+            except RuntimeError as error:
+                # The lease may still be renewed by the next heartbeat, the shard is only left once it is gone
+                worker_logger.log_warn(f"Worker {self.worker_id} could not send a heartbeat: {error}")
+                continue
+            if self.held is not None and self.held not in held:
+                worker_logger.log_warn(f"Worker {self.worker_id} lost its lease of shard {self.held[1]}")
+                self.lost.set()
+            if stop.is_set():
+                self.lost.set()
+
+    def __acquire(self, leagues: list[League]) -> tuple[League, int] | None:
+        for league in leagues:
+            shard = self.coordinator.acquire(self.worker_id, league.source, self.num_shards, self.lease)
+            if shard is not None:
+                return league, shard
+        return None
+
+    def run(self,
+            batch_size: int = 90,
+            workers: int | None = None,
+            stop: threading.Event | None = None,
+            idle: float = 5) -> int:
+        """
+        Works through shards until no jobs are left in any queue (or `stop` is set). While jobs remain only in
+        shards other workers hold, it waits for them to finish or die
+
+        params:
+            batch_size[int]: how many jobs to claim at once
+            workers[int]: the number of decode worker processes (defaults to the number of cores)
+            stop[threading.Event]: once set, the shard in progress is finished and the worker returns
+            idle[float]: seconds to wait before looking for a free shard again
+
+        returns:
+            num_scraped[int]: the number of matches scraped
+        """
+        stop = stop or threading.Event()
+        done = threading.Event()
+        leagues = [LEAGUES[source]() for source in self.sources]
+        heartbeat = threading.Thread(target=self.__heartbeat, args=(done, stop), daemon=True)
+        heartbeat.start()
+
+        num_scraped = 0
+        try:
+            while not stop.is_set():
+                acquired = self.__acquire(leagues)
+                if acquired is None:
+                    if not self.coordinator.remaining([league.source for league in leagues]):
+                        break
+                    stop.wait(idle)
+                    continue
+
+                league, shard = acquired
+                worker_logger.log_info(f"Worker {self.worker_id} scraping {league.source.name} shard {shard} / {self.num_shards}")
+                self.held = (league.source, shard)
+                self.lost.clear()
+                num_scraped += scrape_match_details(None, [league], batch_size, workers, shard=(shard, self.num_shards),
+                                                    stop=self.lost, update_ratings=False, job_queue=self.coordinator)[league.source]
+                self.held = None
+                self.coordinator.release(self.worker_id, league.source, shard)
+
+            # Ratings are updated once the queues are done, rather than by every shard
+            self.coordinator.update_ratings()
+        finally:
+            done.set()
+            heartbeat.join()
+            self.coordinator.release(self.worker_id)
+            for league in leagues:
+                league.client.close()
+
+        worker_logger.log_info(f"Worker {self.worker_id} scraped {num_scraped} matches")
+        return num_scraped
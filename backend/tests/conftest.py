@@ -8,6 +8,8 @@ import pytest
 
 os.environ["db"] = ":memory:"
 from database import engine, init_db, teardown_db
+from models import Map, Match, MatchResult, Season
+from utils.typing import SiteID
 
 def pytest_sessionstart(session):
     Logger.init("logs", "tests", True)
@@ -37,3 +39,21 @@ def session(engine_, tables):
     transaction.rollback()
     conn.close()
     Session.remove()
+    # Maps committed by the test were rolled back with it
+    Map.forget()
+
+def add_match(session, rgl_id: int, season: Season | None, maps: list[tuple], epoch: float | None = None,
+                forfeit: bool = False, commit: bool = True) -> Match:
+    """
+    Adds a played RGL match, whose maps are `(map_name, roster_a, score_a, roster_b, score_b)` tuples. The epoch
+    defaults to 1000 + `rgl_id`, so matches are played in the order of their IDs
+    """
+    match = Match(SiteID.rgl_id(rgl_id), epoch=1000 + rgl_id if epoch is None else epoch, forfeit=forfeit)
+    match.season_id = season.season_id if season else None
+    session.add(match)
+    for map_name, roster_a, score_a, roster_b, score_b in maps:
+        session.add(MatchResult(match.match_id, roster_a, map_name, score_a))
+        session.add(MatchResult(match.match_id, roster_b, map_name, score_b))
+    if commit:
+        session.commit()
+    return match
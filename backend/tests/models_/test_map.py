@@ -0,0 +1,75 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from database import Base
+from models import Map, Match, MatchResult, Roster
+from models.map import rename_legacy_results, migrate_legacy_results
+from utils.typing import SiteID
+
+def test_map_intern(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(2)]
+    session.add_all(rosters)
+    match = Match(SiteID.rgl_id(1))
+    session.add(match)
+    session.add_all([MatchResult(match.match_id, rosters[0], "koth_product", 3), MatchResult(match.match_id, rosters[1], "koth_product", 1),
+                        MatchResult(match.match_id, rosters[0], "cp_process", 0)])
+    session.commit()
+
+    # Every result of a map shares its ID, and its dictionary row was written with them
+    results = session.query(MatchResult).all()
+    map_ids = {(result.roster_id, result.score): result.map_id for result in results}
+    assert map_ids[(rosters[0].roster_id, 3)] == map_ids[(rosters[1].roster_id, 1)] == Map.intern("koth_product")
+    assert map_ids[(rosters[0].roster_id, 0)] == Map.intern("cp_process") != Map.intern("koth_product")
+    assert session.execute(select(Map.map_name).where(Map.map_id == Map.intern("koth_product"))).scalar() == "koth_product"
+    assert {result.map_name for result in results} == {"koth_product", "cp_process"}
+
+    # Map names still work in queries, as a lookup into the dictionary
+    assert session.query(MatchResult).filter(MatchResult.map_name == "koth_product").count() == 2
+    assert Map.lookup("pl_upward") is None
+
+def test_map_intern_transactions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'maps.db'}")
+    Base.metadata.create_all(bind=engine)
+    try:
+        # A name interned in a transaction that is rolled back is not cached
+        with Session(engine) as first, Session(engine) as second:
+            Map.intern("koth_product", first)
+            assert "koth_product" not in Map.IDS
+            first.rollback()
+            assert "koth_product" not in Map.IDS
+
+            map_id = Map.intern("cp_process", second)
+            second.commit()
+            assert Map.IDS["cp_process"] == map_id and Map.NAMES[map_id] == "cp_process"
+
+            # Once committed by one writer, the name resolves to the same row for every other
+            Map.forget()
+            assert Map.intern("cp_process", first) == map_id
+            assert Map.intern("koth_product", first) != map_id
+            first.commit()
+
+        with engine.connect() as connection:
+            assert dict(connection.execute(select(Map.map_name, Map.map_id)).tuples().all()) == {
+                "cp_process": map_id, "koth_product": Map.IDS["koth_product"]}
+    finally:
+        Map.forget()
+
+def test_map_migration(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("""CREATE TABLE match_results (match_id INTEGER, roster_id INTEGER, map_name VARCHAR, score INTEGER,
+                                        PRIMARY KEY (match_id, roster_id, map_name))""")
+        connection.exec_driver_sql("""INSERT INTO match_results VALUES (1, 1, 'koth_product', 3), (1, 2, 'koth_product', 1),
+                                        (2, 1, 'cp_process', 5)""")
+
+    with engine.begin() as connection:
+        assert rename_legacy_results(connection)
+        Base.metadata.create_all(bind=connection)
+        assert migrate_legacy_results(connection)
+
+    with engine.begin() as connection:
+        rows = connection.exec_driver_sql("""SELECT r.rowid, r.match_id, r.roster_id, m.map_name, r.score FROM match_results r
+                                                JOIN maps m ON m.map_id = r.map_id ORDER BY r.rowid""").all()
+        assert [tuple(row) for row in rows] == [(1, 1, 1, "koth_product", 3), (2, 1, 2, "koth_product", 1), (3, 2, 1, "cp_process", 5)]
+        # Already migrated
+        assert not rename_legacy_results(connection) and not migrate_legacy_results(connection)
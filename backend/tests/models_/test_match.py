@@ -1,4 +1,5 @@
 from models import Match, MatchResult, Roster
+from sqlalchemy import select
 import json
 from utils.typing import SiteID, TfSource
 from utils.scraping import TfDataDecoder
@@ -74,3 +75,21 @@ def test_update(session):
     assert Match.get_incomplete(TfSource.RGL) == []
     print(Match.get_matches(54))
     assert Match.get_matches(54) == []
+
+def test_write_decoded(session):
+    from models import Season
+    from utils.decoding import DecodedMatch
+    assert Match.insert(session, SiteID.rgl_id(40))
+    stale = DecodedMatch(int(TfSource.RGL), 40, 10.0, "Week 1", False, 5, (("cp_a", 1, 3), ("cp_a", 2, 1), ("cp_b", 1, 0), ("cp_b", 2, 0)), "")
+    season_ids = Match.write_decoded(session, [stale])
+    assert season_ids == {Season.get_fromsource(SiteID.rgl_id(5)).season_id}
+    assert len(MatchResult.query.filter(MatchResult.match_id == Match.get_fromsource(SiteID.rgl_id(40)).match_id).all()) == 4
+
+    # Scores are updated in place, dropped results removed and matches never seen before created
+    fresh = stale._replace(results=(("cp_a", 1, 5), ("cp_a", 2, 1)))
+    Match.write_decoded(session, [fresh, stale._replace(site_id=41, season_site_id=None)])
+    match = session.get(Match, Match.get_fromsource(SiteID.rgl_id(40)).match_id)
+    assert match.is_complete and match.match_name == "Week 1" and match.match_epoch == 10.0
+    assert sorted(session.execute(select(MatchResult.map_name, MatchResult.score).where(MatchResult.match_id == match.match_id)).tuples()) == [("cp_a", 1), ("cp_a", 5)]
+    assert Match.get_fromsource(SiteID.rgl_id(41)).season_id is None
+    assert len(Roster.query.filter(Roster.rgl_team_id.in_([1, 2])).all()) == 2
@@ -0,0 +1,70 @@
+from models import ScrapeJob, JobState
+from utils.typing import SiteID, TfSource
+import time
+
+def test_enqueue(session):
+    assert ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(i) for i in range(10)]) == 10
+    assert ScrapeJob.count("match", TfSource.RGL) == 10
+
+    # Queueing again does not duplicate jobs
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(i) for i in range(5, 15)])
+    assert ScrapeJob.count("match", TfSource.RGL) == 15
+    assert ScrapeJob.count("roster", TfSource.RGL) == 0
+    assert ScrapeJob.enqueue(session, "match", []) == 0
+
+def test_claim_priority(session):
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(i) for i in range(10)])
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(100)], priority=5)
+
+    jobs = ScrapeJob.claim(session, "match", TfSource.RGL, limit=3)
+    assert len(jobs) == 3
+    assert jobs[0].site_id == 100
+    assert all(job.state == JobState.LEASED and job.attempts == 1 for job in jobs)
+
+    # Leased jobs are not handed out twice
+    others = ScrapeJob.claim(session, "match", TfSource.RGL, limit=100)
+    assert len(others) == 8
+    assert not {job.job_id for job in jobs} & {job.job_id for job in others}
+    assert ScrapeJob.claim(session, "match", TfSource.RGL) == []
+
+def test_expired_lease_is_reclaimed(session):
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(1)])
+    assert len(ScrapeJob.claim(session, "match", TfSource.RGL, lease=-1)) == 1
+
+    # The scraper holding the job "died", so the job can be claimed again
+    jobs = ScrapeJob.claim(session, "match", TfSource.RGL, lease=300)
+    assert len(jobs) == 1
+    assert jobs[0].attempts == 2
+
+def test_complete_and_fail(session):
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(1), SiteID.rgl_id(2)])
+    done, failing = ScrapeJob.claim(session, "match", TfSource.RGL)
+
+    ScrapeJob.complete(session, [done.job_id])
+    ScrapeJob.fail(session, [failing.job_id], error="timeout", max_attempts=2)
+    session.commit()
+    assert ScrapeJob.count("match", TfSource.RGL, JobState.DONE) == 1
+    assert ScrapeJob.count("match", TfSource.RGL, JobState.PENDING) == 1
+
+    failing, = ScrapeJob.claim(session, "match", TfSource.RGL)
+    ScrapeJob.fail(session, [failing.job_id], error="timeout", max_attempts=2, commit=True)
+    assert ScrapeJob.count("match", TfSource.RGL, JobState.FAILED) == 1
+    assert ScrapeJob.claim(session, "match", TfSource.RGL) == []
+
+    # Finished jobs can be queued again
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(1), SiteID.rgl_id(2)])
+    assert ScrapeJob.count("match", TfSource.RGL, JobState.PENDING) == 2
+
+def test_complete_tracks_changes(session):
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(1)])
+
+    for digest in ["a", "a", "b"]:
+        job, = ScrapeJob.claim(session, "match", TfSource.RGL)
+        ScrapeJob.complete(session, [job.job_id], [digest], commit=True)
+        ScrapeJob.requeue(session, [job.job_id])
+
+    job = ScrapeJob.query.filter(ScrapeJob.job_id == job.job_id).first()
+    assert job.fetch_count == 3
+    assert job.change_count == 1
+    assert job.payload_digest == "b"
+    assert job.changed_at is not None
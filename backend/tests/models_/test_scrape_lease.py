@@ -0,0 +1,34 @@
+from models import ScrapeJob, ScrapeLease, JobState
+from utils.typing import SiteID, TfSource
+import time
+
+def test_acquire_release(session):
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(i) for i in (4, 8, 5)])
+
+    # Only shards with jobs left are handed out, and each to one worker
+    assert ScrapeLease.acquire(session, "a", "match", TfSource.RGL, 4) == 0
+    assert ScrapeLease.acquire(session, "b", "match", TfSource.RGL, 4) == 1
+    assert ScrapeLease.acquire(session, "c", "match", TfSource.RGL, 4) is None
+    assert ScrapeLease.acquire(session, "c", "match", TfSource.ETF2L, 4) is None
+
+    assert {job.site_id for job in ScrapeJob.claim(session, "match", TfSource.RGL, shard=(0, 4))} == {4, 8}
+    assert [job.site_id for job in ScrapeJob.claim(session, "match", TfSource.RGL, shard=(1, 4))] == [5]
+
+    assert ScrapeLease.heartbeat(session, "a") == [(int(TfSource.RGL), "match", 4, 0)]
+    ScrapeLease.release(session, "a", TfSource.RGL, 0)
+    assert ScrapeLease.heartbeat(session, "a") == []
+
+def test_expired_lease_is_taken_over(session):
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(i) for i in (2, 6)])
+    assert ScrapeLease.acquire(session, "dead", "match", TfSource.RGL, 4, lease=0.01) == 2
+    assert len(ScrapeJob.claim(session, "match", TfSource.RGL, lease=300, shard=(2, 4))) == 2
+
+    # The shard is held until its lease runs out
+    assert ScrapeLease.acquire(session, "alive", "match", TfSource.RGL, 4) is None
+    time.sleep(0.02)
+    assert ScrapeLease.acquire(session, "alive", "match", TfSource.RGL, 4) == 2
+
+    # The jobs the dead worker had leased are handed out again straight away
+    assert ScrapeJob.count("match", TfSource.RGL, JobState.PENDING) == 2
+    assert len(ScrapeJob.claim(session, "match", TfSource.RGL, shard=(2, 4))) == 2
+    assert ScrapeLease.heartbeat(session, "dead") == []
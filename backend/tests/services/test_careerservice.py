@@ -0,0 +1,52 @@
+from models import Match, MatchResult, Roster, Player, RosterPlayerAssociation, PlayerCareer
+from utils.typing import SiteID
+from tests.conftest import add_match
+import services.careerservice as CareerService
+
+DAY = 24 * 60 * 60
+
+def test_merge_spans():
+    spans = CareerService.merge_spans([(1, 0, 10 * DAY), (2, 5 * DAY, 0), (1, 10 * DAY + 60, 20 * DAY), (1, 40 * DAY, 50 * DAY)])
+    assert spans == [[1, 0, 20 * DAY], [2, 5 * DAY, None], [1, 40 * DAY, 50 * DAY]]
+    assert CareerService.merge_spans([(1, 0, 0), (1, 10, 20)]) == [[1, 0, None]]
+
+def test_career_cache(session):
+    rosters = [Roster(SiteID.rgl_id(i), name=f"roster {i}") for i in range(3)]
+    player = Player(1)
+    session.add_all(rosters + [player])
+    session.add_all([RosterPlayerAssociation(player, rosters[0], 0, 100 * DAY), RosterPlayerAssociation(player, rosters[1], 150 * DAY, 0)])
+    session.commit()
+
+    add_match(session, 1, None, [("koth_product", rosters[0], 3, rosters[2], 0)], epoch=10 * DAY)
+    add_match(session, 2, None, [("koth_product", rosters[0], 1, rosters[2], 3)], epoch=20 * DAY)
+    add_match(session, 3, None, [("koth_product", rosters[0], 3, rosters[2], 0)], epoch=120 * DAY) # After the player left
+    add_match(session, 4, None, [("koth_product", rosters[1], 2, rosters[2], 2)], epoch=200 * DAY)
+
+    career = CareerService.get_career(1, session)
+    assert [(span["roster-id"], span["matches"], span["wins"], span["losses"], span["draws"]) for span in career] == [
+        (rosters[0].roster_id, 2, 1, 1, 0), (rosters[1].roster_id, 1, 0, 0, 1)]
+    assert career[1]["end"] is None and career[0]["roster-name"] == "roster 0"
+    assert not session.get(PlayerCareer, 1).is_stale
+
+    # Matches of the player's rosters, and their memberships, mark the cache stale
+    add_match(session, 5, None, [("koth_product", rosters[1], 3, rosters[2], 0)], epoch=210 * DAY)
+    assert session.get(PlayerCareer, 1).is_stale
+    assert CareerService.refresh_stale(session) == 1
+    assert CareerService.get_career(1, session)[1]["wins"] == 1
+
+    session.add(RosterPlayerAssociation(player, rosters[2], 300 * DAY, 0))
+    session.commit()
+    session.expire_all()
+    assert session.get(PlayerCareer, 1).is_stale
+    assert len(CareerService.get_career(1, session)) == 3
+
+    # Matches of other rosters leave it alone
+    other = Roster(SiteID.rgl_id(9))
+    session.add(other)
+    session.commit()
+    match = Match(SiteID.rgl_id(7), epoch=0)
+    session.add(match)
+    session.add(MatchResult(match.match_id, other, "koth_product", 3))
+    session.commit()
+    session.expire_all()
+    assert not session.get(PlayerCareer, 1).is_stale
@@ -0,0 +1,38 @@
+from sqlalchemy import text
+from models import Player, Roster, RosterPlayerAssociation
+from utils.typing import SiteID
+from services.exportservice import ParquetExporter
+import os
+
+def test_incremental_export(session, tmp_path):
+    exporter = ParquetExporter(str(tmp_path))
+    players = [Player(i, f"player {i}") for i in range(1, 4)]
+    roster = Roster(SiteID.rgl_id(1), name="froyotech")
+    session.add_all(players + [roster])
+    session.add(RosterPlayerAssociation(players[0], roster, 100.0, 0))
+    session.commit()
+
+    written = exporter.export(session)
+    assert written["players"] == 3 and written["rosters"] == 1 and written["roster_association_table"] == 1
+    assert written["matches"] == 0
+    assert exporter.read("players")["display_name"].to_pylist() == ["player 1", "player 2", "player 3"]
+
+    # Nothing changed, nothing written
+    assert sum(exporter.export(session).values()) == 0
+
+    session.get(Player, 2).display_name = "renamed"
+    session.delete(session.get(Player, 3))
+    session.add(Player(4, "player 4"))
+    session.commit()
+
+    written = exporter.export(session)
+    assert written["players"] == 3 and written["rosters"] == 0
+    assert len(os.listdir(tmp_path / "players")) == 2
+    players = exporter.read("players")
+    assert players["steam_id"].to_pylist() == [1, 2, 4]
+    assert players["display_name"].to_pylist() == ["player 1", "renamed", "player 4"]
+    assert exporter.read("rosters")["roster_name"].to_pylist() == ["froyotech"]
+    assert exporter.read("roster_association_table")["joined_at"].to_pylist() == [100.0]
+
+    # The change log is only kept past the last export
+    assert session.execute(text("SELECT COUNT(*) FROM change_log")).scalar() == 0
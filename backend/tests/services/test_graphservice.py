@@ -0,0 +1,32 @@
+from models import Match, MatchResult, Roster, Player, RosterPlayerAssociation
+from utils.typing import SiteID
+import services.graphservice as GraphService
+
+def test_player_graph(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(3)]
+    players = [Player(i) for i in range(1, 8)]
+    session.add_all(rosters + players)
+    session.add_all([RosterPlayerAssociation(players[i], rosters[0], 0, 0) for i in (0, 1, 2)]
+                    + [RosterPlayerAssociation(players[i], rosters[1], 0, 0) for i in (3, 4)]
+                    + [RosterPlayerAssociation(players[5], rosters[2], 500, 0), RosterPlayerAssociation(players[6], rosters[2], 500, 0)])
+    session.commit()
+
+    for rgl_id, epoch, (home, away) in [(1, 100, (0, 1)), (2, 200, (0, 1)), (3, 600, (1, 2))]:
+        match = Match(SiteID.rgl_id(rgl_id), epoch=epoch)
+        session.add(match)
+        session.add_all([MatchResult(match.match_id, rosters[home], "koth_product", 3), MatchResult(match.match_id, rosters[away], "koth_product", 1)])
+    session.commit()
+
+    assert GraphService.top_players(1, "together", session=session) == [{"steam-id": 2, "matches": 2}, {"steam-id": 3, "matches": 2}]
+    assert GraphService.top_players(4, "against", 1, session=session) == [{"steam-id": 1, "matches": 2}]
+    assert GraphService.top_players(5, "together", session=session) == [{"steam-id": 4, "matches": 3}]
+    assert GraphService.top_players(99, session=session) is None
+
+    assert GraphService.connection(1, 7, session=session) == [1, 4, 7]
+    assert GraphService.connection(1, 7, max_depth=1, session=session) is None
+
+    network = GraphService.ego_network(6, session=session)
+    assert network["nodes"] == [4, 5, 6, 7]
+    assert {(edge["a"], edge["b"]): (edge["together"], edge["against"]) for edge in network["edges"]} == {
+        (4, 5): (3, 0), (4, 6): (0, 1), (4, 7): (0, 1), (5, 6): (0, 1), (5, 7): (0, 1), (6, 7): (1, 0)}
+    assert GraphService.ego_network(6, 1, session=session)["nodes"] in ([4, 6], [5, 6], [6, 7])
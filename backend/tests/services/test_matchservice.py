@@ -1,4 +1,4 @@
-from services import MatchService
+from services import MatchService, StandingService
 from utils import TempFile
 
 
@@ -31,3 +31,175 @@ def test_find_match_ids():
     assert MatchService.scrape_match_page(len(new_data)) == []
 
 
+
+def test_seen_filter(session, tmp_path):
+  from models import Match
+  from utils.typing import SiteID
+
+  session.add_all([Match(SiteID.rgl_id(i)) for i in range(1, 6)])
+  session.commit()
+
+  path = str(tmp_path / "seen")
+  seen_filter = MatchService.SeenFilter(path)
+  seen_filter.sync(session)
+  assert seen_filter.rows == 5
+  assert seen_filter.new_ids(session, SiteID.rgl_ids([4, 5, 6, 7])) == SiteID.rgl_ids([6, 7])
+  assert Match.existing_ids(session, SiteID.rgl_ids([1, 6]) + [SiteID.etf2l_id(1)]) == {SiteID.rgl_id(1)}
+  seen_filter.save()
+
+  # Reloaded from disk and caught up with the matches stored since
+  session.add(Match(SiteID.rgl_id(6)))
+  session.commit()
+  reloaded = MatchService.SeenFilter(path)
+  reloaded.sync(session)
+  assert reloaded.rows == 6 and reloaded.bloom.count == 6
+  assert reloaded.new_ids(session, SiteID.rgl_ids([6, 7])) == [SiteID.rgl_id(7)]
+
+def test_scrape_match_details(session, monkeypatch, tmp_path):
+  import json
+  import threading
+  from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+  from sqlalchemy import select
+  from models import Match, ScrapeJob, JobState
+  from utils.typing import SiteID, TfSource
+
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      league, site_id = self.path.strip("/").split("/")
+      if league == "rgl":
+        data = {"matchId": int(site_id), "matchName": "Week 1", "matchDate": "2024-01-05T20:30:00Z", "seasonId": 9001,
+                "teams": [{"teamId": 9001}, {"teamId": 9002}], "maps": [{"mapName": "cp_process_f12", "homeScore": 5, "awayScore": 1}]}
+      else:
+        data = {"match": {"id": int(site_id), "time": 1704486600, "defaultwin": False, "competition": {"id": 9001, "name": "Season 47"}}}
+      body = json.dumps(data).encode()
+      self.send_response(200)
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, *args):
+      pass
+
+  server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  url = f"http://127.0.0.1:{server.server_address[1]}"
+
+  class LocalRgl(MatchService.RglLeague):
+    rate, burst, connections = 1000, 10, 4
+    def match_url(self, site_id):
+      return f"{url}/rgl/{site_id}"
+
+  class LocalEtf2l(MatchService.Etf2lLeague):
+    rate, burst, connections = 1000, 10, 4
+    def match_url(self, site_id):
+      return f"{url}/etf2l/{site_id}"
+
+  monkeypatch.setenv("http_cache", str(tmp_path / "http_cache.db"))
+  monkeypatch.setenv("archive", str(tmp_path / "archive"))
+  rgl_ids, etf2l_ids = SiteID.rgl_ids(range(900001, 900031)), SiteID.etf2l_ids(range(900001, 900021))
+  for site_id in rgl_ids + etf2l_ids:
+    Match.insert(session, site_id, commit=False)
+  ScrapeJob.enqueue(session, "match", rgl_ids + etf2l_ids)
+
+  try:
+    with LocalRgl() as rgl, LocalEtf2l() as etf2l:
+      assert MatchService.scrape_match_details(session, [rgl, etf2l], batch_size=8, workers=1) == {TfSource.RGL: 30, TfSource.ETF2L: 20}
+  finally:
+    server.shutdown()
+
+  assert ScrapeJob.count("match", TfSource.RGL, JobState.DONE) >= 30 and ScrapeJob.count("match", TfSource.ETF2L, JobState.DONE) >= 20
+  rgl_match = session.scalars(select(Match).where(Match.rgl_match_id == 900001)).one()
+  etf2l_match = session.scalars(select(Match).where(Match.etf2l_match_id == 900001)).one()
+  assert rgl_match.is_complete and len(rgl_match.results) == 2
+  assert etf2l_match.is_complete and etf2l_match.match_name == "Season 47" and etf2l_match.match_epoch == 1704486600
+  assert rgl_match.season_id != etf2l_match.season_id
+  # Standings are kept up to date as the matches are ingested
+  assert [(standing["played"], standing["wins"]) for standing in StandingService.season_standings(rgl_match.season_id)] == [(30, 30), (30, 0)]
+
+def test_ingest_waits_for_full_batches(session, monkeypatch, tmp_path):
+  import json
+  import threading
+  from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+  from models import Match, ScrapeJob
+  from utils.typing import SiteID, TfSource
+
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      body = json.dumps({"matchId": int(self.path.rsplit("/", 1)[1]), "matchName": "Week 1"}).encode()
+      self.send_response(200)
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, *args):
+      pass
+
+  server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+
+  # A slow host, that would otherwise hand over one response per batch
+  class SlowRgl(MatchService.RglLeague):
+    rate, burst, connections = 20, 1, 2
+    def match_url(self, site_id):
+      return f"http://127.0.0.1:{server.server_address[1]}/{site_id}"
+
+  batches = []
+  decode = MatchService.decode_match_responses
+  monkeypatch.setattr(MatchService, "decode_match_responses", lambda batch, *args: batches.append(len(batch)) or decode(batch, *args))
+  monkeypatch.setenv("http_cache", str(tmp_path / "http_cache.db"))
+  monkeypatch.setenv("archive", str(tmp_path / "archive"))
+  site_ids = SiteID.rgl_ids(range(910001, 910011))
+  for site_id in site_ids:
+    Match.insert(session, site_id, commit=False)
+  ScrapeJob.enqueue(session, "match", site_ids)
+
+  try:
+    with SlowRgl() as rgl:
+      assert MatchService.scrape_match_details(session, [rgl], batch_size=10, workers=1, linger=5, update_ratings=False) == {TfSource.RGL: 10}
+  finally:
+    server.shutdown()
+  assert batches == [10]
+
+def test_discover_concurrently(session):
+  import time
+  from sqlalchemy import select, func
+  from models import Match, ScrapeJob, JobState
+  from utils.typing import SiteID, TfSource
+
+  # Stand-ins for the match lists, each page taking a while to come back
+  class PagedLeague:
+    pages = []
+    def page_match_ids(self, write, num_stored):
+      for page in self.pages:
+        time.sleep(0.2)
+        num_new, num_stored = write(page)
+        written.append((self.source, num_new, num_stored))
+
+  class PagedRgl(PagedLeague, MatchService.RglLeague):
+    pages = [SiteID.rgl_ids(range(920001, 920004)), SiteID.rgl_ids(range(920002, 920006)), []]
+
+  class PagedEtf2l(PagedLeague, MatchService.Etf2lLeague):
+    pages = [SiteID.etf2l_ids(range(920001, 920003))] * 3
+
+  written = []
+  with PagedRgl() as rgl, PagedEtf2l() as etf2l:
+    start = time.monotonic()
+    MatchService.discover_concurrently(session, [rgl, etf2l], full=False)
+    # The leagues were paged through side by side, rather than one after the other
+    assert time.monotonic() - start < 1
+
+  assert [(num_new, num_stored) for source, num_new, num_stored in written if source == TfSource.RGL] == [(3, 3), (2, 5), (0, 5)]
+  assert [(num_new, num_stored) for source, num_new, num_stored in written if source == TfSource.ETF2L] == [(2, 2), (0, 2), (0, 2)]
+  assert session.execute(select(func.count(Match.match_id)).where(Match.rgl_match_id >= 920001)).scalar() == 5
+  assert ScrapeJob.count("match", TfSource.ETF2L, JobState.PENDING) == 2
+
+def test_leagues_without_match_api(session, monkeypatch, tmp_path):
+  from models import ScrapeJob, JobState
+  from utils.typing import SiteID, TfSource
+
+  monkeypatch.setenv("http_cache", str(tmp_path / "http_cache.db"))
+  monkeypatch.setenv("archive", str(tmp_path / "archive"))
+  ScrapeJob.enqueue(session, "match", [SiteID(i, TfSource.UGC) for i in range(1, 4)])
+  with MatchService.UgcLeague() as ugc:
+    assert MatchService.scrape_match_details(session, [ugc], workers=1, update_ratings=False) == {TfSource.UGC: 0}
+  assert ScrapeJob.count("match", TfSource.UGC, JobState.FAILED) == 3
@@ -0,0 +1,38 @@
+from models import Match, MatchResult, Roster, Player, RosterPlayerAssociation
+from utils.typing import SiteID
+import services.membershipservice as MembershipService
+
+def test_point_in_time_membership(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(2)]
+    players = [Player(76561198000000000 + i) for i in range(3)]
+    session.add_all(rosters + players)
+    session.add_all([
+        RosterPlayerAssociation(players[0], rosters[0], 100, 200),
+        RosterPlayerAssociation(players[0], rosters[1], 200, 0), # Still on the roster
+        RosterPlayerAssociation(players[1], rosters[0], 50, 0),
+        RosterPlayerAssociation(players[2], rosters[1], 300, 400),
+    ])
+    session.commit()
+    r0, r1 = (roster.roster_id for roster in rosters)
+    p0, p1, p2 = (player.steam_id for player in players)
+
+    assert MembershipService.roster_players(r0, 150, session=session) == [p1, p0]
+    assert MembershipService.roster_players(r0, 200, session=session) == [p1]
+    assert MembershipService.player_rosters(p0, 199, session=session) == [r0]
+    assert MembershipService.player_rosters(p0, 10 ** 10, session=session) == [r1]
+    assert MembershipService.get_index(session).roster_players(r1, 0, 300) == [p0, p2]
+
+    old, new = Match(SiteID.rgl_id(1), epoch=150), Match(SiteID.rgl_id(2), epoch=350)
+    session.add_all([old, new])
+    session.add_all([MatchResult(old.match_id, rosters[0], "koth_product", 3), MatchResult(old.match_id, rosters[1], "koth_product", 1),
+                        MatchResult(new.match_id, rosters[0], "koth_product", 0), MatchResult(new.match_id, rosters[1], "koth_product", 5)])
+    session.commit()
+
+    assert MembershipService.match_players(old, session=session) == {r0: [p1, p0], r1: []}
+    assert [match.rgl_match_id for match in MembershipService.player_matches(p0, session=session)] == [2, 1]
+    assert [match.rgl_match_id for match in MembershipService.player_matches(p2, session=session)] == [2]
+
+    # The index follows memberships being closed
+    session.query(RosterPlayerAssociation).filter(RosterPlayerAssociation.player_id == p1).one().left_at = 100
+    session.commit()
+    assert MembershipService.roster_players(r0, 150, session=session) == [p0]
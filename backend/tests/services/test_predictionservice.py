@@ -0,0 +1,39 @@
+from models import Roster
+from utils.typing import SiteID
+from tests.conftest import add_match
+import services.ratingservice as RatingService
+import services.predictionservice as PredictionService
+import numpy as np
+import pytest
+
+def test_series_probability():
+    p = np.array([0.0, 0.5, 0.6, 1.0])
+    assert np.allclose(PredictionService.series_probability(p, 1), p)
+    assert np.allclose(PredictionService.series_probability(p, 3), [0.0, 0.5, 0.6 ** 2 + 2 * 0.6 ** 2 * 0.4, 1.0])
+    # Even series could be drawn, and long ones overflow the binomial terms
+    for best_of in (0, 2, PredictionService.MAX_BEST_OF + 2, 2001):
+        with pytest.raises(ValueError):
+            PredictionService.series_probability(p, best_of)
+
+def test_predict(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(3)]
+    session.add_all(rosters)
+    session.commit()
+    strong, weak, unrated = (roster.roster_id for roster in rosters)
+
+    # The strong roster wins everywhere but on its bad map
+    for i in range(20):
+        map_name, won = ("cp_gullywash", False) if i % 4 == 0 else ("koth_product", True)
+        add_match(session, i, None, [(map_name, rosters[0], 3 if won else 0, rosters[1], 0 if won else 3)], epoch=i, commit=False)
+    session.commit()
+    RatingService.rebuild(session)
+
+    p = PredictionService.predict([strong, weak, unrated, strong], [weak, strong, unrated, unrated], session=session)
+    assert p[0] > 0.5 and np.isclose(p[0] + p[1], 1.0)
+    assert p[2] == 0.5
+    assert p[3] > 0.5
+
+    by_map = PredictionService.predict([strong, strong, strong], [weak, weak, weak], ["koth_product", "cp_gullywash", "pl_upward"], session=session)
+    assert by_map[1] < by_map[2] < by_map[0]
+    assert np.isclose(by_map[2], p[0])
+    assert PredictionService.predict([strong], [weak], best_of=3, session=session)[0] > p[0]
@@ -0,0 +1,71 @@
+from models import Roster, RosterRating, RatingHistory, Team
+from utils.typing import SiteID
+from tests.conftest import add_match
+import services.ratingservice as RatingService
+import random
+
+def reference_ratings(matches: list[tuple]) -> dict[int, float]:
+    # Plain match by match Elo to compare the vectorised rebuild against
+    ratings = {}
+    for roster_a, roster_b, score_a in matches:
+        r_a, r_b = ratings.get(roster_a, RatingService.INITIAL_RATING), ratings.get(roster_b, RatingService.INITIAL_RATING)
+        delta = RatingService.K_FACTOR * (score_a - 1 / (1 + 10 ** ((r_b - r_a) / 400)))
+        ratings[roster_a], ratings[roster_b] = r_a + delta, r_b - delta
+    return ratings
+
+def test_rebuild_matches_sequential_elo(session):
+    random.seed(4)
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(8)]
+    session.add_all(rosters)
+    session.commit()
+
+    played = []
+    for i in range(60):
+        a, b = sorted(random.sample(rosters, 2), key=lambda roster: roster.roster_id)
+        score_a = random.choice([0, 3])
+        add_match(session, i, None, [("koth_product_final", a, score_a, b, 3 - score_a)], epoch=1000 + i)
+        played.append((a.roster_id, b.roster_id, score_a / 3))
+
+    # Unplayed matches are not rated
+    add_match(session, 100, None, [("cp_process_final", rosters[0], 0, rosters[1], 0)], epoch=5000)
+
+    assert RatingService.rebuild(session) == 60
+    expected = reference_ratings(played)
+    for roster_id, rating in expected.items():
+        assert abs(RosterRating.get(roster_id).rating - rating) < 1e-6
+    assert RatingHistory.query.count() == 60
+    assert sum(rating.matches_played for rating in RosterRating.query.all()) == 120
+
+def test_incremental_update(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(3)]
+    session.add_all(rosters)
+    session.commit()
+
+    add_match(session, 1, None, [("pl_upward", rosters[0], 3, rosters[1], 1), ("pl_badwater_pro_v9", rosters[0], 1, rosters[1], 3)], epoch=100)
+    assert RatingService.update(session) == 1
+    # Split maps are a draw
+    assert RosterRating.get(rosters[0].roster_id).rating == RatingService.INITIAL_RATING
+    assert RatingService.update(session) == 0
+
+    add_match(session, 2, None, [("koth_product_final", rosters[1], 3, rosters[2], 0)], epoch=200)
+    assert RatingService.update(session) == 1
+    incremental = {rating.roster_id: rating.rating for rating in RosterRating.query.all()}
+
+    RatingService.rebuild(session)
+    assert incremental == {rating.roster_id: rating.rating for rating in RosterRating.query.all()}
+    assert RosterRating.get(rosters[1].roster_id).rating > RatingService.INITIAL_RATING
+    assert RosterRating.get(rosters[1].roster_id).matches_played == 2
+
+def test_team_rating(session):
+    team = Team()
+    session.add(team)
+    old, new, other = Roster(SiteID.rgl_id(1), team.team_id), Roster(SiteID.rgl_id(2), team.team_id), Roster(SiteID.rgl_id(3))
+    session.add_all([old, new, other])
+    session.commit()
+
+    add_match(session, 1, None, [("koth_product_final", old, 3, other, 0)], epoch=100)
+    add_match(session, 2, None, [("koth_product_final", new, 0, other, 3)], epoch=200)
+    RatingService.rebuild(session)
+
+    assert RatingService.team_rating(team.team_id).roster_id == new.roster_id
+    assert RatingService.top(1)[0].roster_id == old.roster_id
@@ -0,0 +1,60 @@
+from services.refreshservice import compute_ttl, schedule_matches, schedule_rosters, DAY, MIN_TTL, MAX_TTL
+from models import Match, Roster, ScrapeJob
+from utils.typing import SiteID, TfSource
+from tests.conftest import add_match
+import time
+
+def test_compute_ttl():
+    # Older entities stay fresh for longer
+    assert compute_ttl(DAY, True, 0) < compute_ttl(30 * DAY, True, 0)
+    # Finished seasons stay fresh for longer than active ones
+    assert compute_ttl(30 * DAY, True, 0) < compute_ttl(30 * DAY, False, 0)
+    # Entities that keep changing are refreshed more often
+    assert compute_ttl(30 * DAY, True, 1) < compute_ttl(30 * DAY, True, 0)
+
+    assert compute_ttl(0, True, 1) == MIN_TTL
+    assert compute_ttl(-DAY, True, 0) == MIN_TTL
+    assert compute_ttl(10 * 365 * DAY, False, 0) == MAX_TTL
+
+def test_schedule_matches(session):
+    now = time.time()
+    Match.insert(session, SiteID.rgl_id(1), epoch=now - 2 * DAY)
+    Match.insert(session, SiteID.rgl_id(2), epoch=now - 2 * 365 * DAY)
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(1), SiteID.rgl_id(2)])
+    ScrapeJob.complete(session, [job.job_id for job in ScrapeJob.claim(session, "match", TfSource.RGL)], commit=True)
+
+    # Both matches were just fetched, so neither is due
+    assert schedule_matches(session, TfSource.RGL, now=now) == 0
+
+    # A few days later only the recent match is due
+    assert schedule_matches(session, TfSource.RGL, now=now + 3 * DAY) == 1
+    job, = ScrapeJob.claim(session, "match", TfSource.RGL)
+    assert job.site_id == 1
+    ScrapeJob.complete(session, [job.job_id], commit=True)
+
+    # A year later both are due, but neither was played recently enough for the cheap pass of a sync cycle
+    assert schedule_matches(session, TfSource.RGL, now=now + 365 * DAY, recent=True) == 0
+    assert schedule_matches(session, TfSource.RGL, now=now + 365 * DAY) == 2
+
+def test_schedule_rosters(session):
+    now = time.time()
+    # One roster played a few days ago, the other has not played at all and was last updated years ago
+    active, settled = Roster(SiteID.rgl_id(1)), Roster(SiteID.rgl_id(2), updated=now - 2 * 365 * DAY)
+    other = Roster(SiteID.rgl_id(3))
+    session.add_all([active, settled, other])
+    session.commit()
+    add_match(session, 1, None, [("koth_product", active, 3, other, 0)], epoch=now - 2 * DAY)
+    ScrapeJob.enqueue(session, "roster", [SiteID.rgl_id(1), SiteID.rgl_id(2)])
+    ScrapeJob.complete(session, [job.job_id for job in ScrapeJob.claim(session, "roster", TfSource.RGL)], commit=True)
+
+    # Both rosters were just fetched, so neither is due
+    assert schedule_rosters(session, TfSource.RGL, now=now) == 0
+
+    # A day later only the roster that is still playing is due
+    assert schedule_rosters(session, TfSource.RGL, now=now + DAY) == 1
+    job, = ScrapeJob.claim(session, "roster", TfSource.RGL)
+    assert job.site_id == 1
+    ScrapeJob.complete(session, [job.job_id], commit=True)
+
+    # Half a year later the settled roster is due too
+    assert schedule_rosters(session, TfSource.RGL, now=now + 200 * DAY) == 2
@@ -0,0 +1,36 @@
+from models import Player, Roster
+from utils.typing import SiteID
+import services.searchservice as SearchService
+
+def test_match_expression():
+    assert SearchService.match_expression("  ") is None
+    assert SearchService.match_expression('b4nny"* OR') == '"b4nny" "OR"*'
+    assert SearchService.match_expression("froyo") == '"froyo"*'
+
+def test_search_stays_in_sync(session):
+    session.add_all([Player(1, "b4nny"), Player(2, "Bernie Sanders"), Player(3, "Bern"), Player(4, "Café Bern")])
+    roster = Roster(SiteID.rgl_id(1), name="froyotech", tag="FROYO")
+    session.add(roster)
+    session.commit()
+
+    # Shorter names matching the whole query rank first
+    assert [player["steam-id"] for player in SearchService.search_players("bern", session=session)][0] == 3
+    assert len(SearchService.search_players("bern", 2, session=session)) == 2
+    assert [player["steam-id"] for player in SearchService.search_players("cafe b", session=session)] == [4]
+    assert SearchService.search_players("b4", session=session) == [{"steam-id": 1, "display-name": "b4nny"}]
+    assert SearchService.search_rosters("froyo", session=session)[0]["roster-id"] == roster.roster_id
+
+    # Renames and deletes are picked up straight away
+    session.get(Player, 1).display_name = "kaidus"
+    roster.roster_tag = "FT"
+    session.commit()
+    assert SearchService.search_players("b4", session=session) == []
+    assert SearchService.search_players("kai", session=session)[0]["steam-id"] == 1
+    assert SearchService.search_rosters("ft", session=session)[0]["tag"] == "FT"
+
+    session.delete(session.get(Player, 3))
+    session.commit()
+    assert {player["steam-id"] for player in SearchService.search_players("bern", session=session)} == {2, 4}
+
+    SearchService.rebuild(session)
+    assert {player["steam-id"] for player in SearchService.search_players("bern", session=session)} == {2, 4}
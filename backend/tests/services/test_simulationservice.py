@@ -0,0 +1,37 @@
+from models import Roster, Season
+from utils.typing import SiteID
+from tests.conftest import add_match
+import services.standingservice as StandingService
+import services.simulationservice as SimulationService
+import numpy as np
+
+def test_simulate_season(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(4)]
+    season = Season(SiteID.rgl_id(1))
+    session.add_all(rosters + [season])
+    session.commit()
+    ids = [roster.roster_id for roster in rosters]
+
+    # Roster 0 has finished its matches and can at most be caught on wins, but not on map difference
+    for rgl_id, a, b, score_a, score_b in [(1, 0, 1, 3, 0), (2, 0, 2, 3, 0), (3, 1, 3, 0, 3), (4, 2, 3, 0, 0), (5, 1, 2, 0, 0)]:
+        add_match(session, rgl_id, season, [("koth_product", rosters[a], score_a, rosters[b], score_b)], epoch=rgl_id, commit=False)
+    session.commit()
+    StandingService.refresh(session, {season.season_id})
+
+    assert sorted(SimulationService.remaining_fixtures(session, season.season_id)) == sorted([(ids[1], ids[2]), (ids[2], ids[3])])
+
+    results = SimulationService.simulate(season.season_id, n=12000, seed=3, workers=1, session=session)
+    by_roster = {result["roster-id"]: result for result in results}
+    assert results[0]["roster-id"] == ids[0]
+    assert by_roster[ids[0]]["positions"][0] == 1.0
+    for result in results:
+        assert np.isclose(sum(result["positions"]), 1.0)
+    # Every position is filled exactly once per simulation
+    assert np.allclose(np.sum([result["positions"] for result in results], axis=0), 1.0)
+
+    # Reproducible from the seed, whatever the number of workers
+    assert SimulationService.simulate(season.season_id, n=12000, seed=3, workers=2, session=session) == results
+    assert SimulationService.simulate(season.season_id, n=12000, seed=4, workers=1, session=session) != results
+
+    explicit = SimulationService.simulate(season.season_id, n=100, fixtures=[], workers=1, session=session)
+    assert [result["expected-position"] for result in explicit][0] == 1.0
@@ -0,0 +1,48 @@
+from models import Match, MatchResult, Roster, Player, RosterPlayerAssociation
+from utils.typing import SiteID
+from utils.snapshot import SnapshotReader
+import services.snapshotservice as SnapshotService
+
+def test_snapshot(session, tmp_path):
+    rosters = [Roster(SiteID.rgl_id(i), team_id=i + 10, name=f"roster {i}", tag=f"R{i}") for i in range(3)]
+    player = Player(1, "player ü")
+    session.add_all(rosters + [player, Player(2)])
+    session.add_all([RosterPlayerAssociation(player, rosters[0], 0, 100), RosterPlayerAssociation(player, rosters[1], 150, 0)])
+    session.commit()
+
+    matches = []
+    for rgl_id, epoch, a in [(1, 10, 0), (2, 120, 0), (3, 200, 1)]:
+        match = Match(SiteID.rgl_id(rgl_id), epoch=epoch, name=f"match {rgl_id}")
+        session.add(match)
+        session.add_all([MatchResult(match.match_id, rosters[a], "koth_product", 3), MatchResult(match.match_id, rosters[2], "koth_product", 1),
+                            MatchResult(match.match_id, rosters[a], "cp_process", 0), MatchResult(match.match_id, rosters[2], "cp_process", 3)])
+        session.commit()
+        matches.append(match)
+
+    path = str(tmp_path / "snapshot.bin")
+    counts = SnapshotService.build(session, path)
+    assert counts["players"] == 2 and counts["matches"] == 3 and counts["results"] == 12
+    reader = SnapshotReader(path)
+    snapshot = reader.get()
+
+    # Match 2 was played after the player left roster 0
+    assert SnapshotService.player(1, snapshot) == {
+        "display-name": "player ü", "display-tag": "R1", "current-roster": rosters[1].roster_id, "current-team": 11,
+        "matches": [matches[2].match_id, matches[0].match_id]
+    }
+    assert SnapshotService.player(1, snapshot) == SnapshotService.player_fromdb(1, session)
+    assert SnapshotService.player(2, snapshot)["current-team"] is None
+    assert SnapshotService.player(3, snapshot) is None
+
+    def by_map(match):
+        return match | {"maps": sorted(match["maps"], key=lambda result: (result["roster-id"], result["map-name"]))}
+    assert by_map(SnapshotService.match(matches[0].match_id, snapshot)) == by_map(session.get(Match, matches[0].match_id).json())
+    assert SnapshotService.match(9999, snapshot) is None
+
+    # A rebuilt snapshot is swapped in, while the old mapping stays readable
+    session.add(Player(3, "new"))
+    session.commit()
+    SnapshotService.build(session, path)
+    assert reader.get() is not snapshot
+    assert SnapshotService.player(3, reader.get())["display-name"] == "new"
+    assert SnapshotService.player(1, snapshot)["display-name"] == "player ü"
@@ -0,0 +1,72 @@
+from models import Match, MatchResult, Roster, Season, Standing
+from utils.typing import SiteID
+from tests.conftest import add_match
+import services.standingservice as StandingService
+
+def test_refresh_standings(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(3)]
+    seasons = [Season(SiteID.rgl_id(1)), Season(SiteID.rgl_id(2))]
+    session.add_all(rosters + seasons)
+    session.commit()
+    a, b, c = rosters
+    a_id, b_id, c_id = (roster.roster_id for roster in rosters)
+    season, other = (season.season_id for season in seasons)
+
+    add_match(session, 1, seasons[0], [("koth_product", a, 3, b, 1), ("pl_upward", a, 1, b, 2), ("cp_process", a, 5, b, 0)])
+    add_match(session, 2, seasons[0], [("koth_product", b, 4, c, 4)])
+    add_match(session, 3, seasons[0], [("koth_product", a, 0, c, 5)], forfeit=True)
+    add_match(session, 4, seasons[1], [("koth_product", a, 5, c, 0)])
+
+    assert StandingService.refresh(session, {season}) == 3
+    standings = StandingService.season_standings(season)
+    assert [standing["roster-id"] for standing in standings] == [c_id, a_id, b_id]
+    assert standings[1] == {"position": 2, "roster-id": a_id, "played": 2, "wins": 1, "losses": 1, "draws": 0, "maps-won": 2,
+                            "maps-lost": 2, "map-difference": 9 - 3 - 5, "forfeits": 1}
+    assert standings[2]["draws"] == 1 and standings[2]["map-difference"] == -6
+    # Other seasons are left alone
+    assert Standing.get_season(other) == []
+
+    # Refreshing again replaces the season's standings rather than adding to them
+    add_match(session, 5, seasons[0], [("koth_product", b, 5, c, 0)])
+    assert StandingService.refresh(session, {season, None}) == 3
+    assert {standing.roster_id: standing.wins for standing in Standing.get_season(season)} == {a_id: 1, b_id: 1, c_id: 1}
+
+    assert StandingService.rebuild(session) == 5
+    assert len(Standing.get_season(other)) == 2
+
+def test_apply_changes(session):
+    from sqlalchemy import select, delete
+
+    def stored():
+        return {(standing.season_id, standing.roster_id): standing.json() for standing in session.scalars(select(Standing))}
+
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(3)]
+    seasons = [Season(SiteID.rgl_id(1)), Season(SiteID.rgl_id(2))]
+    session.add_all(rosters + seasons)
+    session.commit()
+    a, b, c = rosters
+
+    add_match(session, 1, seasons[0], [("koth_product", a, 3, b, 1), ("pl_upward", a, 1, b, 2), ("cp_process", a, 5, b, 0)])
+    add_match(session, 2, seasons[0], [("koth_product", b, 4, c, 4)])
+    StandingService.rebuild(session)
+
+    # A new match only adds its own result
+    before = StandingService.match_contributions(session, [SiteID.rgl_id(3)])
+    assert before == {}
+    add_match(session, 3, seasons[0], [("koth_product", a, 0, c, 5)], forfeit=True)
+    assert StandingService.apply_changes(session, before, StandingService.match_contributions(session, [SiteID.rgl_id(3)])) == 2
+
+    # A re-scraped match has its old result taken off, here moving it to another season with a different result
+    before = StandingService.match_contributions(session, [SiteID.rgl_id(1)])
+    match = session.scalars(select(Match).where(Match.rgl_match_id == 1)).one()
+    session.execute(delete(MatchResult).where(MatchResult.match_id == match.match_id))
+    match.season_id = seasons[1].season_id
+    session.add(MatchResult(match.match_id, a, "koth_product", 0))
+    session.add(MatchResult(match.match_id, b, "koth_product", 5))
+    StandingService.apply_changes(session, before, StandingService.match_contributions(session, [SiteID.rgl_id(1)]))
+    session.commit()
+
+    incremental = stored()
+    StandingService.rebuild(session)
+    assert incremental == stored()
+    assert (seasons[0].season_id, a.roster_id) in incremental and incremental[seasons[1].season_id, b.roster_id]["wins"] == 1
@@ -0,0 +1,47 @@
+from models import Roster, Season
+from utils.typing import SiteID
+from tests.conftest import add_match
+import services.statservice as StatService
+
+def test_grouped_stats(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(3)]
+    session.add_all(rosters)
+    highlander, sixes = Season(SiteID.rgl_id(1), format_="Highlander"), Season(SiteID.rgl_id(2), format_="Sixes")
+    session.add_all([highlander, sixes])
+    session.commit()
+    a, b, c = rosters
+
+    a_id, b_id, c_id = (roster.roster_id for roster in rosters)
+    add_match(session, 1, highlander, [("koth_product", a, 3, b, 1), ("pl_upward", a, 2, b, 2)])
+    add_match(session, 2, highlander, [("koth_product", b, 5, c, 0)], forfeit=True)
+    add_match(session, 3, sixes, [("koth_product", a, 0, c, 4)])
+    # Unplayed maps are left out
+    add_match(session, 4, sixes, [("pl_upward", b, 0, c, 0)])
+
+    by_map = {group["map"]: group for group in StatService.stats(("map",), session=session)}
+    assert by_map["koth_product"]["played"] == 3
+    assert by_map["koth_product"]["round-differential"] == (2 + 5 + 4) / 3
+    assert by_map["koth_product"]["forfeit-rate"] == 1 / 3
+    assert by_map["pl_upward"]["played"] == 1
+
+    by_format = {group["format"]: group["played"] for group in StatService.stats(("format",), session=session)}
+    assert by_format == {"Highlander": 3, "Sixes": 1}
+
+    roster_a = StatService.stats(("roster",), roster=a_id, session=session)
+    assert roster_a == [{"roster-id": a_id, "played": 3, "round-differential": (2 + 0 - 4) / 3, "forfeit-rate": 0.0,
+                            "wins": 1, "losses": 1, "draws": 1, "win-rate": 0.5}]
+
+    season = highlander.season_id
+    by_roster = {group["roster-id"]: group for group in StatService.stats(("season", "roster"), season=season, session=session)}
+    assert set(by_roster) == {a_id, b_id, c_id}
+    assert by_roster[b_id]["wins"] == 1 and by_roster[b_id]["losses"] == 1 and by_roster[b_id]["season-id"] == season
+
+def test_cache_follows_data_generation(session):
+    rosters = [Roster(SiteID.rgl_id(i)) for i in range(2)]
+    session.add_all(rosters)
+    session.commit()
+
+    add_match(session, 1, None, [("koth_product", rosters[0], 3, rosters[1], 1)])
+    assert StatService.stats((), session=session)[0]["played"] == 1
+    add_match(session, 2, None, [("koth_product", rosters[0], 3, rosters[1], 1)])
+    assert StatService.stats((), session=session)[0]["played"] == 2
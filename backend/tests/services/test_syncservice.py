@@ -0,0 +1,120 @@
+import services.syncservice as SyncService
+import services.matchservice as MatchService
+
+def test_next_wait():
+    daemon = SyncService.SyncDaemon(interval=100, jitter=0.2)
+    waits = [daemon.next_wait() for _ in range(200)]
+    assert all(80 <= wait <= 120 for wait in waits)
+    assert len(set(waits)) > 1
+    assert SyncService.SyncDaemon(interval=100, jitter=0).next_wait() == 100
+
+def test_stop_on_signals():
+    import os
+    import signal
+    import threading
+
+    handlers = signal.getsignal(signal.SIGINT), signal.getsignal(signal.SIGTERM)
+    stop = threading.Event()
+    try:
+        SyncService.stop_on_signals(stop)
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert stop.wait(1)
+    finally:
+        signal.signal(signal.SIGINT, handlers[0])
+        signal.signal(signal.SIGTERM, handlers[1])
+
+def test_sync_cycles(session, monkeypatch, tmp_path):
+    import json
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from sqlalchemy import select, func
+    from models import Match
+    from utils.decoding import DecodePool
+    from utils.http_cache import HttpCache
+    from utils.archive import PayloadArchive
+    from utils.typing import SiteID, TfSource
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            site_id = int(self.path.rsplit("/", 1)[1])
+            data = {"matchId": site_id, "matchName": "Week 1", "matchDate": "2024-01-05T20:30:00Z", "seasonId": 9001,
+                    "teams": [{"teamId": 9001}, {"teamId": 9002}], "maps": [{"mapName": "cp_process_f12", "homeScore": 5, "awayScore": 1}]}
+            body = json.dumps(data).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Stands in for the RGL match list, new IDs are appended as they are "played"
+    feed = []
+
+    class LocalRgl(MatchService.RglLeague):
+        rate, burst, connections = 1000, 10, 4
+        def page_match_ids(self, write, num_stored):
+            write(feed)
+
+        def match_url(self, site_id):
+            return f"{url}/matches/{site_id}"
+
+    builds = []
+    monkeypatch.setattr(SyncService.SnapshotService, "build", lambda session: builds.append(1))
+    daemon = SyncService.SyncDaemon([TfSource.RGL], interval=0, jitter=0, snapshot_interval=0)
+
+    try:
+        # The cache and archive stay open from one cycle to the next
+        with LocalRgl() as rgl, DecodePool(1) as decoder, HttpCache(str(tmp_path / "http_cache.db")) as cache, \
+              PayloadArchive(str(tmp_path / "archive")) as archive:
+            def cycle():
+                return daemon.cycle(session, [rgl], decoder, cache=cache, archive=archive)
+
+            feed.extend(SiteID.rgl_ids(range(800001, 800004)))
+            assert cycle() == {TfSource.RGL: 3}
+            assert len(builds) == 1
+
+            # Only the newly listed matches are fetched
+            feed.extend(SiteID.rgl_ids(range(800004, 800006)))
+            assert cycle() == {TfSource.RGL: 2}
+            assert len(builds) == 2
+
+            # Nothing new, so nothing is fetched or rebuilt
+            assert cycle() == {}
+            assert len(builds) == 2
+
+            # New data only reaches the snapshot once the last build is old enough
+            daemon.snapshot_interval = 3600
+            feed.extend(SiteID.rgl_ids(range(800006, 800007)))
+            assert cycle() == {TfSource.RGL: 1}
+            assert len(builds) == 2
+            daemon.snapshot_interval = 0
+            assert cycle() == {}
+            assert len(builds) == 3
+            assert len(archive.latest(TfSource.RGL, "match")) == 6
+    finally:
+        server.shutdown()
+
+    assert session.execute(select(func.count(Match.match_id)).where(Match.rgl_match_id >= 800001, Match.is_complete == True)).scalar() == 6
+
+def test_run_until_stopped(session, monkeypatch, tmp_path):
+    import threading
+    from utils.typing import TfSource
+
+    class IdleUgc(MatchService.UgcLeague):
+        def queue_due(self, full=True, session=None):
+            calls.append(full)
+            if len(calls) == 3:
+                stop.set()
+
+    calls, stop = [], threading.Event()
+    monkeypatch.setenv("http_cache", str(tmp_path / "http_cache.db"))
+    monkeypatch.setenv("archive", str(tmp_path / "archive"))
+    monkeypatch.setitem(MatchService.LEAGUES, TfSource.UGC, IdleUgc)
+    daemon = SyncService.SyncDaemon([TfSource.UGC], interval=0.01, jitter=0.5, full_interval=3600)
+    assert daemon.run(session, stop, workers=1) == 0
+    assert calls == [True, False, False]
@@ -0,0 +1,44 @@
+from models import Roster, Player, RosterPlayerAssociation, Team
+from utils.typing import SiteID
+import services.teamservice as TeamService
+
+DAY = 24 * 60 * 60
+
+def add_roster(session, rgl_id: int, players: list[Player], joined: float, left: float) -> Roster:
+    roster = Roster(SiteID.rgl_id(rgl_id))
+    session.add(roster)
+    session.add_all([RosterPlayerAssociation(player, roster, joined, left) for player in players])
+    session.commit()
+    return roster
+
+def test_cluster_rosters(session):
+    players = [Player(76561198000000000 + i) for i in range(12)]
+    session.add_all(players)
+    session.commit()
+
+    # The core of the team moves from season to season, a rival shares a single player
+    first = add_roster(session, 1, players[0:6], 0, 100 * DAY)
+    second = add_roster(session, 2, players[1:5] + players[6:8], 110 * DAY, 200 * DAY)
+    rival = add_roster(session, 3, [players[0]] + players[8:12], 120 * DAY, 0)
+
+    assert TeamService.cluster_rosters(session) == 3
+    assert first.team_id == second.team_id
+    assert rival.team_id not in (None, first.team_id)
+
+    # A new roster picks up the team, without touching the others
+    third = add_roster(session, 4, players[1:4] + [players[8]], 250 * DAY, 0)
+    assert TeamService.cluster_rosters(session, [third.roster_id]) == 1
+    assert third.team_id == first.team_id
+
+    # Rosters that turn out to be the same team merge their teams
+    rival_team = rival.team_id
+    fourth = add_roster(session, 5, players[0:4] + players[9:12], 300 * DAY, 0)
+    TeamService.cluster_rosters(session, [fourth.roster_id])
+    assert {first.team_id, rival.team_id, fourth.team_id} == {first.team_id}
+    assert not session.query(Team).filter(Team.team_id == rival_team).first()
+
+def test_moves_need_to_be_contiguous():
+    memberships = [(player, 1, 0, 10) for player in range(4)] + [(player, 2, 10 + TeamService.MAX_MEMBERSHIP_GAP * 2, 0) for player in range(4)]
+    assert TeamService.linked_rosters(memberships) == []
+    memberships = [(player, 1, 0, 10) for player in range(4)] + [(player, 2, 20, 0) for player in range(4)]
+    assert TeamService.linked_rosters(memberships) == [(1, 2)]
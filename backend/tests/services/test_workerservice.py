@@ -0,0 +1,126 @@
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED = """
+from utils.logger import Logger
+Logger.init("logs", "seed")
+from database import init_db, db_session
+from models import Match, ScrapeJob, ScrapeLease
+from utils.typing import SiteID, TfSource
+init_db()
+site_ids = SiteID.rgl_ids(range(1, 41))
+for site_id in site_ids:
+    Match.insert(db_session, site_id, commit=False, check=False)
+ScrapeJob.enqueue(db_session, "match", site_ids)
+# A worker that died holding shard 0, with some of its jobs in flight
+assert ScrapeLease.acquire(db_session, "dead", "match", TfSource.RGL, 4, lease=0.5) == 0
+ScrapeJob.claim(db_session, "match", TfSource.RGL, limit=5, lease=3600, shard=(0, 4))
+db_session.remove()
+"""
+
+COORDINATOR = """
+from utils.logger import Logger
+Logger.init("logs", "coordinator")
+from services import run_coordinator
+run_coordinator()
+"""
+
+WORKER = """
+from utils.logger import Logger
+Logger.init("logs", "worker")
+import services.workerservice as WorkerService
+from utils.typing import TfSource
+with WorkerService.CoordinatorClient() as coordinator:
+    print(WorkerService.ShardWorker([TfSource.RGL], coordinator=coordinator).run(batch_size=4, workers=1, idle=0.5))
+"""
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # Slow enough that no worker gets through every shard before the others start
+        time.sleep(0.2)
+        site_id = int(self.path.rsplit("/", 1)[1])
+        data = {"matchId": site_id, "matchName": "Week 1", "matchDate": "2024-01-05T20:30:00Z", "seasonId": 9001,
+                "teams": [{"teamId": 9001}, {"teamId": 9002}], "maps": [{"mapName": "cp_process_f12", "homeScore": 5, "awayScore": 1}]}
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return urllib.request.urlopen(url, timeout=5)
+        except urllib.error.HTTPError:
+            raise
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+def test_shard_workers(tmp_path):
+    db = str(tmp_path / "shared.db")
+    port = free_port()
+    env = dict(os.environ, db=db, PYTHONPATH=BACKEND, scrape_shards="4", scrape_lease="2", coordinator_token="secret")
+    subprocess.run([sys.executable, "-c", SEED], cwd=tmp_path, env=env, check=True, timeout=60)
+
+    coordinator = subprocess.Popen([sys.executable, "-c", COORDINATOR], cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   env=dict(env, coordinator_host="127.0.0.1", coordinator_port=str(port)))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{port}/coordinator"
+        # Only workers holding the token get in
+        try:
+            wait_for(f"{url}/jobs/remaining?source=1")
+            assert False, "Coordinator answered without a token"
+        except urllib.error.HTTPError as error:
+            assert error.code == 403
+
+        # The workers could be on any node: they have their own caches and address, and no database to open
+        workers = [subprocess.Popen([sys.executable, "-c", WORKER], cwd=tmp_path, env=dict(env,
+                                      db=str(tmp_path / "unreachable" / f"worker_{i}.db"), coordinator_url=url,
+                                      rgl_api=f"http://127.0.0.1:{server.server_address[1]}", worker_id=f"worker-{i}",
+                                      http_cache=str(tmp_path / f"http_cache_{i}.db"), archive=str(tmp_path / f"archive_{i}")),
+                                    stdout=subprocess.PIPE, text=True)
+                   for i in range(3)]
+        outputs = [worker.communicate(timeout=120)[0] for worker in workers]
+        assert [worker.returncode for worker in workers] == [0, 0, 0]
+    finally:
+        server.shutdown()
+        coordinator.terminate()
+        coordinator.wait(timeout=30)
+    assert not (tmp_path / "unreachable").exists()
+
+    with sqlite3.connect(db) as connection:
+        # Every job was done, the ones stranded by the dead worker included
+        assert connection.execute("SELECT state, COUNT(*) FROM scrape_jobs GROUP BY state").fetchall() == [(2, 40)]
+        assert connection.execute("SELECT COUNT(*) FROM matches WHERE is_complete").fetchone() == (40,)
+        assert connection.execute("SELECT COUNT(*) FROM match_results").fetchone() == (80,)
+        # The shards were split between the workers, and the dead worker's shard taken over
+        leases = connection.execute("SELECT shard, worker_id, acquired_count FROM scrape_leases").fetchall()
+        assert all(worker_id is None for _, worker_id, _ in leases)
+        assert [count for shard, _, count in leases if shard == 0] == [2]
+
+    scraped = [int(output.split()[-1]) for output in outputs]
+    assert sum(scraped) >= 40 and sum(1 for num_scraped in scraped if num_scraped) >= 2
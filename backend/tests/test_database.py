@@ -0,0 +1,51 @@
+from database import UnitOfWork, data_generation, is_network_path
+from models import Match, ScrapeJob
+from utils.typing import SiteID, TfSource
+import pytest
+
+def test_unit_of_work_batches(session):
+    with UnitOfWork(session, batch_size=10, close=False) as uow:
+        for i in range(25):
+            Match.insert(session, SiteID.rgl_id(i + 1), commit=False)
+            committed = uow.step()
+            # Identity map never holds more than a single batch
+            assert len(session.identity_map) <= 10
+            assert committed == ((i + 1) % 10 == 0)
+
+    assert uow.committed == 25
+    assert uow.batches == 3
+    assert uow.peak_identity_map <= 10
+    assert len(session.identity_map) == 0
+    assert Match.query.count() == 25
+
+def test_unit_of_work_rollback(session):
+    with pytest.raises(ValueError):
+        with UnitOfWork(session, batch_size=10, close=False) as uow:
+            Match.insert(session, SiteID.rgl_id(1), commit=False)
+            uow.step()
+            raise ValueError()
+
+    assert uow.committed == 0
+    assert Match.query.count() == 0
+
+def test_data_generation(session):
+    results, memberships = data_generation(session), data_generation(session, "memberships")
+
+    # Claiming jobs writes no data
+    ScrapeJob.enqueue(session, "match", [SiteID.rgl_id(1)])
+    ScrapeJob.claim(session, "match", TfSource.RGL)
+    assert data_generation(session) == results
+
+    Match.insert(session, SiteID.rgl_id(1), commit=False)
+    session.flush()
+    assert data_generation(session) != results
+    assert data_generation(session, "memberships") == memberships
+
+def test_is_network_path(tmp_path):
+    mounts = tmp_path / "mounts"
+    mounts.write_text("/dev/sda1 / ext4 rw 0 0\nserver:/export /mnt/shared nfs4 rw 0 0\n")
+    assert is_network_path("/mnt/shared/scrape.db", str(mounts))
+    assert not is_network_path("/mnt/shared-local/scrape.db", str(mounts))
+    assert not is_network_path("/srv/scrape.db", str(mounts))
+    # Mounts that cannot be read are taken to be local
+    assert not is_network_path("/mnt/shared/scrape.db", str(tmp_path / "missing"))
@@ -0,0 +1,42 @@
+from utils.archive import PayloadArchive
+from utils.typing import TfSource
+from services.archiveservice import load_records
+import json
+
+def test_archive_append_and_get(tmp_path):
+    with PayloadArchive(str(tmp_path)) as archive:
+        archive.append(TfSource.RGL, "match", 32, b'{"matchId": 32}', fetched_at=1)
+        # Uncommitted payloads are not visible to other readers
+        with PayloadArchive(str(tmp_path)) as reader:
+            assert reader.get(TfSource.RGL, "match", 32) is None
+        archive.commit()
+        with PayloadArchive(str(tmp_path)) as reader:
+            assert reader.get(TfSource.RGL, "match", 32) == b'{"matchId": 32}'
+
+        archive.append(TfSource.RGL, "match", 32, b'{"matchId": 32, "isForfeit": true}', fetched_at=2)
+        archive.append(TfSource.RGL, "roster", 41, b'{"teamId": 41}', fetched_at=2)
+
+    # Committed on exit, and readable after a restart
+    with PayloadArchive(str(tmp_path)) as archive:
+        assert archive.get(TfSource.RGL, "match", 32) == b'{"matchId": 32, "isForfeit": true}'
+        assert archive.get(TfSource.ETF2L, "match", 32) is None
+
+        latest = archive.latest()
+        assert len(latest) == 2
+        assert len(archive.latest(entity="roster")) == 1
+        assert archive.latest(source=TfSource.UGC) == []
+
+def test_archive_segments(tmp_path):
+    with PayloadArchive(str(tmp_path), segment_size=64) as archive:
+        for i in range(10):
+            archive.append(TfSource.RGL, "match", i, json.dumps({"matchId": i, "padding": "x" * 100}).encode())
+        archive.commit()
+
+        assert len(archive.segments()) > 1
+        for i in range(10):
+            assert json.loads(archive.get(TfSource.RGL, "match", i))["matchId"] == i
+
+        # Records of a segment can be loaded without the archive (as the re-decode workers do)
+        source, entity, site_id, _, segment, offset, length = archive.latest()[0]
+        records = load_records((archive.segment_path(segment), [(source, entity, offset, length)]))
+        assert records == [(TfSource.RGL, "match", {"matchId": site_id, "padding": "x" * 100})]
@@ -0,0 +1,23 @@
+import numpy as np
+
+from utils.bloom import BloomFilter
+
+def test_bloom_filter(tmp_path):
+    bloom = BloomFilter(10000, error_rate=0.01)
+    keys = np.arange(0, 20000, 2)
+    bloom.add(keys)
+
+    # Never a false negative, and false positives close to the error rate
+    assert bloom.contains(keys).all()
+    assert bloom.contains(keys + 1).mean() < 0.02
+    assert 4 in bloom and (1 << 40) | 4 not in bloom
+
+    path = str(tmp_path / "bloom")
+    bloom.save(path, {"watermark": 7})
+    loaded, metadata = BloomFilter.load(path)
+    assert metadata == {"watermark": 7} and loaded.count == len(keys)
+    assert (loaded.contains(np.arange(100)) == bloom.contains(np.arange(100))).all()
+
+    assert BloomFilter.load(str(tmp_path / "missing")) is None
+    (tmp_path / "corrupt").write_bytes(b"not a filter")
+    assert BloomFilter.load(str(tmp_path / "corrupt")) is None
@@ -0,0 +1,38 @@
+import json
+
+from utils.decoding import DecodePool, decode_match_payload
+from utils.scraping import content_digest
+from utils.typing import TfSource
+
+MATCH = {
+    "matchId": 7, "matchName": "Week 1", "matchDate": "2024-01-05T20:30:00.000Z", "isForfeit": False, "seasonId": 3,
+    "teams": [{"teamId": 11}, {"teamId": 12}],
+    "maps": [{"mapName": "cp_process_f12", "homeScore": 5, "awayScore": 2}, {"mapName": "koth_product_f1", "homeScore": 0, "awayScore": 0}]
+}
+
+def test_decode_match_payload():
+    match = decode_match_payload((int(TfSource.RGL), json.dumps(MATCH).encode()))
+    assert (match.site_id, match.name, match.forfeit, match.season_site_id) == (7, "Week 1", False, 3)
+    assert match.epoch == 1704486600.0
+    assert match.results == (("cp_process_f12", 11, 5), ("cp_process_f12", 12, 2), ("koth_product_f1", 11, 0), ("koth_product_f1", 12, 0))
+    # Digests must match those of earlier fetches, to tell whether the match changed
+    assert match.digest == content_digest(MATCH)
+
+    # Errors come back as messages rather than raising in the workers
+    assert isinstance(decode_match_payload((int(TfSource.RGL), b"{")), str)
+    assert isinstance(decode_match_payload((int(TfSource.RGL), b"{}")), str)
+    assert decode_match_payload((int(TfSource.RGL), b'{"matchId": 8}')).results == ()
+
+def test_decode_pool():
+    payloads = [json.dumps(dict(MATCH, matchId=i)).encode() for i in range(50)] + [b"not json"]
+    with DecodePool(1) as decoder:
+        in_process = decoder.decode_matches(TfSource.RGL, payloads)
+    with DecodePool(2, chunk_size=8) as decoder:
+        pooled = decoder.decode_matches(TfSource.RGL, payloads)
+    assert pooled == in_process
+    assert [match.site_id for match in pooled[:-1]] == list(range(50)) and isinstance(pooled[-1], str)
+
+def test_decode_pool_chunks():
+    decoder = DecodePool(4, chunk_size=16)
+    # Small batches are spread over every worker, large ones handed out `chunk_size` at a time
+    assert [decoder.chunks(n) for n in (1, 3, 9, 64, 1000)] == [1, 1, 3, 16, 16]
@@ -0,0 +1,41 @@
+from utils.http_cache import HttpCache
+import os
+
+def test_http_cache(tmp_path):
+    path = os.path.join(tmp_path, "http_cache.db")
+    url = "https://api.rgl.gg/v0/matches/32"
+
+    with HttpCache(path) as cache:
+        assert cache.headers(url) == {}
+        assert cache.store(url, {"ETag": 'W/"abc"', "Last-Modified": "Thu, 15 Jun 2017 01:30:00 GMT"}, b'{"matchId": 32}')
+        assert cache.headers(url) == {"If-None-Match": 'W/"abc"', "If-Modified-Since": "Thu, 15 Jun 2017 01:30:00 GMT"}
+
+        # Same content is reported as unchanged, even without validators
+        assert not cache.store(url, {}, b'{"matchId": 32}')
+        assert cache.headers(url) == {}
+        assert cache.store(url, {"ETag": 'W/"def"'}, b'{"matchId": 32, "isForfeit": true}')
+
+    # Committed entries survive a restart
+    with HttpCache(path) as cache:
+        assert cache.headers(url) == {"If-None-Match": 'W/"def"'}
+        cache.invalidate(url)
+        assert cache.headers(url) == {}
+
+def test_http_cache_uncommitted(tmp_path):
+    path = os.path.join(tmp_path, "http_cache.db")
+    url = "https://api.rgl.gg/v0/teams/41"
+
+    cache = HttpCache(path)
+    cache.store(url, {"ETag": "1"}, b"{}")
+    # Entries that are never committed (e.g. the database write failed) are lost
+    cache.close()
+
+    with HttpCache(path) as cache:
+        assert cache.headers(url) == {}
+        assert cache.store(url, {}, b"{}")
+        cache.commit()
+
+        # As are entries rolled back along with the data they describe
+        cache.store(url, {"ETag": "2"}, b'{"teamId": 41}')
+        cache.rollback()
+        assert cache.headers(url) == {}
@@ -0,0 +1,29 @@
+from utils.intervals import IntervalIndex
+import random
+
+def test_matches_brute_force():
+    random.seed(7)
+    for n in [0, 1, 2, 3, 7, 8, 9, 31, 100, 257]:
+        intervals = []
+        for i in range(n):
+            start = random.randint(0, 1000)
+            end = None if random.random() < 0.1 else start + random.randint(1, 200)
+            intervals.append((start, end, i))
+        index = IntervalIndex(intervals)
+        assert len(index) == n
+
+        for _ in range(50):
+            start = random.randint(-50, 1100)
+            end = start + random.choice([0, 0, random.randint(1, 300)])
+            expected = {i for s, e, i in intervals if s <= end and (e is None or start < e)}
+            assert set(index.overlapping(start, end)) == expected
+        for s, e, i in intervals:
+            assert i in index.at(s)
+            if e is not None:
+                assert i not in index.at(e)
+
+def test_results_in_start_order():
+    index = IntervalIndex([(5, 10, "b"), (0, None, "a"), (7, 8, "c"), (20, 30, "d")])
+    assert index.at(7) == ["a", "b", "c"]
+    assert index.overlapping(9, 25) == ["a", "b", "d"]
+    assert index.at(100) == ["a"]
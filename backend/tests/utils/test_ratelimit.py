@@ -0,0 +1,22 @@
+from utils.ratelimit import TokenBucket
+
+def test_token_bucket():
+    now, slept = [0.0], []
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+    bucket = TokenBucket(rate=10, burst=3, clock=lambda: now[0], sleep=sleep)
+
+    # A full bucket lets a burst through, after which requests are spaced out at the rate
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert abs(bucket.acquire() - 0.1) < 1e-9
+    assert abs(bucket.acquire() - 0.1) < 1e-9
+
+    # Idle time refills the bucket, but never beyond the burst
+    now[0] += 10
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() > 0
+
+    # The host asking to slow down holds back the next request
+    bucket.pause(2)
+    assert bucket.acquire() > 2
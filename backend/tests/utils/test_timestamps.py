@@ -0,0 +1,25 @@
+import numpy as np
+
+from utils import epoch_from_timestamp
+from utils.timestamps import parse_timestamp, parse_timestamps
+
+def test_parse_timestamp():
+    assert parse_timestamp("2024-01-05T20:30:00.000Z") == 1704486600.0
+    # Without fractional seconds, which strptime could not parse
+    assert parse_timestamp("2024-01-05T20:30:00Z") == 1704486600.0
+    assert parse_timestamp("2024-01-05T20:30:00.25Z") == 1704486600.25
+    assert parse_timestamp("2024-01-05T22:30:00+02:00") == 1704486600.0
+    assert parse_timestamp(None) == 0 and parse_timestamp("") == 0
+    assert epoch_from_timestamp("1970-01-01T00:00:01.500Z") == 1.5
+
+def test_parse_timestamps():
+    timestamps = [f"20{i % 30:02d}-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:{(i * 7) % 60:02d}.{i % 1000:03d}Z" for i in range(1000)]
+    expected = [parse_timestamp(timestamp) for timestamp in timestamps]
+    assert np.allclose(parse_timestamps(timestamps), expected, rtol=0, atol=1e-6)
+    assert parse_timestamps(["2000-02-29T12:00:00Z", "1969-12-31T23:59:59Z"]).tolist() == [951825600.0, -1.0]
+
+    # Mixed layouts, missing timestamps and UTC offsets
+    mixed = ["2024-01-05T20:30:00Z", None, "2024-01-05T20:30:00.5Z", ""]
+    assert parse_timestamps(mixed).tolist() == [1704486600.0, 0.0, 1704486600.5, 0.0]
+    assert parse_timestamps(mixed + ["2024-01-05T22:30:00+02:00"]).tolist() == [1704486600.0, 0.0, 1704486600.5, 0.0, 1704486600.0]
+    assert len(parse_timestamps([])) == 0
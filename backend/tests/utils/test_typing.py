@@ -0,0 +1,41 @@
+import pickle
+
+from utils.typing import SiteID, TfSource
+
+def test_site_id():
+    site_id = SiteID.rgl_id(10)
+    assert site_id.get_id() == 10 and site_id.get_source() == TfSource.RGL
+    # Interned, and usable in sets / as dict keys
+    assert SiteID(10, TfSource.RGL) is site_id and SiteID("10", TfSource.RGL) is site_id
+    assert len({site_id, SiteID.rgl_id(10), SiteID.etf2l_id(10)}) == 2
+    assert {site_id: 1}[SiteID.rgl_id(10)] == 1
+    assert site_id != SiteID.etf2l_id(10) and site_id != (TfSource.RGL, 10)
+    assert SiteID.rgl_id(None) is None
+
+    try:
+        site_id.id = 11
+        assert False
+    except AttributeError:
+        pass
+
+    assert pickle.loads(pickle.dumps(site_id)) is site_id
+    assert repr(site_id) == "(RGL ID: 10)"
+
+def test_site_id_bulk():
+    site_ids = SiteID.rgl_ids([1, 2, "1", 3])
+    assert site_ids == [SiteID.rgl_id(1), SiteID.rgl_id(2), SiteID.rgl_id(1), SiteID.rgl_id(3)]
+    assert site_ids[0] is site_ids[2]
+    assert SiteID.etf2l_ids([1])[0].get_source() == TfSource.ETF2L
+
+def test_site_id_bounded(monkeypatch):
+    site_id = SiteID.rgl_id(10)
+    monkeypatch.setattr(SiteID, "MAX_INTERNED", len(SiteID.INTERNED) + 2)
+    SiteID.rgl_ids([900001, 900002])
+    # The table was full, so it was emptied before interning more
+    SiteID.rgl_ids([900003])
+    assert len(SiteID.INTERNED) == 1
+    # IDs interned before still equal the new instances
+    assert SiteID.rgl_id(10) == site_id and SiteID.rgl_id(10) is not site_id
+
+    SiteID.clear_interned()
+    assert not SiteID.INTERNED
@@ -0,0 +1,14 @@
+from utils.unionfind import UnionFind
+
+def test_union_find():
+    sets = UnionFind(range(6))
+    assert sets.union(0, 1)
+    assert sets.union(2, 3)
+    assert sets.union(1, 3)
+    assert not sets.union(0, 2)
+    assert sets.find(0) == sets.find(3)
+    assert sets.find(4) != sets.find(0)
+
+    sets.union("a", 5)
+    assert len(sets) == 7
+    assert sorted(sorted(map(str, group)) for group in sets.groups()) == [["0", "1", "2", "3"], ["4"], ["5", "a"]]
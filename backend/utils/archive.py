@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import sqlite3
+import struct
+import time
+import zlib
+import os
+
+from utils.typing import TfSource
+
+RECORD_HEADER = struct.Struct(">I")
+
+class PayloadArchive:
+    """
+    Compressed, append-only archive of raw API responses, so that data can be re-decoded without touching the network
+
+    Payloads are zlib-compressed and appended to numbered segment files (`segment-000001.bin`, ...), each record being
+    a 4-byte big-endian length followed by the compressed bytes. Segments are never rewritten, and a new one is started
+    once the current one reaches `segment_size`. Every record is indexed by (source, entity, site ID, fetched at) in
+    a SQLite index next to the segments
+
+    Index rows are only committed once the segment data they point to has been flushed, so a crash can at worst leave
+    some unindexed bytes at the end of a segment. Only one process should write to an archive at a time
+
+    params:
+        root[str]: directory of the archive (defaults to the `archive` environment variable, or data/archive)
+        segment_size[int]: size in bytes after which a new segment is started
+    """
+
+    def __init__(self, root: str | None = None, segment_size: int = 64 * 1024 * 1024) -> None:
+        self.root = root or os.environ.get("archive", os.path.join("data", "archive"))
+        self.segment_size = segment_size
+        os.makedirs(self.root, exist_ok=True)
+
+        self.index = sqlite3.connect(os.path.join(self.root, "index.db"))
+        self.index.execute("""
+            CREATE TABLE IF NOT EXISTS payloads (
+                source INTEGER,
+                entity TEXT,
+                site_id INTEGER,
+                fetched_at REAL,
+                segment INTEGER,
+                offset INTEGER,
+                length INTEGER
+            )""")
+        self.index.execute("CREATE INDEX IF NOT EXISTS ix_payloads_entity ON payloads (source, entity, site_id, fetched_at)")
+        self.index.commit()
+
+        segments = self.segments()
+        self.segment = segments[-1] if segments else 1
+        self.writer = None
+
+    def __enter__(self) -> PayloadArchive:
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback) -> None:
+        self.commit()
+        self.close()
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.root, f"segment-{segment:06d}.bin")
+
+    def segments(self) -> list[int]:
+        """
+        Gets the numbers of every segment in the archive, in order
+        """
+        return sorted(int(name[8:14]) for name in os.listdir(self.root) if name.startswith("segment-") and name.endswith(".bin"))
+
+    def append(self,
+                source: TfSource,
+                entity: str,
+                site_id: int,
+                content: bytes,
+                fetched_at: float | None = None) -> None:
+        """
+        Compresses and appends a raw payload. The record is only indexed (and so visible to readers) after `commit()`
+
+        params:
+            source[TfSource]: the site the payload came from
+            entity[str]: the kind of entity, e.g. "match" or "roster"
+            site_id[int]: the ID of the entity on the source site
+            content[bytes]: the raw response body
+            fetched_at[float]: when the payload was fetched (defaults to now)
+        """
+        if self.writer is None:
+            self.writer = open(self.segment_path(self.segment), "ab")
+        if self.writer.tell() >= self.segment_size:
+            self.writer.close()
+            self.segment += 1
+            self.writer = open(self.segment_path(self.segment), "ab")
+
+        compressed = zlib.compress(content)
+        offset = self.writer.tell()
+        self.writer.write(RECORD_HEADER.pack(len(compressed)) + compressed)
+        # This connection sees its own uncommitted index rows, so the data they point to must be readable already
+        self.writer.flush()
+
+        self.index.execute("INSERT INTO payloads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (int(source), entity, int(site_id), fetched_at or time.time(), self.segment, offset, len(compressed)))
+
+    def commit(self) -> None:
+        """
+        Syncs appended payloads to disk, then makes them visible in the index
+        """
+        if self.writer is not None:
+            os.fsync(self.writer.fileno())
+        self.index.commit()
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.index.close()
+
+    def latest(self, source: TfSource | None = None, entity: str | None = None) -> list[tuple]:
+        """
+        Gets the index entry of the most recent payload of every archived entity
+
+        params:
+            source[TfSource]: only include payloads from this site
+            entity[str]: only include payloads of this kind of entity
+
+        returns:
+            entries[list[tuple]]: `(source, entity, site_id, fetched_at, segment, offset, length)` tuples, in segment order
+        """
+        conditions, params = [], []
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(int(source))
+        if entity is not None:
+            conditions.append("entity = ?")
+            params.append(entity)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # SQLite returns the bare columns of the row holding the MAX() of each group
+        return self.index.execute(f"""
+            SELECT source, entity, site_id, MAX(fetched_at), segment, offset, length FROM payloads {where}
+            GROUP BY source, entity, site_id
+            ORDER BY segment, offset""", params).fetchall()
+
+    def get(self, source: TfSource, entity: str, site_id: int) -> bytes | None:
+        """
+        Gets the most recent raw payload of the given entity, or `None` if it was never archived
+        """
+        row = self.index.execute("""
+            SELECT segment, offset, length FROM payloads WHERE source = ? AND entity = ? AND site_id = ?
+            ORDER BY fetched_at DESC LIMIT 1""", (int(source), entity, int(site_id))).fetchone()
+        if not row:
+            return None
+        return read_records(self.segment_path(row[0]), [(row[1], row[2])])[0]
+
+def read_records(path: str, locations: list[tuple[int, int]]) -> list[bytes]:
+    """
+    Reads and decompresses the records at the given `(offset, length)` locations of a single segment file
+    """
+    records = []
+    with open(path, "rb") as f:
+        for offset, length in locations:
+            f.seek(offset + RECORD_HEADER.size)
+            records.append(zlib.decompress(f.read(length)))
+    return records
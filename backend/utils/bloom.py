@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from math import ceil, log
+import numpy as np
+import zipfile
+import json
+import os
+
+class BloomFilter:
+    """
+    Bloom filter over 64 bit integer keys, vectorised over whole batches of keys. A key that was added is always
+    reported as possibly present, a key that was not is reported as absent except for a `error_rate` share of false
+    positives (as long as no more than `capacity` keys are added)
+
+    params:
+        capacity[int]: the number of keys the filter is sized for
+        error_rate[float]: the false positive rate at capacity
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.num_bits = max(int(ceil(-self.capacity * log(error_rate) / log(2) ** 2)), 64)
+        self.num_hashes = max(int(round(self.num_bits / self.capacity * log(2))), 1)
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    @staticmethod
+    def __mix(keys: np.ndarray) -> np.ndarray:
+        # splitmix64 finaliser, spreads sequential IDs over the whole 64 bit range
+        with np.errstate(over="ignore"):
+            keys = keys.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+            keys = (keys ^ (keys >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            keys = (keys ^ (keys >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            return keys ^ (keys >> np.uint64(31))
+
+    def __positions(self, keys: np.ndarray) -> np.ndarray:
+        # Double hashing: the i-th bit of a key is h1 + i * h2, from the two halves of one 64 bit hash
+        hashes = BloomFilter.__mix(np.asarray(keys, dtype=np.int64).reshape(-1))
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        with np.errstate(over="ignore"):
+            return (h1[:, None] + np.arange(self.num_hashes, dtype=np.uint64)[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, keys: np.ndarray | list[int]) -> None:
+        """
+        Adds a batch of keys
+        """
+        positions = self.__positions(keys).reshape(-1)
+        np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.intp), (1 << (positions & np.uint64(7))).astype(np.uint8))
+        self.count += len(positions) // self.num_hashes
+
+    def contains(self, keys: np.ndarray | list[int]) -> np.ndarray:
+        """
+        Checks a batch of keys, `False` meaning the key was definitely never added
+
+        returns:
+            possibly_present[np.ndarray]: per key, whether it may have been added
+        """
+        positions = self.__positions(keys)
+        set_bits = (self.bits[(positions >> np.uint64(3)).astype(np.intp)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return set_bits.all(axis=1)
+
+    def __contains__(self, key: int) -> bool:
+        return bool(self.contains([key])[0])
+
+    def save(self, path: str, metadata: dict | None = None) -> None:
+        """
+        Writes the filter (and any metadata, e.g. how far into a table it is up to date) to `path`, atomically
+        """
+        header = {"capacity": self.capacity, "error_rate": self.error_rate, "count": self.count, "metadata": metadata or {}}
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, header=np.array(json.dumps(header)), bits=self.bits)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def load(path: str) -> tuple[BloomFilter, dict] | None:
+        """
+        Reads a filter written by `save`
+
+        returns:
+            filter[tuple[BloomFilter, dict]]: the filter and its metadata, or `None` if there is no (readable) filter
+        """
+        try:
+            with np.load(path) as data:
+                header = json.loads(str(data["header"]))
+                bloom = BloomFilter(header["capacity"], header["error_rate"])
+                if data["bits"].shape != bloom.bits.shape:
+                    return None
+                bloom.bits = data["bits"].copy()
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+        bloom.count = header["count"]
+        return bloom, header["metadata"]
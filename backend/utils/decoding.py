@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from multiprocessing import Pool
+from typing import NamedTuple
+import orjson
+import signal
+import sys
+import os
+
+from utils.typing import TfSource
+from utils.timestamps import parse_timestamp
+from utils.scraping import content_digest
+
+class DecodedMatch(NamedTuple):
+    """
+    A decoded match as plain rows, cheap to pickle back from the decode workers. Rosters and seasons are referenced by
+    their site IDs, which are resolved to internal IDs when the rows are written
+    """
+    source: int
+    site_id: int
+    epoch: float | None
+    name: str | None
+    forfeit: bool | None
+    season_site_id: int | None
+    results: tuple[tuple[str, int, int], ...] # (map_name, roster site ID, score)
+    digest: str
+
+def decode_rgl_match(match_data: dict) -> DecodedMatch:
+    home_team, away_team = match_data.get("teams", ({}, {}))
+    results = ()
+    if home_team and away_team:
+        results = tuple(result for map_ in match_data.get("maps", []) for result in (
+            (sys.intern(map_["mapName"]), int(home_team["teamId"]), map_["homeScore"]),
+            (sys.intern(map_["mapName"]), int(away_team["teamId"]), map_["awayScore"])))
+    forfeit = match_data.get("isForfeit", None)
+    season_id = match_data.get("seasonId", None)
+    return DecodedMatch(
+        int(TfSource.RGL),
+        int(match_data["matchId"]),
+        parse_timestamp(match_data.get("matchDate", 0)) or None,
+        match_data.get("matchName", None),
+        bool(forfeit) if forfeit is not None else None,
+        int(season_id) if season_id is not None else None,
+        results,
+        content_digest(match_data)
+    )
+
+def decode_etf2l_match(match_data: dict) -> DecodedMatch:
+    digest = content_digest(match_data)
+    # Match details come wrapped in a `match` object
+    match_data = match_data.get("match", match_data)
+    competition = match_data.get("competition") or {}
+    forfeit = match_data.get("defaultwin", None)
+    # Only the overall score of a match is reported, not one per map, so no map results are decoded
+    return DecodedMatch(
+        int(TfSource.ETF2L),
+        int(match_data["id"]),
+        float(match_data.get("time") or 0) or None,
+        competition.get("name", None),
+        bool(forfeit) if forfeit is not None else None,
+        int(competition["id"]) if competition.get("id") is not None else None,
+        (),
+        digest
+    )
+
+DECODERS = {
+    TfSource.RGL: decode_rgl_match,
+    TfSource.ETF2L: decode_etf2l_match
+}
+
+def decode_match_payload(task: tuple[int, bytes]) -> DecodedMatch | str:
+    """
+    Parses and decodes a raw match payload. Runs in the decode workers
+
+    params:
+        task[tuple[int, bytes]]: the source of the payload, and the payload
+
+    returns:
+        match[DecodedMatch | str]: the decoded match, or the error message if it could not be decoded
+    """
+    source, payload = task
+    try:
+        if source not in DECODERS:
+            return f"Decoding matches from {TfSource(source).name} is not supported"
+        return DECODERS[source](orjson.loads(payload))
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+def ignore_interrupts() -> None:
+    # Decode workers are stopped by the process that owns the pool, a Ctrl-C sent to the whole process group would
+    # otherwise kill them mid-batch and leave the pool waiting on their results
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class DecodePool:
+    """
+    Process pool that turns raw API payloads into rows, so that JSON parsing and decoding scale with the number of
+    cores while the main process only writes. Payloads go in as bytes and rows come back as tuples, both cheap to
+    pickle
+
+    Usage:
+        with DecodePool() as decoder:
+            matches = decoder.decode_matches(TfSource.RGL, [response.content for response in responses])
+
+    params:
+        workers[int]: the number of worker processes (defaults to the number of cores, 1 decodes in this process)
+        chunk_size[int]: the most payloads handed to a worker at once, smaller batches are split evenly between the
+        workers instead
+    """
+
+    def __init__(self, workers: int | None = None, chunk_size: int = 16) -> None:
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.pool = None
+
+    def __enter__(self) -> DecodePool:
+        if self.workers > 1:
+            self.pool = Pool(self.workers, initializer=ignore_interrupts)
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback) -> None:
+        if self.pool is not None:
+            self.pool.terminate() if exception_type is not None else self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def chunks(self, num_payloads: int) -> int:
+        """
+        Gets how many payloads of a batch to hand to a worker at once, so that a batch smaller than
+        `workers * chunk_size` still keeps every worker busy rather than going to a single one
+        """
+        return max(1, min(self.chunk_size, -(-num_payloads // self.workers)))
+
+    def decode_matches(self, source: TfSource, payloads: list[bytes]) -> list[DecodedMatch | str]:
+        """
+        Decodes a batch of raw match payloads, in the order given
+
+        returns:
+            matches[list[DecodedMatch | str]]: every decoded match, or the error message of those that failed
+        """
+        tasks = [(int(source), payload) for payload in payloads]
+        # A single payload is not worth the round trip to a worker
+        if self.pool is None or len(tasks) <= 1:
+            return list(map(decode_match_payload, tasks))
+        return self.pool.map(decode_match_payload, tasks, chunksize=self.chunks(len(tasks)))
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from collections import deque
+import numpy as np
+
+class CsrGraph:
+    """
+    Undirected weighted graph in compressed sparse row form: the neighbours of node `i` are
+    `indices[indptr[i]:indptr[i + 1]]`, sorted, with the matching slice of each named weight array holding the weights
+    of those edges. Nodes are identified by arbitrary integer keys, mapped to dense indexes through `keys` (sorted)
+
+    params:
+        keys[np.ndarray]: the sorted keys of the nodes
+        indptr[np.ndarray]: start of each node's neighbours in `indices`, with one extra entry at the end
+        indices[np.ndarray]: the neighbours of every node, as node indexes
+        weights[dict[str, np.ndarray]]: edge weights, aligned with `indices`
+    """
+
+    def __init__(self, keys: np.ndarray, indptr: np.ndarray, indices: np.ndarray, weights: dict[str, np.ndarray]) -> None:
+        self.keys = keys
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @staticmethod
+    def from_edges(keys: np.ndarray, a: np.ndarray, b: np.ndarray, weights: dict[str, np.ndarray]) -> CsrGraph:
+        """
+        Builds a graph from undirected edges between node indexes, each given once with `a != b`. Duplicate edges must
+        already be merged
+        """
+        src = np.concatenate([a, b])
+        dst = np.concatenate([b, a])
+        order = np.lexsort((dst, src))
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(keys)), out=indptr[1:])
+        return CsrGraph(keys, indptr, dst[order],
+                        {name: np.concatenate([weight, weight])[order] for name, weight in weights.items()})
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def index(self, key: int) -> int | None:
+        """
+        Gets the index of the node with the given key, or `None` if it is not in the graph
+        """
+        i = int(np.searchsorted(self.keys, key))
+        return i if i < len(self.keys) and self.keys[i] == key else None
+
+    def neighbours(self, i: int, weight: str | None = None) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        Gets the neighbour indexes of node `i` and, if given, the named weight of each edge
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.weights[weight][start:end] if weight else None
+
+    def top(self, i: int, weight: str, k: int) -> list[tuple[int, float]]:
+        """
+        Gets the `k` neighbours of node `i` with the heaviest edges (ignoring edges of weight 0), heaviest first
+
+        returns:
+            neighbours[list[tuple[int, float]]]: `(key, weight)` pairs
+        """
+        neighbours, weights = self.neighbours(i, weight)
+        mask = weights > 0
+        neighbours, weights = neighbours[mask], weights[mask]
+        if len(weights) > k:
+            best = np.argpartition(-weights, k - 1)[:k]
+            neighbours, weights = neighbours[best], weights[best]
+        order = np.lexsort((neighbours, -weights))
+        return list(zip(self.keys[neighbours[order]].tolist(), weights[order].tolist()))
+
+    def shortest_path(self, source: int, target: int, max_depth: int | None = None) -> list[int] | None:
+        """
+        Gets a shortest path between two nodes by breadth first search, ignoring weights
+
+        returns:
+            path[list[int] | None]: the keys of the nodes along the path, or `None` if they are not connected
+        """
+        if source == target:
+            return [int(self.keys[source])]
+        parent = {source: -1}
+        frontier = deque([(source, 0)])
+        while frontier:
+            node, depth = frontier.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for neighbour in self.indices[self.indptr[node]:self.indptr[node + 1]].tolist():
+                if neighbour in parent:
+                    continue
+                parent[neighbour] = node
+                if neighbour == target:
+                    path = [neighbour]
+                    while parent[path[-1]] != -1:
+                        path.append(parent[path[-1]])
+                    return self.keys[path[::-1]].tolist()
+                frontier.append((neighbour, depth + 1))
+        return None
+
+    def subgraph(self, nodes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+        """
+        Gets the edges between the given node indexes, each once
+
+        returns:
+            (keys, a, b, weights): the keys of the nodes, and the edges as key pairs with their weights
+        """
+        nodes = np.unique(nodes)
+        counts = np.diff(self.indptr)[nodes]
+        src = np.repeat(nodes, counts)
+        positions = np.concatenate([np.arange(self.indptr[i], self.indptr[i + 1]) for i in nodes.tolist()]) if len(nodes) else np.empty(0, dtype=np.int64)
+        dst = self.indices[positions]
+        keep = (src < dst) & np.isin(dst, nodes)
+        return (self.keys[nodes], self.keys[src[keep]], self.keys[dst[keep]],
+                {name: weight[positions[keep]] for name, weight in self.weights.items()})
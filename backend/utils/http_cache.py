@@ -0,0 +1,109 @@
+from __future__ import annotations
+from typing import Mapping
+
+import hashlib
+import sqlite3
+import time
+import os
+
+from utils.logger import Logger
+
+cache_logger = Logger.get_logger()
+
+class HttpCache:
+    """
+    On-disk cache of the validators (`ETag` / `Last-Modified`) and a content hash of the last response for each URL.
+    It is used to send conditional requests, and to tell whether a re-fetched resource is any different from last time
+    so that decoding it and writing it to the database can be skipped
+
+    Entries are only made durable by `commit()`, which should be called once the data they describe has been committed
+    to the database (e.g. as the `on_commit` of a `UnitOfWork`), otherwise a crash could leave the cache claiming that
+    data is up to date when it was never written
+
+    params:
+        path[str]: path of the cache file (defaults to the `http_cache` environment variable, or data/http_cache.db)
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path or os.environ.get("http_cache", os.path.join("data", "http_cache.db"))
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                digest TEXT,
+                fetched_at REAL
+            )""")
+        self.connection.commit()
+
+    def __enter__(self) -> HttpCache:
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback) -> None:
+        if exception_type is None:
+            self.commit()
+        self.close()
+
+    def headers(self, url: str) -> dict:
+        """
+        Gets the conditional request headers for the given url, empty if it has never been fetched
+        """
+        row = self.connection.execute("SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)).fetchone()
+        if not row:
+            return {}
+
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def store(self, url: str, headers: Mapping[str, str], content: bytes) -> bool:
+        """
+        Stages the validators and content hash of a full (`200`) response
+
+        params:
+            url[str]: the requested url
+            headers[Mapping[str, str]]: the response headers
+            content[bytes]: the raw response body
+
+        returns:
+            changed[bool]: whether the content differs from the last stored response for this url
+        """
+        digest = hashlib.sha1(content).hexdigest()
+        row = self.connection.execute("SELECT digest FROM http_cache WHERE url = ?", (url,)).fetchone()
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, digest, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (url, headers.get("ETag"), headers.get("Last-Modified"), digest, time.time())
+        )
+        return not row or row[0] != digest
+
+    def touch(self, url: str) -> None:
+        """
+        Stages that the given url was fetched and found to be unchanged (a `304` response)
+        """
+        self.connection.execute("UPDATE http_cache SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def invalidate(self, url: str) -> None:
+        """
+        Stages the removal of the given url, so that it is fetched and processed in full next time
+        """
+        self.connection.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def rollback(self) -> None:
+        """
+        Discards the entries staged since the last commit, e.g. once the data they describe was rolled back
+        """
+        self.connection.rollback()
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+class IntervalIndex:
+    """
+    Static interval tree answering point-in-time and range-overlap queries in O(log n + k) time
+
+    Intervals are sorted by start and laid out as an implicit balanced binary search tree over the sorted array (the
+    node at index i on level k has its children at i -/+ 2**(k-1)), where every node also stores the largest end in its
+    subtree. Subtrees that end before the query starts are skipped whole, and everything right of a node starting after
+    the query ends is skipped too. Building is a sort plus one linear pass, so the index is cheap to rebuild
+
+    Intervals cover `[start, end)`, an end of `None` meaning the interval is still open
+
+    params:
+        intervals[Iterable[tuple]]: `(start, end, value)` tuples
+    """
+
+    def __init__(self, intervals: Iterable[tuple[float, float | None, Any]]) -> None:
+        intervals = sorted(((start, end if end is not None else float("inf"), value) for start, end, value in intervals),
+                            key=lambda interval: interval[0])
+        self.starts = [interval[0] for interval in intervals]
+        self.ends = [interval[1] for interval in intervals]
+        self.values = [interval[2] for interval in intervals]
+        self.max_ends = list(self.ends)
+        self.root_level = self.__build()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __build(self) -> int:
+        n = len(self.starts)
+        if not n:
+            return -1
+        # Leaves are the even indexes; `last` tracks the max end of the rightmost (possibly partial) subtree, standing
+        # in for right children that fall off the end of the array
+        last_i = n - 1 if (n - 1) % 2 == 0 else n - 2
+        last = self.max_ends[last_i]
+        level = 1
+        while 1 << level <= n:
+            x = 1 << (level - 1)
+            for i in range((x << 1) - 1, n, x << 2):
+                left = self.max_ends[i - x]
+                right = self.max_ends[i + x] if i + x < n else last
+                self.max_ends[i] = max(self.ends[i], left, right)
+            last_i = last_i - x if last_i >> level & 1 else last_i + x
+            if last_i < n and self.max_ends[last_i] > last:
+                last = self.max_ends[last_i]
+            level += 1
+        return level - 1
+
+    def overlapping(self, start: float, end: float) -> list[Any]:
+        """
+        Gets the values of every interval overlapping the closed range `[start, end]`, in order of their start
+        """
+        n = len(self.starts)
+        if not n:
+            return []
+        found = []
+        # (node, level, left child visited)
+        stack = [((1 << self.root_level) - 1, self.root_level, False)]
+        while stack:
+            node, level, visited = stack.pop()
+            if level <= 3:
+                # Small subtrees are cheaper to scan
+                i = node >> level << level
+                last = min(i + (1 << (level + 1)) - 1, n)
+                while i < last and self.starts[i] <= end:
+                    if start < self.ends[i]:
+                        found.append(self.values[i])
+                    i += 1
+            elif not visited:
+                stack.append((node, level, True))
+                child = node - (1 << (level - 1))
+                # Nodes past the end of the array still have real nodes in their left subtree
+                if child >= n or self.max_ends[child] > start:
+                    stack.append((child, level - 1, False))
+            elif node < n and self.starts[node] <= end:
+                if start < self.ends[node]:
+                    found.append(self.values[node])
+                stack.append((node + (1 << (level - 1)), level - 1, False))
+        return found
+
+    def at(self, time: float) -> list[Any]:
+        """
+        Gets the values of every interval containing the given point in time
+        """
+        return self.overlapping(time, time)
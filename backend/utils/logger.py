@@ -32,7 +32,7 @@ class LogFile:
                                 start: chr = '',
                                 end: chr = '\n') -> None:
         parsed_message = f"{start}[{level}] [{calling_module}] {message}{end}"
-        if end == '\r' and "\r" in self.log_message_buffer[-1]:
+        if end == "\r" and self.log_message_buffer and "\r" in self.log_message_buffer[-1]:
             self.log_message_buffer[-1] = parsed_message
         else:
             self.log_message_buffer.append(parsed_message)
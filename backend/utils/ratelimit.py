@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import Callable
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter. Tokens are added at `rate` per second up to `burst`, and every request takes
+    one, so a host sees at most `burst` requests at once and `rate` per second on average, however many threads share
+    the bucket
+
+    params:
+        rate[float]: the number of requests allowed per second
+        burst[int]: the number of requests that may be sent at once after an idle period
+        clock[Callable]: monotonic clock, in seconds
+        sleep[Callable]: blocks for the given number of seconds
+    """
+
+    def __init__(self,
+                    rate: float,
+                    burst: int = 1,
+                    clock: Callable[[], float] = time.monotonic,
+                    sleep: Callable[[float], None] = time.sleep) -> None:
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def __reserve(self) -> float:
+        # Takes a token, returning how long to wait until it is actually available
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self) -> float:
+        """
+        Blocks until a request may be sent
+
+        returns:
+            waited[float]: the number of seconds spent waiting
+        """
+        wait = self.__reserve()
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every request for `seconds`, e.g. when the host asks to slow down (`429` with `Retry-After`)
+        """
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
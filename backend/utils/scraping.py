@@ -1,9 +1,18 @@
-from typing import Any
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable
 import requests
+import hashlib
+import json
 import time
+import sys
 from multiprocessing import Pool
 from models import Match, Roster
 from utils.typing import TfSource, SiteID
+from utils.http_cache import HttpCache
+from utils.ratelimit import TokenBucket
 from utils import epoch_from_timestamp
 
 def post_request(url: str, default: Any = {}, **kwargs) -> tuple[int, dict]:
@@ -22,9 +31,100 @@ def post_request(url: str, default: Any = {}, **kwargs) -> tuple[int, dict]:
     response = requests.post(url, params=kwargs, headers=headers, json={})
     return (response.status_code, response.json() if response.status_code == 200 else default)
 
+def content_digest(data: Any) -> str:
+    """
+    Gets a digest of decoded API data that is stable across key ordering, used to tell whether an entity changed
+    between two fetches
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
 def sleep_then_request(data) -> dict:
     time.sleep(data[1])
-    return requests.get(data[0])
+    # Optional third element holds extra request headers (e.g. conditional request headers)
+    return requests.get(data[0], headers=data[2] if len(data) > 2 else None)
+
+class HostClient:
+    """
+    Connection pool, rate limit and fetch threads of a single API host. Requests to one host never wait on another
+    host's limits, so several leagues can be scraped at once, each as fast as its own API allows
+
+    Usage:
+        with HostClient(rate=5, burst=9) as client:
+            client.submit(url, headers, callback=lambda url, response: ...)
+
+    params:
+        rate[float]: the number of requests per second the host is sent on average
+        burst[int]: the number of requests that may be sent at once
+        connections[int]: the number of fetch threads, and of pooled connections
+        retries[int]: the number of times a request is retried after a connection error or `429`
+        timeout[float]: seconds to wait for a response
+    """
+
+    def __init__(self, rate: float, burst: int = 1, connections: int = 8, retries: int = 3, timeout: float = 30) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(connections)
+
+    def __enter__(self) -> HostClient:
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback) -> None:
+        self.close()
+
+    def get(self, url: str, headers: dict | None = None, **params) -> requests.Response | None:
+        """
+        Sends a GET request once the rate limit allows it, backing off as the host asks to on `429`
+
+        returns:
+            response[requests.Response]: the response, or `None` if the host could not be reached
+        """
+        return self.request("GET", url, headers, **params)
+
+    def post(self, url: str, headers: dict | None = None, json: Any = None, **params) -> requests.Response | None:
+        """
+        Sends a POST request once the rate limit allows it, backing off as the host asks to on `429`
+
+        returns:
+            response[requests.Response]: the response, or `None` if the host could not be reached
+        """
+        return self.request("POST", url, headers, json, **params)
+
+    def request(self, method: str, url: str, headers: dict | None = None, json: Any = None, **params) -> requests.Response | None:
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.request(method, url, headers=headers, params=params or None, json=json, timeout=self.timeout)
+            except requests.RequestException:
+                if attempt == self.retries:
+                    return None
+                continue
+            if response.status_code != 429 or attempt == self.retries:
+                return response
+            retry_after = response.headers.get("Retry-After", "")
+            self.bucket.pause(float(retry_after) if retry_after.isdigit() else 2 ** attempt)
+        return None
+
+    def submit(self, url: str, headers: dict | None, callback: Callable[[str, requests.Response | None], None]) -> Future:
+        """
+        Fetches `url` on one of the fetch threads, then calls `callback(url, response)` on that thread. The callback is
+        always called, with `None` if the request failed in any way
+        """
+        def fetch() -> None:
+            try:
+                response = self.get(url, headers)
+            except Exception:
+                response = None
+            callback(url, response)
+        return self.executor.submit(fetch)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
 
 def get_first(urls: list[str], n: int) -> list[str]:
     return urls if n >= len(urls) else urls[:n]
@@ -56,6 +156,41 @@ def scrape_parallel(urls: list[str], batch_size: int, delay_step: float = 0.2, d
             yield [result.json() for result in results if result.status_code == 200]
         # yield results, remove all successful ones
 
+def scrape_parallel_cached(urls: list[str], cache: HttpCache, batch_size: int, delay_step: float = 0.2, delay_size: int = 1):
+    """
+    Same as `scrape_parallel`, but sends conditional requests using the validators stored in `cache` and compares each
+    response against the last one stored for its url
+
+    yields:
+        results[list[tuple[str, requests.Response]]]: `(url, response)` pairs for each successful request of the batch,
+        where `response` is `None` if the resource is unchanged since it was last fetched (so there is nothing to decode
+        or write)
+    """
+    urls = urls.copy()
+    with Pool(batch_size) as p:
+        while urls:
+            to_process = get_first(urls, batch_size)
+            delay_profile = [delay_step*(i//delay_size) for i in range(len(to_process))]
+            results = p.map(sleep_then_request, zip(to_process, delay_profile, [cache.headers(url) for url in to_process]))
+
+            success = [i for i, result in enumerate(results) if result.status_code in (200, 304)]
+            scraped = []
+            for i in success:
+                url, result = to_process[i], results[i]
+                if result.status_code == 304:
+                    cache.touch(url)
+                    scraped.append((url, None))
+                elif cache.store(url, result.headers, result.content):
+                    scraped.append((url, result))
+                else:
+                    scraped.append((url, None))
+
+            # reverse indexes so deletion actually works :D
+            for index in reversed(success):
+                del urls[index]
+
+            yield scraped
+
 def find_optimal_scraping_params(test_url: str, start_delay_size: int = 1, end_delay_size: int = 5, delay_start: float = 0.1, delay_end: float = 1.0, delay_step: float = 0.1) -> tuple:
     """
     Automatically finds the best combination of parameters to minimize the time to scrape
@@ -97,22 +232,29 @@ class TfDataDecoder:
             return match
 
         for map_ in match_data.get("maps", []):
-            match.add_map(map_["mapName"], SiteID.rgl_id(home_team["teamId"]), map_["homeScore"], SiteID.rgl_id(away_team["teamId"]), map_["awayScore"])
+            # Interned, as the same few map names repeat across every decoded match
+            match.add_map(sys.intern(map_["mapName"]), SiteID.rgl_id(home_team["teamId"]), map_["homeScore"], SiteID.rgl_id(away_team["teamId"]), map_["awayScore"])
         return match
 
     def __decode_etf2l_match(match_data: dict) -> Match:
-        match = Match(
+        # Match details come wrapped in a `match` object
+        match_data = match_data.get("match", match_data)
+        competition = match_data.get("competition") or {}
+        # Only the overall score of a match is reported, not one per map, so no map results are decoded
+        return Match(
             SiteID.etf2l_id(match_data["id"]),
-            float(match_data.get("time", 0)) or None,
-            match_data.get("competition", {}).get("name", None),
+            float(match_data.get("time") or 0) or None,
+            competition.get("name", None),
             match_data.get("defaultwin", None),
-            SiteID.etf2l_id(match_data.get("competition", {}).get("id", None))
+            SiteID.etf2l_id(competition["id"]) if competition.get("id") is not None else None
         )
 
     @staticmethod
     def decode_match(source: TfSource, match_data: dict) -> Match:
         if source == TfSource.RGL:
             return TfDataDecoder.__decode_rgl_match(match_data)
+        if source == TfSource.ETF2L:
+            return TfDataDecoder.__decode_etf2l_match(match_data)
 
     @staticmethod
     def decode_roster(source: TfSource, roster_data: dict) -> Roster:
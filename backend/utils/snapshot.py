@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import mmap
+import json
+import struct
+import time
+import os
+
+import numpy as np
+
+MAGIC = b"TFSNAP\x00\x01"
+HEADER = struct.Struct("<8sQ") # Magic, length of the JSON manifest
+ALIGNMENT = 64
+
+class StringHeap:
+    """
+    Builds the string section of a snapshot: every distinct string stored once as UTF-8, referenced by offset and length
+    """
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.offsets = {}
+
+    def add(self, string: str | None) -> tuple[int, int]:
+        """
+        Adds a string to the heap, returning its `(offset, length)`. `None` is stored as length `-1`
+        """
+        if string is None:
+            return 0, -1
+        if string not in self.offsets:
+            encoded = string.encode("utf-8")
+            self.offsets[string] = (len(self.data), len(encoded))
+            self.data += encoded
+        return self.offsets[string]
+
+    def array(self) -> np.ndarray:
+        return np.frombuffer(bytes(self.data), dtype=np.uint8)
+
+def write_snapshot(path: str, sections: dict[str, np.ndarray]) -> None:
+    """
+    Writes fixed-width record arrays to a snapshot file, then atomically swaps it in place of any previous snapshot, so
+    readers only ever see a complete file
+
+    The file is a header (magic and manifest length), a JSON manifest holding the offset, record count and dtype of
+    every section, then the sections' raw records, each aligned to 64 bytes
+
+    params:
+        path[str]: where to write the snapshot
+        sections[dict[str, np.ndarray]]: the record arrays (numpy structured arrays) by name
+    """
+    manifest = {"created": time.time(), "sections": {}}
+    # The manifest's length depends on the offsets in it, so lay out the sections after a generous upper bound
+    offset = HEADER.size + len(json.dumps({"created": 0.0, "sections": {name: {"offset": 2 ** 63, "count": 2 ** 63,
+                "dtype": array.dtype.descr} for name, array in sections.items()}})) + ALIGNMENT
+    for name, array in sections.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        manifest["sections"][name] = {"offset": offset, "count": len(array), "dtype": array.dtype.descr}
+        offset += array.nbytes
+    encoded = json.dumps(manifest).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(encoded)))
+        f.write(encoded)
+        for name, array in sections.items():
+            f.seek(manifest["sections"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def _dtype(descr: list) -> np.dtype:
+    # JSON turns the (possibly nested) tuples of a dtype description into lists
+    return np.dtype([(field[0], _dtype(field[1]) if isinstance(field[1], list) else field[1], *field[2:]) for field in descr])
+
+class Snapshot:
+    """
+    A read-only, memory-mapped snapshot. Sections are numpy arrays viewing the mapping directly, so nothing is copied
+    or parsed up front, and every process mapping the same file shares its pages through the OS page cache
+
+    params:
+        path[str]: the snapshot file
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        manifest = json.loads(self.map[HEADER.size:HEADER.size + length])
+        self.created = manifest["created"]
+        self.sections = {
+            name: np.frombuffer(self.map, dtype=_dtype(section["dtype"]),
+                                count=section["count"], offset=section["offset"])
+            for name, section in manifest["sections"].items()
+        }
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.sections[name]
+
+    def string(self, offset: int, length: int) -> str | None:
+        """
+        Gets a string from the `strings` section
+        """
+        if length < 0:
+            return None
+        return bytes(self.sections["strings"][offset:offset + length]).decode("utf-8")
+
+    def find(self, section: str, key: str, value: int) -> int | None:
+        """
+        Gets the index of the record of a section (sorted by `key`) whose `key` is `value`, by binary search
+        """
+        column = self.sections[section][key]
+        i = int(np.searchsorted(column, value))
+        return i if i < len(column) and column[i] == value else None
+
+    def find_range(self, section: str, key: str, value: int) -> tuple[int, int]:
+        """
+        Gets the `[start, end)` indexes of the records of a section (sorted by `key`) whose `key` is `value`
+        """
+        column = self.sections[section][key]
+        return int(np.searchsorted(column, value, "left")), int(np.searchsorted(column, value, "right"))
+
+class SnapshotReader:
+    """
+    Hands out the current snapshot at `path`, mapping the new file whenever a new snapshot is swapped in. Earlier
+    snapshots stay valid for as long as they are referenced, as their files are only unlinked, never overwritten
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.snapshot = None
+
+    def get(self) -> Snapshot | None:
+        """
+        Gets the current snapshot, or `None` if none has been written yet
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if self.snapshot is None or (stat.st_ino, stat.st_mtime_ns) != (self.snapshot.stat.st_ino, self.snapshot.stat.st_mtime_ns):
+            self.snapshot = Snapshot(self.path)
+        return self.snapshot
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable
+import numpy as np
+import timeit
+
+EPOCH = datetime(1970, 1, 1)
+
+def parse_timestamp(timestamp: str | None) -> float:
+    """
+    Parses an ISO-8601 timestamp (as sent by the league APIs, e.g. `2024-01-05T20:30:00.000Z`) into seconds since the
+    epoch. Fractional seconds are optional, and timestamps without a UTC offset are taken to be in UTC
+
+    params:
+        timestamp[str]: the timestamp to parse
+
+    returns:
+        epoch[float]: seconds since the epoch, or 0 for a missing timestamp
+    """
+    if not timestamp:
+        return 0
+    if timestamp[-1] in "Zz":
+        timestamp = timestamp[:-1]
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is not None:
+        return dt.timestamp()
+    return (dt - EPOCH).total_seconds()
+
+def _parse_fixed_width(timestamps: list[str]) -> np.ndarray | None:
+    # `YYYY-MM-DDTHH:MM:SS[.f...][Z]` timestamps all of the same width (as a single API always sends them) are parsed
+    # straight from their bytes, as a matrix of digits. Gives up (`None`) on anything else
+    widths = set(map(len, timestamps))
+    if len(widths) != 1 or (width := widths.pop()) < 19:
+        return None
+    encoded = "".join(timestamps).encode("ascii", errors="replace")
+    chars = np.frombuffer(encoded, dtype=np.uint8).reshape(-1, width)
+
+    end = width - 1 if (chars[:, -1] == ord("Z")).all() else width
+    if not (chars[:, [4, 7, 10, 13, 16]] == np.frombuffer(b"--T::", dtype=np.uint8)).all():
+        return None
+    if end > 19 and not ((chars[:, 19] == ord(".")).all() and end > 20):
+        return None
+    # Anything below "0" wraps around, so a single comparison checks for digits
+    digits = chars[:, [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, *range(20, end)]] - np.uint8(ord("0"))
+    if (digits > 9).any():
+        return None
+    digits = digits.astype(np.int64)
+
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month, day = digits[:, 4] * 10 + digits[:, 5], digits[:, 6] * 10 + digits[:, 7]
+    hour, minute, second = digits[:, 8] * 10 + digits[:, 9], digits[:, 10] * 10 + digits[:, 11], digits[:, 12] * 10 + digits[:, 13]
+    if ((month < 1) | (month > 12) | (day < 1) | (day > 31) | (hour > 23) | (minute > 59) | (second > 59)).any():
+        return None
+
+    # Days since the epoch of a proleptic Gregorian date, with the year starting in March so leap days come last
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    days = era * 146097 + year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year - 719468
+
+    fraction = digits[:, 14:] @ (10.0 ** -np.arange(1, digits.shape[1] - 13)) if digits.shape[1] > 14 else 0.0
+    return (days * 86400 + hour * 3600 + minute * 60 + second) + fraction
+
+def parse_timestamps(timestamps: Iterable[str | None]) -> np.ndarray:
+    """
+    Parses a whole batch of ISO-8601 timestamps at once, vectorised rather than one Python call each. Batches of
+    timestamps in the same layout are parsed straight from their bytes, others through NumPy's datetime parser, and
+    batches holding UTC offsets other than `Z` one by one
+
+    params:
+        timestamps[Iterable[str]]: the timestamps to parse
+
+    returns:
+        epochs[np.ndarray]: seconds since the epoch of each timestamp, 0 for missing ones
+    """
+    timestamps = list(timestamps)
+    if not timestamps:
+        return np.empty(0, dtype=np.float64)
+    if all(timestamps) and (epochs := _parse_fixed_width(timestamps)) is not None:
+        return epochs
+
+    stripped = [(timestamp[:-1] if timestamp[-1] in "Zz" else timestamp) if timestamp else "NaT" for timestamp in timestamps]
+    if any(timestamp.find("+", 19) != -1 or timestamp.find("-", 19) != -1 for timestamp in stripped):
+        return np.array([parse_timestamp(timestamp) for timestamp in timestamps], dtype=np.float64)
+    parsed = np.array(stripped, dtype="datetime64[us]")
+    return np.where(np.isnat(parsed), 0.0, parsed.astype(np.int64) / 1e6)
+
+def benchmark(n: int = 100000) -> dict[str, float]:
+    """
+    Times parsing `n` API timestamps with the previous `strptime` parser, `parse_timestamp` and `parse_timestamps`
+
+    returns:
+        timings[dict[str, float]]: the nanoseconds per timestamp of each parser
+    """
+    timestamps = [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:{(i * 7) % 60:02d}.{i % 1000:03d}Z" for i in range(n)]
+
+    def strptime(timestamp: str) -> float:
+        return (datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S.%fZ") - EPOCH).total_seconds()
+
+    timings = {
+        "strptime": timeit.timeit(lambda: [strptime(timestamp) for timestamp in timestamps], number=1),
+        "parse_timestamp": timeit.timeit(lambda: [parse_timestamp(timestamp) for timestamp in timestamps], number=1),
+        "parse_timestamps": timeit.timeit(lambda: parse_timestamps(timestamps), number=1)
+    }
+    return {name: seconds / n * 1e9 for name, seconds in timings.items()}
+
+if __name__ == "__main__":
+    for name, ns in benchmark().items():
+        print(f"{name:>16}: {ns:8.1f} ns / timestamp")
@@ -1,32 +1,55 @@
 from __future__ import annotations
 
 from enum import IntEnum
+from typing import Iterable
 
 class TfSource(IntEnum):
     RGL = 1,
     UGC = 2,
     ETF2L = 3
 
-class SiteID:
+class SiteID(tuple):
+    """
+    An ID on one of the league sites. Immutable and hashable (so it can be deduplicated in sets and used as a dict key),
+    stored as a bare `(source, id)` tuple without a per-instance dict. Instances are interned, so constructing the same
+    ID again returns the existing instance instead of allocating a new one. The interning table is emptied once it holds
+    `MAX_INTERNED` IDs (or by `clear_interned`), so a long running process does not keep every ID it has ever seen;
+    instances from before then still compare equal to the new ones
+    """
+    __slots__ = ()
 
-    def __init__(self, id_: int, source: TfSource):
-        self.__id = int(id_)
-        self.__source = source
+    INTERNED: dict[tuple[TfSource, int], SiteID] = {}
+    MAX_INTERNED = 1 << 20
+
+    def __new__(cls, id_: int, source: TfSource) -> SiteID:
+        key = (source, int(id_))
+        site_id = cls.INTERNED.get(key)
+        if site_id is None:
+            if len(cls.INTERNED) >= cls.MAX_INTERNED:
+                cls.INTERNED.clear()
+            site_id = cls.INTERNED[key] = tuple.__new__(cls, key)
+        return site_id
 
     def get_id(self) -> int:
-        return self.__id
+        return self[1]
 
     def get_source(self) -> TfSource:
-        return self.__source
+        return self[0]
 
     def __eq__(self, other: SiteID) -> bool:
         if not isinstance(other, SiteID):
             return False
-        return other.get_source() == self.get_source() and other.get_id() == self.get_id()
+        return self is other or tuple.__eq__(self, other)
 
-    def __neq__(self, other: SiteID) -> bool:
+    def __ne__(self, other: SiteID) -> bool:
         return not self == other
 
+    __hash__ = tuple.__hash__
+
+    def __reduce__(self) -> tuple:
+        # Unpickled (e.g. in worker processes) through the interning table
+        return (SiteID, (self[1], self[0]))
+
     @staticmethod
     def rgl_id(id_: int) -> SiteID | None:
         if id_ is None:
@@ -39,5 +62,38 @@ class SiteID:
             return None
         return SiteID(id_, TfSource.ETF2L)
 
+    @staticmethod
+    def from_ids(ids: Iterable[int], source: TfSource) -> list[SiteID]:
+        """
+        Builds the site IDs of a whole list of raw IDs (e.g. a scraped page), looking each up in the interning table
+        directly rather than going through the constructor
+        """
+        if len(SiteID.INTERNED) >= SiteID.MAX_INTERNED:
+            SiteID.INTERNED.clear()
+        interned, new = SiteID.INTERNED, tuple.__new__
+        site_ids = []
+        for id_ in ids:
+            key = (source, int(id_))
+            site_id = interned.get(key)
+            if site_id is None:
+                site_id = interned[key] = new(SiteID, key)
+            site_ids.append(site_id)
+        return site_ids
+
+    @staticmethod
+    def clear_interned() -> None:
+        """
+        Empties the interning table, e.g. between the cycles of a long running sync
+        """
+        SiteID.INTERNED.clear()
+
+    @staticmethod
+    def rgl_ids(ids: Iterable[int]) -> list[SiteID]:
+        return SiteID.from_ids(ids, TfSource.RGL)
+
+    @staticmethod
+    def etf2l_ids(ids: Iterable[int]) -> list[SiteID]:
+        return SiteID.from_ids(ids, TfSource.ETF2L)
+
     def __repr__(self) -> str:
-        return f"""({self.__source.name} ID: {self.__id})"""
+        return f"""({self[0].name} ID: {self[1]})"""
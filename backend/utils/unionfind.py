@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Hashable, Iterable
+
+class UnionFind:
+    """
+    Disjoint sets over arbitrary hashable items, with union by size and path halving, so any sequence of operations
+    runs in near-linear time. Items are added on first use
+    """
+
+    def __init__(self, items: Iterable[Hashable] = ()) -> None:
+        self.parent = {}
+        self.size = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.parent
+
+    def add(self, item: Hashable) -> None:
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item: Hashable) -> Hashable:
+        """
+        Gets the representative of the set holding `item`
+        """
+        self.add(item)
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: Hashable, b: Hashable) -> bool:
+        """
+        Merges the sets holding `a` and `b`
+
+        returns:
+            merged[bool]: `False` if they were already in the same set
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size.pop(b)
+        return True
+
+    def groups(self) -> list[list[Hashable]]:
+        """
+        Gets every set, as lists of their items
+        """
+        groups = defaultdict(list)
+        for item in self.parent:
+            groups[self.find(item)].append(item)
+        return list(groups.values())